@@ -58,6 +58,20 @@ const CH_API = {
 // Search companies
 // ─────────────────────────────────────────────
 
+// Offline name index served by the dev server (--build-index search); empty when unavailable
+async function searchCompaniesLocal(query, limit = 20) {
+  try {
+    const response = await fetch(
+      apiUrl(`/local/search?q=${encodeURIComponent(query)}&kind=company&limit=${limit}`)
+    );
+    if (!response.ok) return [];
+    const data = await response.json();
+    return data.results || [];
+  } catch (err) {
+    return [];
+  }
+}
+
 async function searchCompaniesAPI(query, limit = 20) {
 
   if (!query || query.trim().length < 2) return [];
@@ -69,6 +83,12 @@ async function searchCompaniesAPI(query, limit = 20) {
     return cached.data;
   }
 
+  const localItems = await searchCompaniesLocal(query, limit);
+  if (localItems.length) {
+    CH_API.cache.search.set(cacheKey, { data: localItems, timestamp: Date.now() });
+    return localItems;
+  }
+
   try {
     const response = await fetchCH(
       `/search/companies?q=${encodeURIComponent(query)}&items_per_page=${limit}`
@@ -6,6 +6,15 @@
 
   let _activeMenu = null;
 
+  // Offline reverse geocode via the dev server (ONSPD + police force polygons); resolves null when unavailable
+  function reverseGeocodeLocal(latlng) {
+    if (typeof apiUrl !== "function") return Promise.resolve(null);
+    return fetch(apiUrl(`/local/reverse?lat=${latlng.lat}&lon=${latlng.lng}`))
+      .then(r => (r.ok ? r.json() : null))
+      .then(data => data?.result || null)
+      .catch(() => null);
+  }
+
   function createContextMenu(x, y, items) {
     destroyContextMenu();
     const menu = document.createElement("div");
@@ -80,12 +89,14 @@
           action: () => {
             const pc = document.getElementById("ch_postcode");
             if (pc) {
-              // Reverse geocode to postcode
-              fetch(`https://api.postcodes.io/postcodes?lon=${latlng.lng}&lat=${latlng.lat}&limit=1`)
-                .then(r => r.json())
-                .then(data => {
-                  if (data.result?.[0]?.postcode) {
-                    pc.value = data.result[0].postcode;
+              // Reverse geocode to postcode (offline table first, then postcodes.io)
+              reverseGeocodeLocal(latlng)
+                .then(local => local?.postcode || fetch(`https://api.postcodes.io/postcodes?lon=${latlng.lng}&lat=${latlng.lat}&limit=1`)
+                  .then(r => r.json())
+                  .then(data => data.result?.[0]?.postcode))
+                .then(postcode => {
+                  if (postcode) {
+                    pc.value = postcode;
                     document.querySelector('[data-tab="search"]')?.click();
                     document.getElementById("ch_search")?.click();
                   }
@@ -101,6 +112,10 @@
             const msg = `${latlng.lat.toFixed(6)}, ${latlng.lng.toFixed(6)}`;
             navigator.clipboard?.writeText(msg);
             if (typeof showToast === "function") showToast(`Copied: ${msg}`, "info");
+            reverseGeocodeLocal(latlng).then(local => {
+              const parts = [local?.postcode, local?.force?.name].filter(Boolean);
+              if (parts.length && typeof showToast === "function") showToast(parts.join(" | "), "info");
+            });
           }
         },
         {
@@ -18,7 +18,10 @@ const FLIGHTS_STATE = {
   detailPanelEl: null,
   detailDrag: null,
   suppressNextMapClick: false,
-  mapDeselectHooked: false
+  mapDeselectHooked: false,
+  feedKey: "",          // query the cursor belongs to
+  feedCursor: null,     // server poller cursor for ?since= deltas
+  feedById: new Map()   // flight id -> latest FR24 record
 };
 
 const UK_COUNTRY_KEYS = ["UNITED KINGDOM", "UK", "GREAT BRITAIN", "ENGLAND", "SCOTLAND", "WALES", "NORTHERN IRELAND"];
@@ -882,8 +885,11 @@ async function fetchFlightRadarFeed() {
     s: String(bb.lamin),
     w: String(bb.lomin),
     e: String(bb.lomax),
-    ukOnly: FLIGHTS_STATE.filters?.ukNexusOnly ? "1" : "0"
+    ukOnly: FLIGHTS_STATE.filters?.ukNexusOnly ? "1" : "0",
+    format: "columnar"
   });
+  const key = q.toString();
+  if (key === FLIGHTS_STATE.feedKey && FLIGHTS_STATE.feedCursor) q.set("since", FLIGHTS_STATE.feedCursor);
   const resp = await apiFetch(`/api/flightradar/flights?${q.toString()}`, {
     headers: { Accept: "application/json" }
   });
@@ -891,7 +897,41 @@ async function fetchFlightRadarFeed() {
     const body = await resp.text().catch(() => "");
     throw new Error(`FR24 HTTP ${resp.status}${body ? ` - ${body.slice(0, 120)}` : ""}`);
   }
-  return resp.json();
+  return mergeFlightFeed(key, decodeColumnarFlights(await resp.json()));
+}
+
+// format=columnar: parallel arrays plus dictionaries for aircraft/airports/airlines -> flight objects.
+function decodeColumnarFlights(payload) {
+  if (payload?.format !== "columnar" || !payload.columns) return payload;
+  const cols = payload.columns;
+  const dicts = payload.dicts || {};
+  const coded = { aircraft: "aircraft", origin: "airport", destination: "airport", airlineIcao: "airline" };
+  const names = Object.keys(cols);
+  const flights = new Array(payload.count || 0);
+  for (let i = 0; i < flights.length; i += 1) {
+    const f = {};
+    for (const name of names) {
+      const value = cols[name][i];
+      f[name] = coded[name] ? (dicts[coded[name]]?.[value] || "") : value;
+    }
+    f.onGround = Boolean(f.onGround);
+    flights[i] = f;
+  }
+  const { columns, dicts: _dicts, ...rest } = payload;
+  return { ...rest, flights };
+}
+
+// Server poller responses carry a cursor; with ?since= they only list changed flights and removed ids.
+function mergeFlightFeed(key, payload) {
+  if (!payload?.ok || !Array.isArray(payload.flights)) return payload;
+  const byId = FLIGHTS_STATE.feedById;
+  if (!payload.delta) byId.clear();
+  (payload.removed || []).forEach((id) => byId.delete(String(id)));
+  payload.flights.forEach((f) => byId.set(String(f.id), f));
+  FLIGHTS_STATE.feedKey = payload.cursor ? key : "";
+  FLIGHTS_STATE.feedCursor = payload.cursor || null;
+  const flights = Array.from(byId.values());
+  return { ...payload, delta: false, count: flights.length, flights };
 }
 
 async function fetchFlightRadarDetails(flightId) {
@@ -1176,6 +1216,9 @@ function stopFlightTracking() {
   FLIGHTS_STATE.flightsCache = [];
   FLIGHTS_STATE.markerByIcao.clear();
   FLIGHTS_STATE.snapshot = null;
+  FLIGHTS_STATE.feedKey = "";
+  FLIGHTS_STATE.feedCursor = null;
+  FLIGHTS_STATE.feedById.clear();
   clearFlightSelection();
   renderFlightFilterResults();
   updateFlightInfo(null, 0);
@@ -952,6 +952,7 @@ function initCrimeSpatialDrawHooks() {
 function renderCrimeLayerFiltered() {
   if (!layers.crime) return;
 
+  syncCrimeQuery();
   layers.crime.clearLayers();
 
   if (!CRIME_DATA || !CRIME_DATA.length) {
@@ -1014,6 +1015,95 @@ function renderCrimeLayerFiltered() {
   console.log(`[Crime] Rendered ${rendered}/${total} grid cells`);
 }
 
+// With the dev server, the layer holds only the cells /crime/query returns for the padded viewport and the
+// active filters; the full grid file is the fallback when the API is not there.
+const CRIME_QUERY_PAD = 0.5;
+const CRIME_REMOTE = {
+  enabled: false,
+  key: "",
+  bounds: null,
+  truncated: false,
+  timer: null,
+  seq: 0
+};
+
+function crimeQueryParams(bounds) {
+  const params = new URLSearchParams();
+  params.set("bbox", [bounds.getWest(), bounds.getSouth(), bounds.getEast(), bounds.getNorth()].map((v) => v.toFixed(3)).join(","));
+  const monthStart = getActiveMonthStart();
+  if (monthStart) params.set("from", monthStart);
+  CRIME_FILTER_STATE.forces.forEach((force) => params.append("force", force));
+  CRIME_FILTER_STATE.types.forEach((type) => params.append("type", type));
+  return params;
+}
+
+async function fetchCrimeCells(bounds) {
+  const params = crimeQueryParams(bounds);
+  const seq = ++CRIME_REMOTE.seq;
+  const r = await fetch(apiUrl(`/crime/query?${params.toString()}`));
+  if (!r.ok) throw new Error(`Crime query failed (${r.status})`);
+  const data = await r.json();
+  if (seq !== CRIME_REMOTE.seq) return false;
+  // Keep the objects of cells already loaded so their caches and an open inspector survive the refresh.
+  const known = new Map(CRIME_DATA.map((feature) => [String(feature?.geometry?.coordinates), feature]));
+  CRIME_DATA = (Array.isArray(data?.features) ? data.features : []).map((feature) => known.get(String(feature?.geometry?.coordinates)) || feature);
+  CRIME_REMOTE.key = params.toString();
+  CRIME_REMOTE.bounds = bounds;
+  CRIME_REMOTE.truncated = !!data?.meta?.truncated;
+  if (CRIME_REMOTE.truncated) {
+    setStatus?.(`Crime layer: ${formatCrimeNumber(data.meta.returned)} of ${formatCrimeNumber(data.meta.matched)} cells - zoom in for the rest`);
+  }
+  return true;
+}
+
+function syncCrimeQuery() {
+  if (!CRIME_REMOTE.enabled || !map.hasLayer(layers.crime)) return;
+  const view = map.getBounds();
+  const reuse = CRIME_REMOTE.bounds && !CRIME_REMOTE.truncated && CRIME_REMOTE.bounds.contains(view);
+  const bounds = reuse ? CRIME_REMOTE.bounds : view.pad(CRIME_QUERY_PAD);
+  if (crimeQueryParams(bounds).toString() === CRIME_REMOTE.key) return;
+  clearTimeout(CRIME_REMOTE.timer);
+  CRIME_REMOTE.timer = setTimeout(() => {
+    fetchCrimeCells(bounds)
+      .then((fresh) => { if (fresh) renderCrimeLayerFiltered(); })
+      .catch((err) => console.warn("[Crime] viewport query failed", err));
+  }, 250);
+}
+
+function applyCrimeMonths(months) {
+  CRIME_MONTHS = Array.isArray(months) ? months.slice().sort() : [];
+  if (CRIME_MONTHS.length) {
+    setCrimeMonthWindow(Math.min(6, CRIME_MONTHS.length), { silent: true, asDefault: true });
+  } else {
+    CRIME_FILTER_STATE.monthStartIndex = 0;
+    CRIME_DEFAULT_MONTH_START = 0;
+    updateCrimeTimelineControls();
+  }
+}
+
+async function loadCrimeFromServer() {
+  const r = await fetch(apiUrl("/crime/meta"));
+  if (!r.ok) throw new Error(`Crime API unavailable (${r.status})`);
+  const meta = await r.json();
+  applyCrimeMonths(meta.months);
+  CRIME_FORCE_MAP.clear();
+  CRIME_TYPES.clear();
+  CRIME_TYPE_STATS.clear();
+  Object.entries(meta.force_stats || {}).forEach(([name, stats]) => CRIME_FORCE_MAP.set(name, stats));
+  Object.entries(meta.type_stats || {}).forEach(([type, stats]) => {
+    CRIME_TYPES.add(type);
+    CRIME_TYPE_STATS.set(type, stats);
+  });
+  CRIME_REMOTE.enabled = true;
+  await fetchCrimeCells(map.getBounds().pad(CRIME_QUERY_PAD));
+  populateCrimeFilters();
+  renderCrimeLayerFiltered();
+  console.log("Crime query API:", meta.features, "cells indexed,", CRIME_DATA.length, "in view");
+  if (meta.lite) {
+    setStatus?.(`Crime layer loaded (lite mode): ${meta.features.toLocaleString()} cells`);
+  }
+}
+
 async function ensureCrimeLoaded() {
   async function fetchCrimeGeoJson() {
     const urls = [
@@ -1044,6 +1134,50 @@ async function ensureCrimeLoaded() {
     throw lastErr || new Error("Crime data load failed");
   }
 
+  async function loadCrimeFromFile() {
+    const data = await fetchCrimeGeoJson();
+    CRIME_REMOTE.enabled = false;
+    CRIME_DATA = data.features || [];
+    applyCrimeMonths(data?.meta?.months);
+
+    CRIME_FORCE_MAP.clear();
+    CRIME_TYPES.clear();
+    CRIME_TYPE_STATS.clear();
+
+    CRIME_DATA.forEach(feature => {
+
+      const props = feature.properties || {};
+      const type = props.dominant_type || "Unknown";
+      const incidents = Number(props.count || 0);
+      const stopTotal = Number(props.stop_search_total || 0);
+      const forces = normalizeCrimeFeatureForces(feature);
+
+      forces.forEach(forceName => {
+        const stats = CRIME_FORCE_MAP.get(forceName) || { crimes: 0, stops: 0, cells: 0 };
+        stats.crimes += incidents;
+        stats.stops += stopTotal;
+        stats.cells += 1;
+        CRIME_FORCE_MAP.set(forceName, stats);
+      });
+
+      CRIME_TYPES.add(type);
+      const typeStats = CRIME_TYPE_STATS.get(type) || { crimes: 0, cells: 0 };
+      typeStats.crimes += incidents;
+      typeStats.cells += 1;
+      CRIME_TYPE_STATS.set(type, typeStats);
+
+    });
+
+    populateCrimeFilters();
+    renderCrimeLayerFiltered();
+
+    const isLite = !!data?.meta?.lite;
+    console.log("Crime loaded:", CRIME_DATA.length, isLite ? "(lite)" : "(full)");
+    if (isLite) {
+      setStatus?.(`Crime layer loaded (lite mode): ${CRIME_DATA.length.toLocaleString()} cells`);
+    }
+  }
+
   if (OVERLAY_LOAD_STATE.crimeLoaded)
     return true;
 
@@ -1051,60 +1185,20 @@ async function ensureCrimeLoaded() {
     return OVERLAY_LOAD_STATE.crimeLoading;
 
   OVERLAY_LOAD_STATE.crimeLoading =
-    fetchCrimeGeoJson()
-
-      .then(data => {
-
-        CRIME_DATA = data.features || [];
-        const metaMonths = Array.isArray(data?.meta?.months) ? data.meta.months.slice().sort() : [];
-        CRIME_MONTHS = metaMonths;
-        if (CRIME_MONTHS.length) {
-          setCrimeMonthWindow(Math.min(6, CRIME_MONTHS.length), { silent: true, asDefault: true });
-        } else {
-          CRIME_FILTER_STATE.monthStartIndex = 0;
-          CRIME_DEFAULT_MONTH_START = 0;
-          updateCrimeTimelineControls();
-        }
+    loadCrimeFromServer()
 
-        CRIME_FORCE_MAP.clear();
-        CRIME_TYPES.clear();
-        CRIME_TYPE_STATS.clear();
-
-        CRIME_DATA.forEach(feature => {
+      .catch(err => {
 
-          const props = feature.properties || {};
-          const type = props.dominant_type || "Unknown";
-          const incidents = Number(props.count || 0);
-          const stopTotal = Number(props.stop_search_total || 0);
-          const forces = normalizeCrimeFeatureForces(feature);
-
-          forces.forEach(forceName => {
-            const stats = CRIME_FORCE_MAP.get(forceName) || { crimes: 0, stops: 0, cells: 0 };
-            stats.crimes += incidents;
-            stats.stops += stopTotal;
-            stats.cells += 1;
-            CRIME_FORCE_MAP.set(forceName, stats);
-          });
+        console.warn("[Crime] query API unavailable, loading the full grid file", err);
 
-          CRIME_TYPES.add(type);
-          const typeStats = CRIME_TYPE_STATS.get(type) || { crimes: 0, cells: 0 };
-          typeStats.crimes += incidents;
-          typeStats.cells += 1;
-          CRIME_TYPE_STATS.set(type, typeStats);
+        return loadCrimeFromFile();
 
-        });
+      })
 
-        populateCrimeFilters();
-        renderCrimeLayerFiltered();
+      .then(() => {
 
         OVERLAY_LOAD_STATE.crimeLoaded = true;
 
-        const isLite = !!data?.meta?.lite;
-        console.log("Crime loaded:", CRIME_DATA.length, isLite ? "(lite)" : "(full)");
-        if (isLite) {
-          setStatus?.(`Crime layer loaded (lite mode): ${CRIME_DATA.length.toLocaleString()} cells`);
-        }
-
         return true;
 
       })
@@ -1267,6 +1361,44 @@ function cachePostcode(pc, coords) {
   PC_CACHE[key] = { lat: Number(coords.lat), lon: Number(coords.lon) };
 }
 
+// Offline ONSPD table served by the dev server (--build-index postcodes)
+async function geocodeViaLocalTable(rawPostcode) {
+  const key = normalizePostcodeKey(rawPostcode);
+  if (!key) return null;
+  try {
+    const resp = await fetch(apiUrl(`/local/postcode/${encodeURIComponent(key)}`));
+    if (!resp.ok) return null;
+    const data = await resp.json();
+    const lat = Number(data?.result?.latitude);
+    const lon = Number(data?.result?.longitude);
+    if (data?.result?.latitude != null && Number.isFinite(lat) && Number.isFinite(lon)) return { lat, lon };
+  } catch (_) {
+    // ignore
+  }
+  return null;
+}
+
+// Geocode a whole batch in one call so plotting loops hit PC_CACHE instead of the network
+async function prefetchPostcodesLocal(rawPostcodes) {
+  const wanted = [...new Set(rawPostcodes.map(normalizePostcodeKey).filter((pc) => pc && !lookupPostcode(pc)))];
+  for (let i = 0; i < wanted.length; i += 5000) {
+    try {
+      const resp = await fetch(apiUrl("/local/postcodes"), {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ postcodes: wanted.slice(i, i + 5000) })
+      });
+      if (!resp.ok) return;
+      const data = await resp.json();
+      for (const [pc, rec] of Object.entries(data?.results || {})) {
+        if (rec && rec.latitude != null) cachePostcode(pc, { lat: Number(rec.latitude), lon: Number(rec.longitude) });
+      }
+    } catch (_) {
+      return;
+    }
+  }
+}
+
 async function geocodeViaPostcodesIo(rawPostcode) {
   const variants = postcodeVariants(rawPostcode);
   if (!variants.length) return null;
@@ -1545,7 +1677,10 @@ async function geocodePostcode(rawPostcode) {
   if (cached) return cached;
 
   try {
-    let coords = await geocodeViaPostcodesIo(rawPostcode);
+    let coords = await geocodeViaLocalTable(rawPostcode);
+    if (!coords) {
+      coords = await geocodeViaPostcodesIo(rawPostcode);
+    }
     if (!coords) {
       coords = await geocodeViaOsPlaces(rawPostcode);
     }
@@ -5892,6 +6027,10 @@ map.on("overlayadd", function(e) {
 
 });
 
+// Re-query the crime API as the viewport moves or the layer is switched back on.
+map.on("moveend", () => syncCrimeQuery());
+map.on("layeradd", (e) => { if (e.layer === layers.crime) syncCrimeQuery(); });
+
 
 function resolvePoliceForceName(props = {}) {
   if (!props || typeof props !== "object") return "Unknown Police Force";
@@ -5917,28 +6056,64 @@ function resolvePoliceForceCode(props = {}) {
   return "";
 }
 
+const POLICE_AREA_STYLE = { color: "#818cf8", weight: 2, fillColor: "#818cf8", fillOpacity: 0.06, dashArray: "6 4" };
+
+function policeAreaPopupHtml(props) {
+  const n = resolvePoliceForceName(props || {});
+  const code = resolvePoliceForceCode(props || {});
+  return `<strong>${escapeHtml(n)}</strong><br>` +
+    `<span class="popup-label">Police Force Area</span>` +
+    (code ? `<br><span class="popup-label">Force Code</span> ${escapeHtml(code)}` : "");
+}
+
+// Vector tiles from the dev server's /tiles endpoint: each tile carries only the boundary detail its zoom
+// needs, instead of the full-resolution GeoJSON. Resolves false when the plugin or the endpoint is missing.
+async function addPoliceAreaTiles() {
+  if (!L.vectorGrid?.protobuf) return false;
+  try {
+    const probe = await fetch(apiUrl("/tiles/police_force_areas/0/0/0.mvt"));
+    if (!probe.ok) return false;
+  } catch (_) {
+    return false;
+  }
+  const tiles = L.vectorGrid.protobuf(apiUrl("/tiles/police_force_areas/{z}/{x}/{y}.mvt"), {
+    rendererFactory: L.svg.tile,
+    interactive: true,
+    maxNativeZoom: 14,
+    vectorTileLayerStyles: { police_force_areas: { ...POLICE_AREA_STYLE, fill: true } }
+  });
+  tiles.on("click", (e) => {
+    const props = e.layer?.properties || {};
+    const n = resolvePoliceForceName(props);
+    L.popup().setLatLng(e.latlng).setContent(policeAreaPopupHtml(props)).openOn(map);
+    setActiveForce(n);
+    showToast?.(`${n} selected`, "info");
+  });
+  tiles.addTo(layers.areas);
+  return true;
+}
+
 async function ensurePoliceAreasLoaded() {
   if (OVERLAY_LOAD_STATE.areasLoaded) return true;
   if (OVERLAY_LOAD_STATE.areasLoading) return OVERLAY_LOAD_STATE.areasLoading;
-  OVERLAY_LOAD_STATE.areasLoading = fetch("data/police_force_areas_wgs84.geojson")
-    .then((r) => r.json())
-    .then((data) => {
-      L.geoJSON(data, {
-        style: { color: "#818cf8", weight: 2, fillColor: "#818cf8", fillOpacity: 0.06, dashArray: "6 4" },
-        onEachFeature: (f, l) => {
-          const n = resolvePoliceForceName(f.properties || {});
-          const code = resolvePoliceForceCode(f.properties || {});
-          l.bindPopup(
-            `<strong>${escapeHtml(n)}</strong><br>` +
-            `<span class="popup-label">Police Force Area</span>` +
-            (code ? `<br><span class="popup-label">Force Code</span> ${escapeHtml(code)}` : "")
-          );
-          l.on("click", () => {
-            setActiveForce(n);
-            showToast?.(`${n} selected`, "info");
-          });
-        }
-      }).addTo(layers.areas);
+  OVERLAY_LOAD_STATE.areasLoading = addPoliceAreaTiles()
+    .then((tiled) => tiled || fetch("data/police_force_areas_wgs84.geojson")
+      .then((r) => r.json())
+      .then((data) => {
+        L.geoJSON(data, {
+          style: POLICE_AREA_STYLE,
+          onEachFeature: (f, l) => {
+            const n = resolvePoliceForceName(f.properties || {});
+            l.bindPopup(policeAreaPopupHtml(f.properties));
+            l.on("click", () => {
+              setActiveForce(n);
+              showToast?.(`${n} selected`, "info");
+            });
+          }
+        }).addTo(layers.areas);
+        return true;
+      }))
+    .then(() => {
       OVERLAY_LOAD_STATE.areasLoaded = true;
       return true;
     })
@@ -6666,10 +6841,31 @@ async function lookupAndPlotCompanies(companyNumbers) {
 
   const results = [];
   const uniqueNums = [...new Set(companyNumbers)];
+  const resolved = new Set();
+
+  // The dev server's offline index answers a whole batch without pulling 100k-row shards
+  try {
+    const r = await fetch(apiUrl("/local/companies"), {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ numbers: uniqueNums })
+    });
+    if (r.ok) {
+      const data = await r.json();
+      for (const [num, row] of Object.entries(data?.results || {})) {
+        if (!row) continue;
+        results.push(row);
+        resolved.add(num);
+      }
+    }
+  } catch (e) {
+    console.warn("Local company index unavailable, falling back to subsets:", e);
+  }
 
-  // For each company number, find the right subset file and search
+  // For each remaining company number, find the right subset file and search
   for (let i = 0; i < uniqueNums.length; i++) {
     const num = uniqueNums[i];
+    if (resolved.has(num)) continue;
     const numClean = num.replace(/\D/g, "");
     if (!numClean) continue;
     const numInt = parseInt(numClean, 10);
@@ -6719,6 +6915,7 @@ async function plotCompanies(rows, clearFirst = false) {
   if (clearFirst) layers.companies.clearLayers();
   if (!rows.length) { setStatus("No companies to plot"); return; }
   setStatus(`Plotting ${rows.length} compan${rows.length===1?"y":"ies"}...`);
+  await prefetchPostcodesLocal(rows.map((r) => r["RegAddress.PostCode"]).filter(Boolean));
   let plotted = 0;
   let skipped = 0;
   const failedPostcodes = new Set();
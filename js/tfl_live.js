@@ -5,6 +5,7 @@ const TFL = {
   base: CONTROL_ROOM_CONFIG.tfl.baseUrl,
   arrivalCache: new Map(),  // naptanId -> { data, ts }
   statusTimer: null,
+  statusStream: null,   // EventSource on the dev server's /stream?topics=tube
   bikesTimer: null,
   bikesLoaded: false,
   stopSearchLayer: null,
@@ -238,6 +239,32 @@ function syncSelectedLineRow(selectedId) {
 function startLineStatusPolling() {
   fetchTflLineStatus();
   TFL.statusTimer = setInterval(fetchTflLineStatus, CONTROL_ROOM_CONFIG.tfl.statusRefresh);
+  subscribeLineStatusStream();
+}
+
+// Server push replaces the status timer while the stream is up; the timer comes back if it closes.
+function subscribeLineStatusStream() {
+  if (typeof EventSource !== "function" || typeof apiUrl !== "function" || TFL.statusStream) return;
+  const es = new EventSource(apiUrl("/stream?topics=tube"));
+  TFL.statusStream = es;
+  es.addEventListener("tfl-status", (ev) => {
+    let msg = null;
+    try { msg = JSON.parse(ev.data); } catch (_) { return; }
+    if (msg?.status !== 200 || !Array.isArray(msg.data)) return;
+    if (TFL.statusTimer) {
+      clearInterval(TFL.statusTimer);
+      TFL.statusTimer = null;
+    }
+    renderLineStatus(msg.data);
+    if (typeof window.updateTflLineStylesFromStatus === "function") {
+      window.updateTflLineStylesFromStatus(msg.data);
+    }
+  });
+  es.onerror = () => {
+    if (es.readyState !== EventSource.CLOSED) return;
+    TFL.statusStream = null;
+    if (!TFL.statusTimer) TFL.statusTimer = setInterval(fetchTflLineStatus, CONTROL_ROOM_CONFIG.tfl.statusRefresh);
+  };
 }
 
 // ══════════════════════════════════════════════════════
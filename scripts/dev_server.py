@@ -1,19 +1,56 @@
 import argparse
+import array
+import asyncio
 import base64
+import bisect
+import csv
+import email.utils
 import gzip
+import hashlib
+import heapq
+import http.client
+import io
 import json
+import math
+import mmap
 import os
+import queue
 import re
+import shutil
+import socket
+import sqlite3
+import ssl
+import struct
 import sys
+import threading
 import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from datetime import datetime, timezone
 from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 import urllib.error
 import urllib.request
 import xml.etree.ElementTree as ET
 from pathlib import Path
-from typing import Optional, Dict, Tuple
-from urllib.parse import urlsplit, parse_qs, urlencode, quote_plus, quote
+from typing import Callable, Optional, Dict, Tuple
+from urllib.parse import urlsplit, urljoin, parse_qs, parse_qsl, urlencode, quote_plus, quote, unquote
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 ThreadingHTTPServer.allow_reuse_address = True
 
@@ -25,12 +62,79 @@ NRE_LDBWS_URL = "https://lite.realtime.nationalrail.co.uk/OpenLDBWS/ldb11.asmx"
 NOMINATIM_BASE = "https://nominatim.openstreetmap.org/search"
 AVIATIONSTACK_BASE = "http://api.aviationstack.com/v1"
 UK_RAIL_STATIONS_URL = "https://raw.githubusercontent.com/davwheat/uk-railway-stations/main/stations.json"
+STATION_NEARBY_DEFAULT_KM = 45.0
+STATION_NEARBY_MAX_KM = 1500.0
+STATION_FUZZY_MIN = 0.5
+STATION_CATALOG_FILE = "stations.json.gz"
+STATION_FIELDS = ("crs", "name", "country", "lat", "lon")
+STATION_REFRESH_S = float(os.environ.get("CR_STATION_REFRESH_S", "86400") or 86400)
+STATION_SEARCH_CACHE = 2048
+# Common analyst shorthand -> CRS for /nre/stations?q= typeahead.
+STATION_ALIASES = {
+    "KX": "KGX",
+    "Kings X": "KGX",
+    "St Pancras": "STP",
+    "Liv St": "LST",
+    "Brum": "BHM",
+    "New St": "BHM",
+    "Manc Picc": "MAN",
+    "Picc": "MAN",
+    "Pompey": "PMS",
+    "Heathrow": "HXX",
+    "Gatwick": "GTW",
+    "Stansted": "SSD",
+    "Luton Airport": "LTN",
+    "Edinburgh": "EDB",
+    "Glasgow": "GLC",
+    "Leeds": "LDS",
+}
 WEBTRIS_API_BASE = "https://webtris.highwaysengland.co.uk/api"
 DVLA_VES_API_BASE = "https://driver-vehicle-licensing.api.gov.uk"
 RAILDATA_API_BASE = "https://opendata.nationalrail.co.uk"
 FR24_FEED_URL = "https://data-cloud.flightradar24.com/zones/fcgi/feed.js"
 FR24_CLICKHANDLER_URL = "https://data-live.flightradar24.com/clickhandler/?flight="
 FR24_DEFAULT_BOUNDS = (61.2, 49.7, -11.5, 2.8)
+# The shared poller's box: FR24_DEFAULT_BOUNDS widened to cover UK_AIRSPACE_BOUNDS and UK_FIR_POLYGON so ukOnly
+# requests are always served from it.
+FR24_POLL_BOUNDS = (61.3, 48.8, -11.5, 5.0)
+# The feed caps each request at FR24_FEED_LIMIT flights, so the poll box is fetched as tiles (split at
+# FR24_POLL_SPLIT_LAT, between the Scottish and London FIRs) and merged; a tile that comes back full is split
+# into quadrants (refetched straight away and kept for later ticks), up to FR24_POLL_MAX_TILES requests per tick.
+# Quadrants whose combined count drops below FR24_POLL_MERGE_BELOW are folded back into their parent.
+FR24_FEED_LIMIT = 1500
+FR24_POLL_SPLIT_LAT = 55.0
+FR24_POLL_MAX_TILES = 16
+FR24_POLL_MERGE_BELOW = FR24_FEED_LIMIT // 2
+FR24_POLL_INTERVAL_S = float(os.environ.get("CR_FR24_POLL_S", "10") or 0)
+FR24_POLL_IDLE_S = 300.0
+FR24_FIRST_SNAPSHOT_WAIT_S = 20.0
+FR24_DELTA_HISTORY = 90
+# format=columnar / format=binary flight payloads.
+FLIGHT_TEXT_COLUMNS = ("id", "icao24", "callsign", "number", "registration", "squawk")
+FLIGHT_NUMERIC_COLUMNS = ("lat", "lon", "heading", "altitude", "speed", "verticalSpeed", "time")
+FLIGHT_CODED_COLUMNS = (("aircraft", "aircraft"), ("origin", "airport"), ("destination", "airport"), ("airlineIcao", "airline"))
+FLIGHT_BINARY_MAGIC = b"CRFLT1\0\0"
+FLIGHT_ENCODE_MEMO_MAX = 256
+# Flight track history (--flight-history): per-aircraft rings plus hourly append-only segment files.
+FLIGHT_TRACK_FIELDS = 6
+FLIGHT_TRACK_RING_POINTS = 360
+FLIGHT_TRACK_MEMORY_MB = float(os.environ.get("CR_FLIGHT_TRACK_MEMORY_MB", "64") or 64)
+FLIGHT_TRACK_RETENTION_S = 7 * 24 * 3600
+FLIGHT_TRACK_SEGMENT_SUFFIX = ".trk"
+# A stationary aircraft is still recorded this often, and at the start of every hourly segment, so parked
+# aircraft show up in replays; windows shorter than this may miss them.
+FLIGHT_TRACK_KEYFRAME_S = 300
+FLIGHT_HISTORY_MAX_POINTS = 500000
+FLIGHT_HISTORY_MAX_WINDOW_S = 24 * 3600
+STREAM_MAX_CLIENTS = int(os.environ.get("CR_STREAM_MAX_CLIENTS", "64") or 64)
+STREAM_QUEUE_MAX = 64
+STREAM_HEARTBEAT_S = 15.0
+# /stream topics backed by this server's own routes: name -> (event, path template, poll interval s).
+STREAM_URL_TOPICS = {
+    "tube": ("tfl-status", "/tfl/Line/Mode/tube,dlr,overground,elizabeth-line,tram/Status", 60.0),
+    "departures": ("rail-board", "/nre/departures?crs={arg}&rows=10", 30.0),
+    "arrivals": ("rail-board", "/nre/arrivals?crs={arg}&rows=10", 30.0),
+}
 UK_AIRPORT_IATA = {
     "LHR", "LGW", "STN", "LTN", "LCY", "SEN", "MAN", "BHX", "BRS", "LPL", "NCL", "EMA", "NQY", "EXT", "SOU", "BOH", "NWI", "MME", "LBA", "HUY", "CWL",
     "EDI", "GLA", "ABZ", "INV", "PIK", "DND",
@@ -43,14 +147,27 @@ UK_AIRSPACE_BOUNDS = {
     "west": -9.8,
     "east": 2.8,
 }
+# Simplified outer boundary of the London and Scottish FIRs (EGTT + EGPX) as (lon, lat), clockwise from the
+# north-west corner; used by ukOnly instead of the UK_AIRSPACE_BOUNDS rectangle.
+UK_FIR_POLYGON = [
+    (-10.0, 61.0), (0.0, 61.0), (0.0, 60.0), (5.0, 57.0), (5.0, 55.0), (3.0, 53.5), (2.0, 51.5),
+    (1.47, 51.1), (1.47, 50.67), (-0.25, 50.0), (-2.0, 50.0), (-8.0, 48.83), (-8.0, 51.0), (-5.5, 52.33),
+    (-5.5, 53.92), (-6.0, 54.0), (-7.0, 54.1), (-8.17, 54.42), (-7.25, 55.33), (-10.0, 54.5),
+]
+UK_FIR_BBOX = (
+    min(x for x, _ in UK_FIR_POLYGON), min(y for _, y in UK_FIR_POLYGON),
+    max(x for x, _ in UK_FIR_POLYGON), max(y for _, y in UK_FIR_POLYGON),
+)
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 DEFAULT_HOST = os.environ.get("CR_DEV_HOST", "0.0.0.0")
 DEFAULT_PORT = int(os.environ.get("CR_DEV_PORT", "8000") or 8000)
 
 _station_catalog_cache = {
-    "loaded": False,
-    "items": [],
+    "catalog": None,
+    "meta": {},
+    "load_lock": threading.Lock(),
+    "refresh_lock": threading.Lock(),
 }
 
 _raildata_auth_cache = {
@@ -76,310 +193,4600 @@ RAILDATA_ALLOWED_HOSTS = {
     "api.raildata.org.uk",
 }
 
-STATIC_ACCELERATED_FILES = {
-    "/data/Processed/crime_grid_lite.geojson": ("data/Processed/crime_grid_lite.geojson", "application/geo+json"),
-    "/data/processed/crime_grid_lite.geojson": ("data/processed/crime_grid_lite.geojson", "application/geo+json"),
-    "/data/Processed/crime_grid.geojson": ("data/Processed/crime_grid.geojson", "application/geo+json"),
-    "/data/processed/crime_grid.geojson": ("data/processed/crime_grid.geojson", "application/geo+json"),
-    "/data/police_force_areas_wgs84.geojson": ("data/police_force_areas_wgs84.geojson", "application/geo+json"),
+@dataclass(frozen=True)
+class StaticRule:
+    pattern: str
+    content_type: str = ""
+    cache_control: str = "public, max-age=60"
+    precompress: bool = False
+
+
+# First match wins. Patterns are relative to the static root; "**/" spans directories.
+STATIC_ASSET_RULES = (
+    StaticRule("data/**/*.geojson", "application/geo+json", precompress=True),
+    StaticRule("data/*.json", "application/json", precompress=True),
+    StaticRule("data/underground_map/**/*.json", "application/json", precompress=True),
+    StaticRule("data/companies_house_subsets/*.json", "application/json", "public, max-age=3600"),
+    # Dev UX: UI code is revalidated on every load so edits show up immediately, but unchanged files become 304s.
+    StaticRule("index.html", "text/html; charset=utf-8", "no-cache"),
+    StaticRule("sw.js", "text/javascript", "no-cache"),
+    StaticRule("js/**/*.js", "text/javascript", "no-cache"),
+    StaticRule("Control Room_core/**/*.js", "text/javascript", "no-cache"),
+    StaticRule("css/**/*.css", "text/css", "no-cache"),
+)
+
+# Preferred first when the client rates several encodings equally.
+STATIC_ENCODINGS = (("br", ".br"), ("zstd", ".zst"), ("gzip", ".gz"))
+STATIC_STREAM_THRESHOLD = 64 * 1024 * 1024
+STATIC_MMAP_CHUNK_BYTES = 4 * 1024 * 1024
+STATIC_PRECOMPRESS_MIN_BYTES = 4 * 1024
+# Small files without precompressed siblings are gzipped once per mtime and kept in the static cache.
+STATIC_INLINE_GZIP_MAX_BYTES = 2 * 1024 * 1024
+DEFAULT_STATIC_CACHE_MB = int(os.environ.get("CR_STATIC_CACHE_MB", "256") or 256)
+WARMUP_WORKERS = int(os.environ.get("CR_WARMUP_WORKERS", "4") or 4)
+
+CRIME_GRID_CANDIDATES = (
+    "data/processed/crime_grid.geojson",
+    "data/Processed/crime_grid.geojson",
+    "data/processed/crime_grid_lite.geojson",
+    "data/Processed/crime_grid_lite.geojson",
+)
+CRIME_INDEX_CELL_DEG = 0.25
+CRIME_QUERY_DEFAULT_LIMIT = 20000
+
+TILE_LAYERS = {
+    "police_force_areas": ("data/police_force_areas_wgs84.geojson",),
+    "cell_towers": ("data/infastructure/cell_towers_uk.geojson",),
+    "airports": ("data/airports.geojson",),
+    "service_stations": ("data/geojson/service_stations.geojson",),
+    "seaports": ("data/sea_ports_simple.geojson",),
+    "crime": CRIME_GRID_CANDIDATES,
 }
-
-_STATIC_FILE_CACHE: Dict[str, dict] = {}
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+TILE_MAX_ZOOM = 18
+TILE_SIMPLIFY_PX = 0.5
+TILE_SIMPLIFY_MAX_ZOOM = 14
+TILE_INDEX_CELL_DEG = 0.5
+DEFAULT_TILE_CACHE_DIR = os.environ.get("CR_TILE_CACHE_DIR", "")
+
+# Offline indexes over the large local datasets, built by --build-index and read by the /local/* routes.
+DEFAULT_INDEX_DIR = os.environ.get("CR_INDEX_DIR", "")
+COMPANY_SUBSETS_DIR = "data/companies_house_subsets"
+COMPANY_BASIC_DATA_DIR = "data/companies_house_basic_company_data"
+COMPANY_INDEX_FILE = "companies.sqlite"
+PSC_NAMES_DIR = "data/psc_names"
+SEARCH_INDEX_FILE = "search.sqlite"
+SEARCH_MAX_LIMIT = 100
+PSC_BY_COMPANY_DIR = "data/psc_by_company"
+PSC_GRAPH_FILE = "psc_graph.bin"
+PSC_GRAPH_NODES_FILE = "psc_graph.sqlite"
+PSC_GRAPH_HEADER = "<8sQQ"
+PSC_GRAPH_MAGIC = b"CRPSCG1\0"
+PSC_EDGE_NATURE_MASK = 0x3FFFFFFF
+PSC_EDGE_INBOUND = 1 << 30
+PSC_EDGE_CEASED = 1 << 31
+PSC_GRAPH_MAX_DEPTH = 4
+PSC_GRAPH_MAX_NODES = 5000
+ONSPD_DIR = "data/postcode_data"
+POSTCODE_TABLE_FILE = "postcodes.bin"
+ONSPD_HEADER = "<8sQQQQ"
+ONSPD_MAGIC = b"CRONSPD1"
+ONSPD_CODE_FIELDS = ("ctry", "rgn", "laua", "pfa")
+# key, lat/lon in microdegrees, one uint16 per ONSPD_CODE_FIELDS entry, flags
+ONSPD_RECORD = "<8sii4HB"
+ONSPD_FLAG_TERMINATED = 1
+ONSPD_FLAG_NO_LOCATION = 2
+ONSPD_CELL_DEG = 0.005
+ONSPD_NEAREST_MAX_KM = 5.0
+POSTCODE_BATCH_LIMIT = 10000
+FORCE_AREAS_FILE = "data/police_force_areas_wgs84.geojson"
+LOCAL_BATCH_LIMIT = 1000
+
+# (fresh seconds, extra seconds a stale copy may be served while it is refreshed)
+PROXY_CACHE_POLICIES = {
+    "/tfl/": (30, 120),
+    "/postcodes/": (86400, 7 * 86400),
+    "/webtris/": (300, 900),
+    "/ch/": (600, 3600),
+    "/osplaces/": (86400, 7 * 86400),
+}
+DEFAULT_CACHE_MB = int(os.environ.get("CR_CACHE_MB", "64") or 64)
+AUTH_IDENTITY_HEADERS = ("authorization", "x-api-key", "x-apikey", "x-auth-token")
+STREAM_CHUNK_BYTES = 64 * 1024
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/xml", "application/geo+json", "application/javascript", "+xml", "+json")
 
 
 @dataclass
-class DevServerConfig:
-    host: str = DEFAULT_HOST
-    port: int = DEFAULT_PORT
-    root: Path = PROJECT_ROOT
+class _CacheEntry:
+    status: int
+    content_type: str
+    body: bytes
+    stored_at: float
+    fresh_s: float
+    stale_s: float
+    refreshing: bool = False
+
+    def age(self, now: float) -> float:
+        return max(0.0, now - self.stored_at)
+
+
+class ResponseCache:
+    """Byte-bounded LRU of upstream responses with stale-while-revalidate."""
+
+    def __init__(self, max_bytes: int):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self.max_bytes = max(0, int(max_bytes))
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def configure(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max(0, int(max_bytes))
+            self._evict_locked()
+
+    def lookup(self, key: str) -> Tuple[Optional[_CacheEntry], str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, "MISS"
+            age = entry.age(now)
+            if age <= entry.fresh_s:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry, "HIT"
+            if age <= entry.fresh_s + entry.stale_s:
+                self._entries.move_to_end(key)
+                self.stale += 1
+                return entry, "STALE"
+            self._drop_locked(key)
+            self.misses += 1
+            return None, "MISS"
+
+    def store(self, key: str, entry: _CacheEntry):
+        size = len(entry.body)
+        with self._lock:
+            # One oversized body must not flush the whole cache.
+            if not self.enabled or size > self.max_bytes // 8:
+                self._drop_locked(key)
+                return
+            self._drop_locked(key)
+            self._entries[key] = entry
+            self._bytes += size
+            self._evict_locked()
+
+    def begin_refresh(self, key: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.refreshing:
+                return False
+            entry.refreshing = True
+            return True
 
+    def end_refresh(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.refreshing = False
 
-def parse_server_config(argv: Optional[list] = None) -> DevServerConfig:
-    parser = argparse.ArgumentParser(
-        description="Control Room development server"
-    )
-    parser.add_argument("port", nargs="?", type=int, help="Port to bind (default: 8000 or CR_DEV_PORT)")
-    parser.add_argument("--port", dest="override_port", type=int, help="Explicit port override")
-    parser.add_argument("--host", default=DEFAULT_HOST, help="Host/interface to bind (default: %(default)s)")
-    parser.add_argument(
-        "--root",
-        type=Path,
-        default=PROJECT_ROOT,
-        help="Root directory to serve static assets from",
-    )
-    args = parser.parse_args(argv)
-    host = args.host or DEFAULT_HOST
-    positional_port = getattr(args, "port", None)
-    port = args.override_port or positional_port or DEFAULT_PORT
-    root = args.root.resolve()
-    return DevServerConfig(host=host, port=port, root=root)
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+            }
 
+    def _drop_locked(self, key: str):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old.body)
+
+    def _evict_locked(self):
+        while self._entries and self._bytes > self.max_bytes:
+            _, old = self._entries.popitem(last=False)
+            self._bytes -= len(old.body)
+            self.evictions += 1
+
+
+_response_cache = ResponseCache(DEFAULT_CACHE_MB * 1024 * 1024)
+
+DEFAULT_POOL_SIZE = int(os.environ.get("CR_POOL_SIZE", "8") or 8)
+DEFAULT_POOL_IDLE_S = float(os.environ.get("CR_POOL_IDLE_S", "60") or 60)
+DEFAULT_POOL_MAX_LIFETIME_S = float(os.environ.get("CR_POOL_MAX_LIFETIME_S", "300") or 300)
+DEFAULT_UPSTREAM_CONCURRENCY = int(os.environ.get("CR_UPSTREAM_CONCURRENCY", "16") or 16)
+DEFAULT_ENGINE = os.environ.get("CR_ENGINE", "threading").strip().lower() or "threading"
+DEFAULT_WORKERS = int(os.environ.get("CR_WORKERS", "32") or 32)
+_REDIRECT_CODES = {301, 302, 303, 307, 308}
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError, ConnectionAbortedError)
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn: http.client.HTTPConnection):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class PooledResponse:
+    """File-like upstream response; its connection returns to the pool once the body is drained."""
+
+    def __init__(
+        self,
+        pool: "HTTPConnectionPool",
+        key: tuple,
+        pooled: _PooledConnection,
+        resp: http.client.HTTPResponse,
+        url: str,
+        slot: Optional[threading.BoundedSemaphore] = None,
+    ):
+        self._pool = pool
+        self._key = key
+        self._pooled: Optional[_PooledConnection] = pooled
+        self._slot = slot
+        self._resp = resp
+        self.url = url
+        self.status = resp.status
+        self.reason = resp.reason
+        self.headers = resp.headers
+
+    def getcode(self) -> int:
+        return self.status
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        try:
+            data = self._resp.read() if amt is None else self._resp.read(amt)
+        except Exception:
+            self._discard()
+            raise
+        if amt is None or not data or self._resp.isclosed():
+            self._finish()
+        return data
+
+    def close(self):
+        if self._pooled is None:
+            return
+        if self._resp.isclosed():
+            self._finish()
+        else:
+            self._discard()
 
-def b64(s: str) -> str:
-    return base64.b64encode(s.encode("utf-8")).decode("ascii")
+    def _finish(self):
+        pooled, self._pooled = self._pooled, None
+        if pooled is None:
+            return
+        self._release_slot()
+        if self._resp.will_close:
+            pooled.conn.close()
+        else:
+            self._pool._release(self._key, pooled)
+
+    def _discard(self):
+        pooled, self._pooled = self._pooled, None
+        if pooled is not None:
+            self._release_slot()
+            pooled.conn.close()
+
+    def _release_slot(self):
+        slot, self._slot = self._slot, None
+        if slot is not None:
+            slot.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class HTTPConnectionPool:
+    """Per-host HTTP/1.1 keep-alive connections shared by every upstream call."""
+
+    def __init__(self, max_per_host: int, idle_timeout_s: float, max_lifetime_s: float, max_concurrency: int = 0):
+        self._lock = threading.Lock()
+        self._idle: Dict[tuple, list] = {}
+        self._slots: Dict[tuple, threading.BoundedSemaphore] = {}
+        self._ssl_context = ssl.create_default_context()
+        self.max_per_host = max(0, int(max_per_host))
+        self.idle_timeout_s = float(idle_timeout_s)
+        self.max_lifetime_s = float(max_lifetime_s)
+        self.max_concurrency = max(0, int(max_concurrency))
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.rejected = 0
+
+    def configure(self, max_per_host: int, idle_timeout_s: float, max_lifetime_s: float, max_concurrency: Optional[int] = None):
+        with self._lock:
+            self.max_per_host = max(0, int(max_per_host))
+            self.idle_timeout_s = float(idle_timeout_s)
+            self.max_lifetime_s = float(max_lifetime_s)
+            if max_concurrency is not None:
+                self.max_concurrency = max(0, int(max_concurrency))
+                self._slots.clear()
+
+    def urlopen(self, req: urllib.request.Request, timeout: float = 30):
+        """Drop-in for urllib.request.urlopen: follows redirects and raises HTTPError on 4xx/5xx."""
+        url = req.full_url
+        method = req.get_method()
+        body = req.data
+        headers = dict(req.header_items())
+        parts = urlsplit(url)
+        if parts.scheme not in {"http", "https"} or urllib.request.getproxies().get(parts.scheme):
+            return urllib.request.urlopen(req, timeout=timeout)
+        for _ in range(6):
+            resp = self._request(method, url, headers, body, timeout)
+            location = resp.headers.get("Location")
+            if resp.status not in _REDIRECT_CODES or not location:
+                break
+            resp.read()
+            url = urljoin(url, location)
+            if resp.status == 303 or (resp.status in {301, 302} and method == "POST"):
+                method, body = "GET", None
+                headers = {k: v for k, v in headers.items() if k.lower() not in {"content-type", "content-length"}}
+        if resp.status >= 400:
+            # Drain now so the connection and concurrency slot are freed even if the caller ignores the body.
+            raise urllib.error.HTTPError(url, resp.status, resp.reason, resp.headers, io.BytesIO(resp.read()))
+        return resp
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hosts": len(self._idle),
+                "idle": sum(len(v) for v in self._idle.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "rejected": self.rejected,
+                "maxPerHost": self.max_per_host,
+                "maxConcurrency": self.max_concurrency,
+            }
 
+    def _request(self, method: str, url: str, headers: Dict[str, str], body: Optional[bytes], timeout: float) -> PooledResponse:
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, (parts.hostname or "").lower(), port)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        slot = self._slot_for(key)
+        if slot is not None and not slot.acquire(timeout=timeout):
+            with self._lock:
+                self.rejected += 1
+            raise urllib.error.URLError(f"upstream concurrency limit reached for {key[1]}")
+        while True:
+            pooled, reused = self._acquire(key, timeout)
+            try:
+                pooled.conn.request(method, target, body=body, headers=headers)
+                resp = pooled.conn.getresponse()
+            except _STALE_CONNECTION_ERRORS:
+                pooled.conn.close()
+                if reused:
+                    # The server dropped an idle keep-alive connection; retry on the next one.
+                    continue
+                if slot is not None:
+                    slot.release()
+                raise
+            except Exception:
+                pooled.conn.close()
+                if slot is not None:
+                    slot.release()
+                raise
+            return PooledResponse(self, key, pooled, resp, url, slot)
+
+    def _slot_for(self, key: tuple) -> Optional[threading.BoundedSemaphore]:
+        if not self.max_concurrency:
+            return None
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._slots[key] = threading.BoundedSemaphore(self.max_concurrency)
+            return slot
+
+    def _acquire(self, key: tuple, timeout: float) -> Tuple[_PooledConnection, bool]:
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key) or []
+            while idle:
+                pooled = idle.pop()
+                if now - pooled.last_used > self.idle_timeout_s or now - pooled.created_at > self.max_lifetime_s:
+                    self.expired += 1
+                    pooled.conn.close()
+                    continue
+                self.hits += 1
+                if pooled.conn.sock is not None:
+                    pooled.conn.sock.settimeout(timeout)
+                pooled.conn.timeout = timeout
+                return pooled, True
+            self.misses += 1
+        scheme, host, port = key
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(host, port, timeout=timeout, context=self._ssl_context)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        return _PooledConnection(conn), False
+
+    def _release(self, key: tuple, pooled: _PooledConnection):
+        pooled.last_used = time.monotonic()
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if pooled.last_used - pooled.created_at <= self.max_lifetime_s and len(idle) < self.max_per_host:
+                idle.append(pooled)
+                return
+        pooled.conn.close()
+
+
+_upstream_pool = HTTPConnectionPool(
+    DEFAULT_POOL_SIZE, DEFAULT_POOL_IDLE_S, DEFAULT_POOL_MAX_LIFETIME_S, DEFAULT_UPSTREAM_CONCURRENCY
+)
+
+
+class _InFlightCall:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Collapses concurrent calls sharing a key onto one execution and shares its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _InFlightCall] = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key: str, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _InFlightCall()
+                self._calls[key] = call
+                self.executed += 1
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
 
-def load_env_file():
-    env_path = PROJECT_ROOT / ".env"
-    if env_path.exists():
-        print(f"Loading environment from: {env_path}")
-        with open(env_path, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith("#") and "=" in line:
-                    key, value = line.split("=", 1)
-                    os.environ[key.strip()] = value.strip()
-                    if key.strip() == "CH_API_KEY":
-                        print(f"CH_API_KEY loaded: {value.strip()[:8]}...")
-                    if key.strip() == "OS_PLACES_API_KEY":
-                        print(f"OS_PLACES_API_KEY loaded: {value.strip()[:8]}...")
-                    if key.strip() == "NRE_LDBWS_TOKEN":
-                        print(f"NRE_LDBWS_TOKEN loaded: {value.strip()[:8]}...")
-                    if key.strip() == "DVLA_API_KEY":
-                        print(f"DVLA_API_KEY loaded: {value.strip()[:8]}...")
-    else:
-        print(f"Warning: No .env file found at {env_path}")
-        print("Set CH_API_KEY environment variable or create .env file")
+    def stats(self) -> dict:
+        with self._lock:
+            return {"inFlight": len(self._calls), "executed": self.executed, "shared": self.shared}
 
 
-class Handler(SimpleHTTPRequestHandler):
-    def end_headers(self):
-        # Dev UX: always disable browser caching for HTML/CSS/JS so UI changes are immediate.
-        path = urlsplit(getattr(self, "path", "")).path.lower()
-        if path == "/" or path.endswith(".html") or path.endswith(".css") or path.endswith(".js"):
-            self.send_header("Cache-Control", "no-store, no-cache, must-revalidate, max-age=0")
-            self.send_header("Pragma", "no-cache")
-            self.send_header("Expires", "0")
-        super().end_headers()
+_upstream_flights = SingleFlight()
 
-    def _serve_accelerated_static(self, route_path: str) -> bool:
-        mapping = STATIC_ACCELERATED_FILES.get(route_path)
-        if not mapping:
-            return False
-        rel_path, mime = mapping
-        try:
-            fs_path = (PROJECT_ROOT / rel_path).resolve(strict=True)
-        except FileNotFoundError:
-            return False
-        if not str(fs_path).startswith(str(PROJECT_ROOT)):
-            return False
-        stat = fs_path.stat()
-        # For very large files, stream directly to avoid huge in-memory payloads
-        # and single-write truncation risk on buffered sockets.
-        if stat.st_size >= 64 * 1024 * 1024:
-            self.send_response(200)
-            self.send_header("Content-Type", mime)
-            self.send_header("Cache-Control", "public, max-age=60")
-            self.send_header("Content-Length", str(stat.st_size))
-            self.end_headers()
-            with fs_path.open("rb") as f:
-                while True:
-                    chunk = f.read(1024 * 1024)
-                    if not chunk:
-                        break
-                    self.wfile.write(chunk)
-            return True
 
-        cached = _STATIC_FILE_CACHE.get(route_path)
-        mtime = stat.st_mtime
-        if not cached or cached.get("mtime") != mtime:
-            data = fs_path.read_bytes()
-            gz = gzip.compress(data)
-            cached = {
-                "mtime": mtime,
-                "raw": data,
-                "gzip": gz,
-                "type": mime,
+def http_get_json_gzip(url: str, timeout_s: int = 15):
+    """GET a JSON document with FR24-style browser headers; concurrent identical calls share one fetch. None on failure."""
+    return _upstream_flights.do("json:" + url, lambda: _http_get_json_gzip_uncoalesced(url, timeout_s))
+
+
+def _http_get_json_gzip_uncoalesced(url: str, timeout_s: int):
+    try:
+        req = urllib.request.Request(
+            url,
+            headers={
+                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0 Safari/537.36",
+                "Accept": "application/json, text/plain, */*",
+                "Accept-Encoding": "gzip",
+                "Referer": "https://www.flightradar24.com/",
+                "Origin": "https://www.flightradar24.com",
+            },
+        )
+        with _upstream_pool.urlopen(req, timeout=timeout_s) as resp:
+            raw = resp.read()
+            enc = (resp.headers.get("Content-Encoding") or "").strip().lower()
+            if enc == "gzip":
+                raw = gzip.decompress(raw)
+        return json.loads(raw.decode("utf-8", errors="replace"))
+    except Exception:
+        return None
+
+
+def fr24_feed_url(bounds, limit: int = FR24_FEED_LIMIT) -> str:
+    try:
+        n, s, w, e = bounds
+    except Exception:
+        n, s, w, e = FR24_DEFAULT_BOUNDS
+    params = {
+        "faa": "1",
+        "satellite": "1",
+        "mlat": "1",
+        "flarm": "1",
+        "adsb": "1",
+        "gnd": "1",
+        "air": "1",
+        "vehicles": "0",
+        "estimated": "1",
+        "maxage": "14400",
+        "gliders": "0",
+        "stats": "1",
+        "limit": str(limit),
+        "bounds": f"{n},{s},{w},{e}",
+    }
+    return FR24_FEED_URL + "?" + urlencode(params)
+
+
+def fr24_extract_flights(payload) -> list:
+    flights = []
+    if not isinstance(payload, dict):
+        return flights
+    for fid, info in payload.items():
+        fid_s = str(fid or "")
+        if not fid_s or not fid_s[0].isdigit():
+            continue
+        if not isinstance(info, list) or len(info) < 17:
+            continue
+
+        def at(i):
+            try:
+                return info[i]
+            except Exception:
+                return None
+
+        lat = at(1)
+        lon = at(2)
+        if lat is None or lon is None:
+            continue
+        flights.append(
+            {
+                "id": fid_s,
+                "icao24": at(0),
+                "lat": lat,
+                "lon": lon,
+                "heading": at(3),
+                "altitude": at(4),
+                "speed": at(5),
+                "squawk": at(6),
+                "aircraft": at(8),
+                "registration": at(9),
+                "time": at(10),
+                "origin": at(11),
+                "destination": at(12),
+                "number": at(13),
+                "onGround": at(14),
+                "verticalSpeed": at(15),
+                "callsign": at(16),
+                "airlineIcao": at(18),
             }
-            _STATIC_FILE_CACHE[route_path] = cached
-        accepts_gzip = "gzip" in (self.headers.get("Accept-Encoding") or "")
-        payload = cached["gzip"] if accepts_gzip else cached["raw"]
-        self.send_response(200)
-        self.send_header("Content-Type", cached["type"])
-        if accepts_gzip:
-            self.send_header("Content-Encoding", "gzip")
-        self.send_header("Cache-Control", "public, max-age=60")
-        self.send_header("Content-Length", str(len(payload)))
-        self.end_headers()
-        self.wfile.write(payload)
+        )
+    return flights
+
+
+def fr24_in_uk_scope(f: dict) -> bool:
+    """The ukOnly filter for one flight: inside UK_FIR_POLYGON, or unpositioned but flying to/from a UK airport.
+    FlightFilterIndex applies the same rule to whole snapshots."""
+    lat, lon = f.get("lat"), f.get("lon")
+    if type(lat) in (int, float) and type(lon) in (int, float):
+        west, south, east, north = UK_FIR_BBOX
+        return west <= lon <= east and south <= lat <= north and _point_in_ring(lon, lat, UK_FIR_POLYGON)
+    return (
+        str(f.get("origin") or "").strip().upper() in UK_AIRPORT_IATA
+        or str(f.get("destination") or "").strip().upper() in UK_AIRPORT_IATA
+    )
+
+
+def flights_columnar(flights: list) -> dict:
+    """Parallel arrays per field, with aircraft types, airports and airlines dictionary-encoded as indexes."""
+    columns: Dict[str, list] = {}
+    for name in FLIGHT_TEXT_COLUMNS:
+        columns[name] = ["" if v is None else str(v) for v in (f.get(name) for f in flights)]
+    for name in FLIGHT_NUMERIC_COLUMNS:
+        columns[name] = [v if type(v) in (int, float) else None for v in (f.get(name) for f in flights)]
+    columns["onGround"] = [1 if f.get("onGround") else 0 for f in flights]
+    lookup: Dict[str, Dict[str, int]] = {}
+    for name, table in FLIGHT_CODED_COLUMNS:
+        codes = lookup.setdefault(table, {})
+        columns[name] = [codes.setdefault("" if v is None else str(v), len(codes)) for v in (f.get(name) for f in flights)]
+    return {"count": len(flights), "columns": columns, "dicts": {table: list(codes) for table, codes in lookup.items()}}
+
+
+def flights_binary(meta: dict, flights: list) -> bytes:
+    """FLIGHT_BINARY_MAGIC, uint32 header length, JSON header (meta, text columns, dicts, layout) padded to
+    4 bytes, then little-endian packed columns in header["layout"] order: float32 (NaN = missing), uint32
+    time, uint16 dictionary indexes, uint8 onGround."""
+    table = flights_columnar(flights)
+    columns = table["columns"]
+    layout = []
+    blobs = []
+    for name in FLIGHT_NUMERIC_COLUMNS:
+        kind = "u32" if name == "time" else "f32"
+        values = columns[name]
+        if kind == "f32":
+            packed = array.array("f", (float("nan") if v is None else float(v) for v in values))
+        else:
+            packed = array.array("I", (0 if v is None or v < 0 else min(int(v), 0xFFFFFFFF) for v in values))
+        layout.append([name, kind])
+        blobs.append(packed)
+    for name, _ in FLIGHT_CODED_COLUMNS:
+        layout.append([name, "u16"])
+        blobs.append(array.array("H", columns[name]))
+    layout.append(["onGround", "u8"])
+    blobs.append(array.array("B", columns["onGround"]))
+    header = dict(meta, count=table["count"], layout=layout, dicts=table["dicts"], text={name: columns[name] for name in FLIGHT_TEXT_COLUMNS})
+    head = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    head += b" " * (-(len(FLIGHT_BINARY_MAGIC) + 4 + len(head)) % 4)
+    out = bytearray(FLIGHT_BINARY_MAGIC)
+    out += struct.pack("<I", len(head))
+    out += head
+    for blob in blobs:
+        if sys.byteorder == "big":
+            blob.byteswap()
+        out += blob.tobytes()
+        out += b"\0" * (-len(out) % 4)
+    return bytes(out)
+
+
+def _point_in_ring(lon: float, lat: float, ring) -> bool:
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        (x1, y1), (x2, y2) = ring[i], ring[j]
+        if (y1 > lat) != (y2 > lat) and lon < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+        j = i
+    return inside
+
+
+class FlightFilterIndex:
+    """Column view of one poller snapshot for per-viewport filtering. Positions, UK FIR membership, UK-airport
+    membership and change versions are computed once per tick; each query is then only bbox comparisons and
+    mask arithmetic. Uses NumPy when installed and plain lists otherwise, with identical results."""
+
+    def __init__(self, flights: Dict[str, dict], changed_at: Dict[str, int]):
+        self.ids = list(flights)
+        self.items = list(flights.values())
+        lat = [f.get("lat") for f in self.items]
+        lon = [f.get("lon") for f in self.items]
+        positioned = [type(a) in (int, float) and type(b) in (int, float) for a, b in zip(lat, lon)]
+        uk_airport = [
+            str(f.get("origin") or "").strip().upper() in UK_AIRPORT_IATA
+            or str(f.get("destination") or "").strip().upper() in UK_AIRPORT_IATA
+            for f in self.items
+        ]
+        versions = [changed_at[fid] for fid in self.ids]
+        if np is not None:
+            self.positioned = np.array(positioned, dtype=bool)
+            self.lat = np.array([a if p else np.nan for a, p in zip(lat, positioned)], dtype=np.float64)
+            self.lon = np.array([b if p else np.nan for b, p in zip(lon, positioned)], dtype=np.float64)
+            self.versions = np.array(versions, dtype=np.int64)
+            in_fir = np.zeros(len(self.ids), dtype=bool)
+            x, y = self.lon, self.lat
+            ring = UK_FIR_POLYGON
+            with np.errstate(invalid="ignore"):
+                candidate = self.positioned & (x >= UK_FIR_BBOX[0]) & (x <= UK_FIR_BBOX[2]) & (y >= UK_FIR_BBOX[1]) & (y <= UK_FIR_BBOX[3])
+                for (x1, y1), (x2, y2) in zip(ring, ring[-1:] + ring[:-1]):
+                    if y1 == y2:
+                        continue
+                    crosses = ((y1 > y) != (y2 > y)) & (x < x1 + (y - y1) * (x2 - x1) / (y2 - y1))
+                    in_fir ^= crosses
+            self.uk = (in_fir & candidate) | (~self.positioned & np.array(uk_airport, dtype=bool))
+        else:
+            self.positioned = positioned
+            self.lat, self.lon = lat, lon
+            self.versions = versions
+            west, south, east, north = UK_FIR_BBOX
+            self.uk = [
+                (west <= b <= east and south <= a <= north and _point_in_ring(b, a, UK_FIR_POLYGON)) if p else u
+                for a, b, p, u in zip(lat, lon, positioned, uk_airport)
+            ]
+
+    def mask(self, bounds: Optional[Tuple[float, float, float, float]], uk_only: bool):
+        """Rows inside bounds (n, s, w, e; unpositioned rows always pass) and, with uk_only, in UK scope."""
+        if np is not None:
+            keep = np.ones(len(self.ids), dtype=bool)
+            if bounds is not None:
+                n, s, w, e = bounds
+                with np.errstate(invalid="ignore"):
+                    keep = ~self.positioned | ((self.lat >= s) & (self.lat <= n) & (self.lon >= w) & (self.lon <= e))
+            if uk_only:
+                keep &= self.uk
+            return keep
+        keep = [True] * len(self.ids)
+        if bounds is not None:
+            n, s, w, e = bounds
+            keep = [not p or (s <= a <= n and w <= b <= e) for a, b, p in zip(self.lat, self.lon, self.positioned)]
+        if uk_only:
+            keep = [k and u for k, u in zip(keep, self.uk)]
+        return keep
+
+    def select(self, bounds, uk_only: bool, since: Optional[int] = None) -> Tuple[list, list]:
+        """(flights, ids changed since `since` that now fall outside the view); since=None selects all."""
+        keep = self.mask(bounds, uk_only)
+        if np is not None:
+            if since is None:
+                return [self.items[i] for i in np.flatnonzero(keep)], []
+            changed = self.versions > since
+            return [self.items[i] for i in np.flatnonzero(changed & keep)], [self.ids[i] for i in np.flatnonzero(changed & ~keep)]
+        if since is None:
+            return [f for f, k in zip(self.items, keep) if k], []
+        out, gone = [], []
+        for fid, f, k, v in zip(self.ids, self.items, keep, self.versions):
+            if v > since:
+                (out if k else gone).append(f if k else fid)
+        return out, gone
+
+
+class FlightPoller:
+    """Fetches one FR24 feed for a fixed box every interval and keeps the result as a snapshot keyed by flight id,
+    so upstream load is independent of how many clients are watching. Each tick bumps a version; per-flight
+    change versions plus removal tombstones let clients holding a cursor fetch only what changed. The loop
+    starts on first demand and parks after idle_s without requests."""
+
+    def __init__(self, bounds, interval_s: float, idle_s: float = FR24_POLL_IDLE_S, history: int = FR24_DELTA_HISTORY):
+        self.bounds = tuple(bounds)
+        n, s, w, e = self.bounds
+        self.tiles = [(n, FR24_POLL_SPLIT_LAT, w, e), (FR24_POLL_SPLIT_LAT, s, w, e)] if s < FR24_POLL_SPLIT_LAT < n else [self.bounds]
+        self.truncated_tiles = 0
+        self.tile_requests = 0
+        self._splits: Dict[tuple, list] = {}
+        self._fetcher = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cr-fr24-tile")
+        self.interval_s = float(interval_s)
+        self.idle_s = float(idle_s)
+        self.history = int(history)
+        self.boot = format(int(time.time()), "x")
+        self.version = 0
+        self.flights: Dict[str, dict] = {}
+        self.changed_at: Dict[str, int] = {}
+        self.index = FlightFilterIndex({}, {})
+        self.removed: "OrderedDict[str, int]" = OrderedDict()
+        self.oldest = 0
+        self.updated_at: Optional[float] = None
+        self.ticks = 0
+        self.failures = 0
+        self.last_error = ""
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        # Set after every poll attempt, failed or not, so waiting requests do not sit out an upstream outage.
+        self._attempted = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_demand = 0.0
+        self._listeners: list = []
+        self._encoded: Dict[tuple, tuple] = {}
+        self.encode_hits = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval_s > 0
+
+    def covers(self, n: float, s: float, w: float, e: float) -> bool:
+        bn, bs, bw, be = self.bounds
+        return bs <= s and n <= bn and bw <= w and e <= be
+
+    def touch(self, wait_s: float = FR24_FIRST_SNAPSHOT_WAIT_S) -> bool:
+        """Record demand, start the loop if parked, and wait up to wait_s for the first poll attempt to finish.
+        True once a snapshot exists; False straight away when that attempt failed."""
+        with self._lock:
+            self._last_demand = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name="cr-fr24-poller")
+                self._thread.start()
+        if not self._ready.is_set():
+            self._attempted.wait(wait_s)
+        return self._ready.is_set()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if time.monotonic() - self._last_demand >= self.idle_s:
+                    self._thread = None
+                    self._ready.clear()
+                    self._attempted.clear()
+                    return
+            started = time.monotonic()
+            try:
+                self.poll_once()
+            except Exception as exc:
+                self.failures += 1
+                self.last_error = f"FlightRadar24 poll failed: {exc}"
+            finally:
+                self._attempted.set()
+            time.sleep(max(0.0, self.interval_s - (time.monotonic() - started)))
+
+    def poll_once(self) -> bool:
+        merged: Dict[str, dict] = {}
+        counts: Dict[tuple, int] = {}
+        truncated = 0
+        issued = 0
+        pending = list(self.tiles)
+        while pending:
+            payloads = list(self._fetcher.map(lambda tile: http_get_json_gzip(fr24_feed_url(tile), timeout_s=15), pending))
+            issued += len(pending)
+            if not all(isinstance(payload, dict) for payload in payloads):
+                # A partial snapshot would report every flight in the missing tiles as removed.
+                self.failures += 1
+                self.last_error = "FlightRadar24 fetch failed"
+                return False
+            split = []
+            for tile, payload in zip(pending, payloads):
+                flights = fr24_extract_flights(payload)
+                for f in flights:
+                    merged[f["id"]] = f
+                counts[tile] = len(flights)
+                if len(flights) < FR24_FEED_LIMIT:
+                    continue
+                if issued + len(split) + 4 > FR24_POLL_MAX_TILES:
+                    truncated += 1
+                    continue
+                n, s, w, e = tile
+                lat, lon = (n + s) / 2, (w + e) / 2
+                quadrants = [(n, lat, w, lon), (n, lat, lon, e), (lat, s, w, lon), (lat, s, lon, e)]
+                at = self.tiles.index(tile)
+                self.tiles[at:at + 1] = quadrants
+                self._splits[tile] = quadrants
+                split += quadrants
+            pending = split
+        self._merge_quiet_tiles(counts)
+        self.truncated_tiles = truncated
+        self.tile_requests = issued
+        self.apply(merged)
         return True
 
-    def _haversine_km(self, lat1, lon1, lat2, lon2):
-        import math
-        r = 6371.0
-        d_lat = math.radians(lat2 - lat1)
-        d_lon = math.radians(lon2 - lon1)
-        a = (
-            math.sin(d_lat / 2) ** 2
-            + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(d_lon / 2) ** 2
-        )
-        return 2 * r * math.asin(math.sqrt(a))
+    def _merge_quiet_tiles(self, counts: Dict[tuple, int]) -> None:
+        """Fold quadrants back into their parent once traffic there has dropped, so one busy tick does not raise
+        the per-tick request count for good. Repeats so a quiet box collapses back to the base tiles."""
+        merged = True
+        while merged:
+            merged = False
+            for parent, quadrants in list(self._splits.items()):
+                if any(q in self._splits or q not in counts for q in quadrants):
+                    continue
+                total = sum(counts[q] for q in quadrants)
+                if total >= FR24_POLL_MERGE_BELOW:
+                    continue
+                at = self.tiles.index(quadrants[0])
+                self.tiles = [t for t in self.tiles if t not in quadrants]
+                self.tiles.insert(at, parent)
+                del self._splits[parent]
+                counts[parent] = total
+                merged = True
+
+    def apply(self, flights: Dict[str, dict]):
+        """Publish a new snapshot. The flight dicts are never mutated afterwards, so readers can hold references."""
+        with self._lock:
+            version = self.version + 1
+            previous, previous_changed = self.flights, self.changed_at
+            changed_at = {}
+            for fid, f in flights.items():
+                changed_at[fid] = previous_changed[fid] if previous.get(fid) == f else version
+                self.removed.pop(fid, None)
+            for fid in previous:
+                if fid not in flights:
+                    self.removed[fid] = version
+            floor = version - self.history
+            while self.removed and next(iter(self.removed.values())) <= floor:
+                self.removed.popitem(last=False)
+            self.oldest = max(self.oldest, floor)
+            index = FlightFilterIndex(flights, changed_at)
+            self.flights, self.changed_at, self.index, self.version = flights, changed_at, index, version
+            self._encoded = {}
+            self.updated_at = time.time()
+            self.ticks += 1
+            self.last_error = ""
+            listeners = list(self._listeners)
+        self._ready.set()
+        for listener in listeners:
+            try:
+                listener(self)
+            except Exception as exc:
+                print(f"!! Flight poller listener failed: {exc}", file=sys.stderr)
+
+    def add_listener(self, fn: Callable[["FlightPoller"], None]):
+        """fn(poller) runs on the poller thread after every published snapshot."""
+        with self._lock:
+            self._listeners.append(fn)
+
+    def remove_listener(self, fn: Callable[["FlightPoller"], None]):
+        with self._lock:
+            if fn in self._listeners:
+                self._listeners.remove(fn)
+
+    def encoded(self, key: tuple, cursor: str, build: Callable[[], tuple]) -> tuple:
+        """Response bodies for identical queries against the same snapshot are encoded once per tick."""
+        with self._lock:
+            if cursor != self.cursor():
+                return build()
+            hit = self._encoded.get(key)
+            if hit is not None:
+                self.encode_hits += 1
+                return hit
+            memo = self._encoded
+        value = build()
+        with self._lock:
+            if memo is self._encoded and len(memo) < FLIGHT_ENCODE_MEMO_MAX:
+                memo[key] = value
+        return value
+
+    def snapshot(self) -> Tuple[Dict[str, dict], Optional[float]]:
+        with self._lock:
+            return self.flights, self.updated_at
+
+    def cursor(self, version: Optional[int] = None) -> str:
+        return f"{self.boot}.{self.version if version is None else version}"
+
+    def _parse_cursor(self, since: str) -> Optional[int]:
+        boot, _, version = str(since or "").partition(".")
+        if boot != self.boot or not version.isdigit():
+            return None
+        return int(version)
+
+    def query(self, bounds: Optional[Tuple[float, float, float, float]], uk_only: bool = False, since: str = "") -> dict:
+        """Flights inside bounds (n, s, w, e) and, with uk_only, in UK scope. With a valid since cursor only
+        flights changed after it are returned, and flights that disappeared or left the view are listed in removed."""
+        with self._lock:
+            index, version = self.index, self.version
+            base = self._parse_cursor(since)
+            delta = base is not None and self.oldest <= base <= version
+            removed = [fid for fid, v in self.removed.items() if v > base] if delta else []
+            updated_at = self.updated_at
+        out, gone = index.select(bounds, uk_only, base if delta else None)
+        return {"cursor": self.cursor(version), "delta": delta, "flights": out, "removed": removed + gone, "updatedAt": updated_at}
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "running": self._thread is not None,
+            "intervalS": self.interval_s,
+            "bounds": dict(zip(("n", "s", "w", "e"), self.bounds)),
+            "tiles": len(self.tiles),
+            "tileRequests": self.tile_requests,
+            "truncatedTiles": self.truncated_tiles,
+            "flights": len(self.flights),
+            "filter": "numpy" if np is not None else "python",
+            "ticks": self.ticks,
+            "encodeHits": self.encode_hits,
+            "failures": self.failures,
+            "lastError": self.last_error,
+            "updatedAt": self.updated_at,
+            "cursor": self.cursor(),
+        }
 
-    def _load_station_catalog(self):
-        if _station_catalog_cache["loaded"]:
-            return _station_catalog_cache["items"]
-        req = urllib.request.Request(UK_RAIL_STATIONS_URL)
-        req.add_header("Accept", "application/json")
-        req.add_header("User-Agent", "ControlRoom/1.0 (+https://localhost)")
-        with urllib.request.urlopen(req, timeout=25) as resp:
-            raw = json.loads(resp.read().decode("utf-8", errors="replace"))
-        items = []
-        if isinstance(raw, list):
-            for r in raw:
-                crs = str(r.get("crsCode") or "").strip().upper()
-                name = str(r.get("stationName") or "").strip()
-                if len(crs) == 3 and name:
-                    items.append(
-                        {
-                            "crs": crs,
-                            "name": name,
-                            "country": str(r.get("constituentCountry") or "").strip().lower(),
-                            "lat": r.get("lat"),
-                            "lon": r.get("long"),
-                        }
-                    )
-        _station_catalog_cache["loaded"] = True
-        _station_catalog_cache["items"] = items
-        return items
 
-    def _send_json_error(self, status: int, payload: bytes):
-        self.send_response(status)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.end_headers()
-        self.wfile.write(payload)
+_flight_poller = FlightPoller(FR24_POLL_BOUNDS, FR24_POLL_INTERVAL_S)
 
-    def _proxy_get(self, upstream_url: str, headers: Optional[Dict[str, str]] = None):
-        req = urllib.request.Request(upstream_url)
-        req.add_header("User-Agent", "ControlRoom/1.0 (+https://localhost)")
-        if headers:
-            for key, value in headers.items():
-                req.add_header(key, value)
 
-        try:
-            with urllib.request.urlopen(req, timeout=30) as resp:
-                body = resp.read()
-                self.send_response(resp.status)
-                self.send_header("Content-Type", resp.headers.get("Content-Type", "application/json"))
-                self.send_header("Access-Control-Allow-Origin", "*")
-                self.end_headers()
-                self.wfile.write(body)
-                return True
-        except urllib.error.HTTPError as e:
-            body = e.read() if hasattr(e, "read") else b"{}"
-            self._send_json_error(e.code, body)
-            return True
-        except Exception as e:
-            payload = ("{\"error\":\"Upstream failed\",\"detail\":\"%s\"}" % str(e)).encode("utf-8")
-            self._send_json_error(502, payload)
-            return True
+class TrackRing:
+    """Fixed-capacity ring of (ts, lat, lon, altitude, speed, heading) points in one flat array of doubles."""
 
-    def _send_json(self, payload, status: int = 200):
-        body = json.dumps(payload).encode("utf-8")
-        self.send_response(status)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.end_headers()
-        self.wfile.write(body)
+    __slots__ = ("data", "cap", "start", "size", "callsign", "last_seen")
 
-    def _read_json_response(self, resp) -> Optional[dict]:
-        try:
-            raw = resp.read().decode("utf-8", errors="replace")
-            data = json.loads(raw)
-            return data if isinstance(data, dict) else None
-        except Exception:
-            return None
+    def __init__(self, cap: int):
+        self.data = array.array("d", bytes(8 * FLIGHT_TRACK_FIELDS * cap))
+        self.cap = cap
+        self.start = 0
+        self.size = 0
+        self.callsign = ""
+        self.last_seen = 0.0
 
-    def _is_allowed_raildata_url(self, url: str) -> bool:
-        try:
-            parsed = urlsplit(str(url or "").strip())
-            if parsed.scheme not in {"http", "https"}:
-                return False
-            host = (parsed.hostname or "").lower()
-            return host in RAILDATA_ALLOWED_HOSTS
-        except Exception:
-            return False
+    def append(self, point: tuple) -> Optional[float]:
+        """Store point; returns the timestamp of the point it overwrote, if any."""
+        dropped = None
+        if self.size == self.cap:
+            dropped = self.data[self.start * FLIGHT_TRACK_FIELDS]
+            self.start = (self.start + 1) % self.cap
+            self.size -= 1
+        pos = ((self.start + self.size) % self.cap) * FLIGHT_TRACK_FIELDS
+        self.data[pos:pos + FLIGHT_TRACK_FIELDS] = array.array("d", point)
+        self.size += 1
+        return dropped
 
-    def _render_url_template(self, url_template: str, values: Dict[str, str]):
-        url = str(url_template or "")
-        needed = [part[1] for part in re.findall(r"(\{([A-Za-z0-9_]+)\})", url)]
-        missing = []
-        for key in needed:
-            value = str(values.get(key, "")).strip()
-            if not value:
-                missing.append(key)
-                continue
-            url = url.replace(f"{{{key}}}", quote_plus(value))
-        return url, missing
+    def last(self) -> Optional[tuple]:
+        if not self.size:
+            return None
+        pos = ((self.start + self.size - 1) % self.cap) * FLIGHT_TRACK_FIELDS
+        return tuple(self.data[pos:pos + FLIGHT_TRACK_FIELDS])
 
-    def _proxy_raildata_url(self, upstream_url: str, auth_mode: str = "token", apikey_env: str = "RAILDATA_API_KEY"):
-        if not self._is_allowed_raildata_url(upstream_url):
-            self._send_json(
-                {
-                    "error": "Blocked RailData URL host",
-                    "url": upstream_url,
-                    "allowed_hosts": sorted(RAILDATA_ALLOWED_HOSTS),
-                },
-                status=400,
-            )
-            return True
+    def points(self, t0: float, t1: float):
+        for k in range(self.size):
+            pos = ((self.start + k) % self.cap) * FLIGHT_TRACK_FIELDS
+            if t0 <= self.data[pos] <= t1:
+                yield tuple(self.data[pos:pos + FLIGHT_TRACK_FIELDS])
 
-        req = urllib.request.Request(upstream_url)
-        req.add_header("Accept", "application/json, application/xml, text/xml, text/plain, application/octet-stream")
-        req.add_header("User-Agent", "ControlRoom/1.0 (+https://localhost)")
 
-        if auth_mode == "token":
-            token, err = self._get_raildata_auth_token()
-            if err:
-                self._send_json(err, status=500)
-                return True
-            req.add_header("X-Auth-Token", token or "")
-        elif auth_mode == "apikey":
-            api_key = os.environ.get(apikey_env, "").strip()
-            if not api_key:
-                self._send_json({"error": f"{apikey_env} env var not set"}, status=500)
-                return True
-            req.add_header("x-apikey", api_key)
-        elif auth_mode == "basic":
-            username = os.environ.get("RAILDATA_USERNAME", "").strip()
-            password = os.environ.get("RAILDATA_PASSWORD", "").strip()
-            if not username or not password:
-                self._send_json({"error": "RAILDATA_USERNAME and RAILDATA_PASSWORD required for basic auth endpoint"}, status=500)
-                return True
-            req.add_header("Authorization", f"Basic {b64(f'{username}:{password}')}")
+_FLIGHT_TRACK_RECORD = struct.Struct("<16sdffiHH8s")
+# Missing-value markers in the packed record: altitude can legitimately be negative (Schiphol sits at -11 ft).
+_FLIGHT_TRACK_NO_ALTITUDE = -(2 ** 31)
+_FLIGHT_TRACK_NO_WORD = 0xFFFF
 
-        try:
-            with urllib.request.urlopen(req, timeout=40) as resp:
-                body = resp.read()
-                self.send_response(resp.status)
-                self.send_header("Content-Type", resp.headers.get("Content-Type", "application/octet-stream"))
-                self.send_header("Access-Control-Allow-Origin", "*")
-                self.end_headers()
-                self.wfile.write(body)
-                return True
-        except urllib.error.HTTPError as e:
-            body = e.read() if hasattr(e, "read") else b"{}"
-            if e.code == 401 and auth_mode == "token" and not os.environ.get("RAILDATA_AUTH_TOKEN", "").strip():
-                _raildata_auth_cache["token"] = ""
-            self._send_json_error(e.code, body)
-            return True
-        except Exception as e:
-            self._send_json({"error": "RailData upstream failed", "detail": str(e)}, status=502)
-            return True
 
-    def _get_raildata_auth_token(self) -> Tuple[Optional[str], Optional[dict]]:
-        direct = os.environ.get("RAILDATA_AUTH_TOKEN", "").strip()
-        if direct:
-            return direct, None
+def _track_extras(alt: float, speed: float, heading: float) -> tuple:
+    """Altitude, speed and heading at the precision the segment log stores them (ints, None when missing), so a
+    point reads back the same whether a window is answered from memory or from disk."""
+    return (
+        None if alt != alt else int(alt),
+        None if speed != speed else min(max(int(speed), 0), _FLIGHT_TRACK_NO_WORD - 1),
+        None if heading != heading else int(heading) % 360,
+    )
 
-        cached = _raildata_auth_cache.get("token", "").strip()
-        if cached:
-            return cached, None
 
-        username = os.environ.get("RAILDATA_USERNAME", "").strip()
-        password = os.environ.get("RAILDATA_PASSWORD", "").strip()
-        if not username or not password:
-            return None, {"error": "RAILDATA credentials not set (use RAILDATA_AUTH_TOKEN or RAILDATA_USERNAME/RAILDATA_PASSWORD)"}
+class FlightTrackStore:
+    """Position history fed by the shared flight poller: per-aircraft rings in memory (bounded by
+    FLIGHT_TRACK_MEMORY_MB, least recently seen aircraft evicted first) and an append-only log of fixed-width
+    records in hourly segment files. Windows the rings still fully cover are answered from memory, older ones
+    by scanning the segments, whose records are in tick order so each file is bisected on time."""
+
+    def __init__(self, directory: Optional[Path], ring_points: int = FLIGHT_TRACK_RING_POINTS,
+                 memory_mb: float = FLIGHT_TRACK_MEMORY_MB, retention_s: float = FLIGHT_TRACK_RETENTION_S):
+        self.directory = directory
+        self.ring_points = max(2, int(ring_points))
+        self.max_aircraft = max(1, int(memory_mb * 1024 * 1024 / (8 * FLIGHT_TRACK_FIELDS * self.ring_points)))
+        self.retention_s = retention_s
+        self.rings: "OrderedDict[str, TrackRing]" = OrderedDict()
+        self.started_at = time.time()
+        # Memory answers windows starting at or after this; raised whenever a ring overwrites or an aircraft is evicted.
+        self.complete_since = self.started_at
+        self.points = 0
+        self.written = 0
+        self._lock = threading.Lock()
+        self._segment: Optional[Tuple[int, object]] = None
+
+    def attach(self, poller: "FlightPoller"):
+        """Record every tick and keep the poller running even with no viewers."""
+        poller.add_listener(self.on_tick)
+        poller.idle_s = float("inf")
+        poller.touch(wait_s=0)
+
+    def on_tick(self, poller: "FlightPoller"):
+        flights, ts = poller.snapshot()
+        self.record(ts or time.time(), flights.values())
+
+    def record(self, ts: float, flights) -> int:
+        rows = []
+        with self._lock:
+            for f in flights:
+                lat, lon = f.get("lat"), f.get("lon")
+                if type(lat) not in (int, float) or type(lon) not in (int, float):
+                    continue
+                point = (ts, lat, lon, *(float(v) if type(v) in (int, float) else math.nan for v in (f.get("altitude"), f.get("speed"), f.get("heading"))))
+                fid = str(f.get("id") or "")
+                ring = self.rings.get(fid)
+                if ring is None:
+                    ring = self.rings[fid] = TrackRing(self.ring_points)
+                    if len(self.rings) > self.max_aircraft:
+                        _, evicted = self.rings.popitem(last=False)
+                        self.complete_since = max(self.complete_since, evicted.last_seen)
+                else:
+                    self.rings.move_to_end(fid)
+                    previous = ring.last()
+                    if (
+                        previous is not None and previous[1:3] == (lat, lon)
+                        and ts - previous[0] < FLIGHT_TRACK_KEYFRAME_S and ts // 3600 == previous[0] // 3600
+                    ):
+                        ring.last_seen = ts
+                        continue
+                ring.callsign = str(f.get("callsign") or f.get("number") or "")
+                ring.last_seen = ts
+                dropped = ring.append(point)
+                if dropped is not None:
+                    self.complete_since = max(self.complete_since, dropped)
+                self.points += 1
+                rows.append((fid, ring.callsign, point))
+            if rows and self.directory is not None:
+                try:
+                    self._append(ts, rows)
+                except OSError as exc:
+                    print(f"!! Flight history write failed: {exc}", file=sys.stderr)
+        return len(rows)
+
+    def _append(self, ts: float, rows: list):
+        hour = int(ts // 3600)
+        if self._segment is None or self._segment[0] != hour:
+            if self._segment is not None:
+                self._segment[1].close()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._segment = (hour, open(self.directory / f"{hour}{FLIGHT_TRACK_SEGMENT_SUFFIX}", "ab"))
+            self._prune(hour)
+        packed = bytearray()
+        for fid, callsign, (t, lat, lon, *extras) in rows:
+            alt, speed, heading = _track_extras(*extras)
+            packed += _FLIGHT_TRACK_RECORD.pack(
+                fid.encode("ascii", "replace")[:16], t, lat, lon,
+                _FLIGHT_TRACK_NO_ALTITUDE if alt is None else alt,
+                _FLIGHT_TRACK_NO_WORD if speed is None else speed,
+                _FLIGHT_TRACK_NO_WORD if heading is None else heading,
+                callsign.encode("utf-8", "replace")[:8],
+            )
+        fh = self._segment[1]
+        fh.write(packed)
+        fh.flush()
+        self.written += len(rows)
+
+    def _prune(self, hour: int):
+        floor = hour - int(self.retention_s // 3600)
+        for path in self.directory.glob(f"*{FLIGHT_TRACK_SEGMENT_SUFFIX}"):
+            stem = path.name[: -len(FLIGHT_TRACK_SEGMENT_SUFFIX)]
+            if stem.isdigit() and int(stem) < floor:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def _disk_points(self, t0: float, t1: float):
+        size = _FLIGHT_TRACK_RECORD.size
+        for hour in range(int(t0 // 3600), int(t1 // 3600) + 1):
+            path = self.directory / f"{hour}{FLIGHT_TRACK_SEGMENT_SUFFIX}"
+            try:
+                with open(path, "rb") as fh:
+                    # Mapped rather than read so a window only pages in the records past the bisection point.
+                    data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                continue
+            with data:
+                count = len(data) // size
+                lo, hi = 0, count
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    if struct.unpack_from("<d", data, mid * size + 16)[0] < t0:
+                        lo = mid + 1
+                    else:
+                        hi = mid
+                for i in range(lo, count):
+                    fid, t, lat, lon, alt, speed, heading, callsign = _FLIGHT_TRACK_RECORD.unpack_from(data, i * size)
+                    if t > t1:
+                        break
+                    yield (
+                        fid.rstrip(b"\0").decode("ascii", "replace"), callsign.rstrip(b"\0").decode("utf-8", "replace"),
+                        (
+                            t, lat, lon, None if alt == _FLIGHT_TRACK_NO_ALTITUDE else alt,
+                            None if speed == _FLIGHT_TRACK_NO_WORD else speed, None if heading == _FLIGHT_TRACK_NO_WORD else heading,
+                        ),
+                    )
+
+    def query(self, t0: float, t1: float, bbox: Optional[Tuple[float, float, float, float]] = None,
+              limit: int = FLIGHT_HISTORY_MAX_POINTS) -> dict:
+        """Positions in [t0, t1] (optionally inside west,south,east,north) grouped per aircraft, oldest first."""
+        tracks: Dict[str, dict] = {}
+        count = 0
+        truncated = False
+        source = "memory" if t0 >= self.complete_since or self.directory is None else "disk"
+        if source == "memory":
+            with self._lock:
+                rows = [(fid, ring.callsign, p) for fid, ring in self.rings.items() for p in ring.points(t0, t1)]
+            rows.sort(key=lambda row: row[2][0])
+            rows = ((fid, cs, (*p[:3], *_track_extras(*p[3:]))) for fid, cs, p in rows)
+        else:
+            rows = self._disk_points(t0, t1)
+        for fid, callsign, p in rows:
+            if bbox is not None and not (bbox[0] <= p[2] <= bbox[2] and bbox[1] <= p[1] <= bbox[3]):
+                continue
+            if count >= limit:
+                truncated = True
+                break
+            track = tracks.get(fid)
+            if track is None:
+                track = tracks[fid] = {"callsign": callsign, "points": []}
+            track["points"].append([round(p[0], 3), round(p[1], 5), round(p[2], 5), *p[3:]])
+            count += 1
+        return {"source": source, "count": count, "truncated": truncated, "tracks": tracks}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "directory": str(self.directory) if self.directory else None,
+                "aircraft": len(self.rings),
+                "maxAircraft": self.max_aircraft,
+                "ringPoints": self.ring_points,
+                "points": self.points,
+                "written": self.written,
+                "memorySince": self.complete_since,
+            }
+
+
+_flight_tracks: Optional[FlightTrackStore] = None
+
+
+def sse_frame(event: str, payload) -> bytes:
+    """One Server-Sent Events frame; encoded once per topic update and shared by every subscriber."""
+    return f"event: {event}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n".encode("utf-8")
+
+
+class StreamSubscriber:
+    def __init__(self):
+        self.queue: "queue.Queue[bytes]" = queue.Queue(maxsize=STREAM_QUEUE_MAX)
+        self.dropped = False
+
+    def push(self, frame: bytes):
+        try:
+            self.queue.put_nowait(frame)
+        except queue.Full:
+            # A consumer this far behind is disconnected rather than buffered without bound.
+            self.dropped = True
+
+
+class StreamTopic:
+    """Subscribers of one topic. The latest frame is replayed to late joiners."""
+
+    def __init__(self, hub: "StreamHub", name: str):
+        self.hub = hub
+        self.name = name
+        self.subscribers: set = set()
+        self.last_frame: Optional[bytes] = None
+        self.published = 0
+        self.lock = threading.Lock()
+
+    def publish(self, frame: bytes):
+        with self.lock:
+            self.last_frame = frame
+            self.published += 1
+            for sub in list(self.subscribers):
+                sub.push(frame)
+
+    def add(self, sub: StreamSubscriber):
+        with self.lock:
+            self.subscribers.add(sub)
+            if self.last_frame is not None:
+                sub.push(self.last_frame)
+            first = len(self.subscribers) == 1
+        if first:
+            self.start()
+
+    def remove(self, sub: StreamSubscriber) -> bool:
+        with self.lock:
+            self.subscribers.discard(sub)
+            return not self.subscribers
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+def call_local_route(server, path: str) -> Tuple[int, bytes]:
+    """(status, body) of a GET run through Handler in-process: no socket, and no asyncio worker slot taken."""
+    out = io.BytesIO()
+    raw = f"GET {path} HTTP/1.0\r\nHost: localhost\r\nAccept: application/json\r\n\r\n".encode("latin-1")
+    _BridgedHandler(raw, ("127.0.0.1", 0), out, server)
+    head, _, body = out.getvalue().partition(b"\r\n\r\n")
+    parts = head.split(b" ", 2)
+    return (int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0), body
+
+
+class UrlStreamTopic(StreamTopic):
+    """Runs one of this server's own routes on a fixed interval while anyone is subscribed, and publishes
+    when the body changes, so N viewers cost one upstream call per interval."""
+
+    def __init__(self, hub: "StreamHub", name: str, event: str, server, path: str, interval_s: float):
+        super().__init__(hub, name)
+        self.event = event
+        self.server = server
+        self.path = path
+        self.interval_s = interval_s
+        self._digest = b""
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        with self.lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name=f"cr-stream-{self.name}")
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self.lock:
+                if not self.subscribers:
+                    self._thread = None
+                    return
+            started = time.monotonic()
+            try:
+                status, body = call_local_route(self.server, self.path)
+            except Exception as exc:
+                body, status = json.dumps({"error": str(exc)}).encode("utf-8"), 0
+            digest = hashlib.sha1(body).digest()
+            if digest != self._digest:
+                self._digest = digest
+                try:
+                    data = json.loads(body.decode("utf-8", errors="replace"))
+                except ValueError:
+                    data = None
+                self.publish(sse_frame(self.event, {"topic": self.name, "status": status, "data": data, "ts": time.time()}))
+            time.sleep(max(1.0, self.interval_s - (time.monotonic() - started)))
+
+
+class FlightStreamTopic(StreamTopic):
+    """Flights in one bbox/ukOnly view, pushed as deltas on every shared poller tick."""
+
+    def __init__(self, hub: "StreamHub", name: str, poller: FlightPoller, bounds: Tuple[float, float, float, float], uk_only: bool):
+        super().__init__(hub, name)
+        self.poller = poller
+        self.bounds = bounds
+        self.uk_only = uk_only
+        self.cursor = ""
+
+    def add(self, sub: StreamSubscriber):
+        with self.lock:
+            first = not self.subscribers
+            self.subscribers.add(sub)
+            if not first:
+                # Late joiners need a full view; later deltas from the topic cursor are a superset of theirs.
+                result = self.poller.query(self.bounds, self.uk_only)
+                sub.push(sse_frame("flights", dict(result, topic=self.name)))
+        if first:
+            self.start()
+
+    def start(self):
+        self.poller.add_listener(self.on_tick)
+        if self.poller.touch(wait_s=0):
+            self.on_tick(self.poller)
+
+    def stop(self):
+        self.poller.remove_listener(self.on_tick)
+
+    def on_tick(self, poller: FlightPoller):
+        with self.lock:
+            if not self.subscribers:
+                return
+            poller.touch(wait_s=0)
+            result = poller.query(self.bounds, self.uk_only, self.cursor)
+            if result["cursor"] == self.cursor:
+                return
+            self.cursor = result["cursor"]
+            frame = sse_frame("flights", dict(result, topic=self.name))
+            self.published += 1
+            for sub in list(self.subscribers):
+                sub.push(frame)
+
+
+class StreamHub:
+    """Topic registry for /stream; a topic exists while it has subscribers."""
+
+    def __init__(self, max_clients: int = STREAM_MAX_CLIENTS):
+        self._lock = threading.Lock()
+        self._topics: Dict[str, StreamTopic] = {}
+        self.clients = 0
+        self.max_clients = max_clients
+
+    def subscribe(self, wanted: list) -> Optional[Tuple[StreamSubscriber, list]]:
+        """wanted is a list of (topic name, factory). Returns None when the client limit is reached."""
+        sub = StreamSubscriber()
+        topics = []
+        with self._lock:
+            if self.clients >= self.max_clients:
+                return None
+            self.clients += 1
+            for name, factory in wanted:
+                topic = self._topics.get(name)
+                if topic is None:
+                    topic = self._topics[name] = factory()
+                topic.add(sub)
+                topics.append(topic)
+        return sub, topics
+
+    def unsubscribe(self, sub: StreamSubscriber, topics: list):
+        with self._lock:
+            self.clients -= 1
+            for topic in topics:
+                if topic.remove(sub):
+                    self._topics.pop(topic.name, None)
+                    topic.stop()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "clients": self.clients,
+                "maxClients": self.max_clients,
+                "topics": {name: {"subscribers": len(t.subscribers), "published": t.published} for name, t in self._topics.items()},
+            }
+
+
+_stream_hub = StreamHub()
+
+
+def _is_compressible_type(content_type: str) -> bool:
+    ct = (content_type or "").lower()
+    return any(marker in ct for marker in COMPRESSIBLE_TYPES)
+
+
+def _normalize_upstream_url(url: str) -> str:
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}{parts.path or '/'}" + (f"?{query}" if query else "")
+
+
+def _proxy_cache_key(url: str, headers: Optional[Dict[str, str]] = None) -> str:
+    identity = sorted(
+        f"{k.lower()}={v}" for k, v in (headers or {}).items() if k.lower() in AUTH_IDENTITY_HEADERS
+    )
+    raw = _normalize_upstream_url(url) + "\n" + "\n".join(identity)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _proxy_cache_policy(route_path: str) -> Optional[Tuple[int, int]]:
+    for prefix, policy in PROXY_CACHE_POLICIES.items():
+        if route_path.startswith(prefix):
+            return policy
+    return None
+
+
+def _fetch_upstream(url: str, headers: Optional[Dict[str, str]] = None, timeout: int = 30) -> Tuple[int, str, bytes]:
+    req = urllib.request.Request(url)
+    req.add_header("User-Agent", "ControlRoom/1.0 (+https://localhost)")
+    for key, value in (headers or {}).items():
+        req.add_header(key, value)
+    try:
+        with _upstream_pool.urlopen(req, timeout=timeout) as resp:
+            return resp.status, resp.headers.get("Content-Type", "application/json"), resp.read()
+    except urllib.error.HTTPError as e:
+        body = e.read() if hasattr(e, "read") else b"{}"
+        return e.code, "application/json", body
+
+
+def _refresh_cache_entry(key: str, url: str, headers: Optional[Dict[str, str]], policy: Tuple[int, int]):
+    try:
+        status, content_type, body = _fetch_upstream(url, headers)
+        if status == 200:
+            _response_cache.store(key, _CacheEntry(status, content_type, body, time.time(), *policy))
+    except Exception:
+        pass
+    finally:
+        _response_cache.end_refresh(key)
+
+
+class StaticFileCache:
+    """Byte-bounded LRU of static file payloads, invalidated by source mtime and size."""
+
+    def __init__(self, max_bytes: int):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._bytes = 0
+        self.max_bytes = max(0, int(max_bytes))
+
+    def configure(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max(0, int(max_bytes))
+            self._evict_locked()
+
+    def get(self, key: tuple, version: tuple) -> Optional[bytes]:
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is None or hit[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return hit[1]
+
+    def accepts(self, size: int) -> bool:
+        return size <= self.max_bytes // 4
+
+    def put(self, key: tuple, version: tuple, data: bytes):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            if not self.accepts(len(data)):
+                return
+            self._entries[key] = (version, data)
+            self._bytes += len(data)
+            self._evict_locked()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "maxBytes": self.max_bytes}
+
+    def _evict_locked(self):
+        while self._entries and self._bytes > self.max_bytes:
+            _, (_, data) = self._entries.popitem(last=False)
+            self._bytes -= len(data)
+
+
+_static_cache = StaticFileCache(DEFAULT_STATIC_CACHE_MB * 1024 * 1024)
+
+
+def _available_static_encoders() -> Dict[str, str]:
+    encoders = {"gzip": ".gz"}
+    if brotli is not None:
+        encoders["br"] = ".br"
+    if zstandard is not None:
+        encoders["zstd"] = ".zst"
+    return encoders
+
+
+def _compress_file(src: Path, dest: Path, encoding: str):
+    tmp = dest.with_name(dest.name + ".tmp")
+    with src.open("rb") as fin, tmp.open("wb") as fout:
+        if encoding == "gzip":
+            with gzip.GzipFile(filename="", mode="wb", fileobj=fout, compresslevel=9, mtime=0) as gz:
+                shutil.copyfileobj(fin, gz, STREAM_CHUNK_BYTES * 16)
+        elif encoding == "br":
+            compressor = brotli.Compressor(quality=11)
+            for chunk in iter(lambda: fin.read(STREAM_CHUNK_BYTES * 16), b""):
+                fout.write(compressor.process(chunk))
+            fout.write(compressor.finish())
+        elif encoding == "zstd":
+            zstandard.ZstdCompressor(level=19).copy_stream(fin, fout)
+        else:
+            raise ValueError(f"unsupported encoding {encoding}")
+    os.replace(tmp, dest)
+
+
+def precompress_static_file(src: Path) -> Dict[str, str]:
+    """Write max-level .gz/.br/.zst siblings that are missing or older than the source."""
+    results = {}
+    try:
+        src_mtime = src.stat().st_mtime
+    except FileNotFoundError:
+        return results
+    for encoding, ext in _available_static_encoders().items():
+        dest = src.with_name(src.name + ext)
+        try:
+            if dest.exists() and dest.stat().st_mtime >= src_mtime:
+                results[encoding] = "fresh"
+                continue
+            _compress_file(src, dest, encoding)
+            results[encoding] = "written"
+        except OSError as e:
+            results[encoding] = f"failed: {e}"
+    return results
+
+
+def _compile_static_glob(pattern: str):
+    out = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile("".join(out) + r"\Z")
+
+
+_STATIC_RULE_PATTERNS = [(_compile_static_glob(rule.pattern), rule) for rule in STATIC_ASSET_RULES]
+
+
+def match_static_rule(rel_path: str) -> Optional[StaticRule]:
+    for pattern, rule in _STATIC_RULE_PATTERNS:
+        if pattern.match(rel_path):
+            return rule
+    return None
+
+
+_static_etags: Dict[str, tuple] = {}
+_static_etags_lock = threading.Lock()
+
+
+def static_content_etag(fs_path: Path, stat, compute: bool = True) -> Optional[str]:
+    """Strong validator from a content hash, remembered per (mtime, size)."""
+    key = str(fs_path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _static_etags_lock:
+        known = _static_etags.get(key)
+    if known and known[0] == version:
+        return known[1]
+    if not compute:
+        return None
+    digest = hashlib.blake2b(digest_size=16)
+    with fs_path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    etag = digest.hexdigest()
+    with _static_etags_lock:
+        _static_etags[key] = (version, etag)
+    return etag
+
+
+def iter_static_assets(root: Path, precompress_only: bool = False):
+    seen = set()
+    for rule in STATIC_ASSET_RULES:
+        if precompress_only and not rule.precompress:
+            continue
+        for path in root.glob(rule.pattern):
+            rel = path.relative_to(root).as_posix()
+            if rel in seen or not path.is_file() or match_static_rule(rel) is not rule:
+                continue
+            seen.add(rel)
+            yield rel, path, rule
+
+
+def precompress_static_assets(root: Path = PROJECT_ROOT, log=print) -> int:
+    written = 0
+    for rel_path, src, rule in iter_static_assets(root, precompress_only=True):
+        stat = src.stat()
+        if stat.st_size < STATIC_PRECOMPRESS_MIN_BYTES or not _is_compressible_type(rule.content_type):
+            continue
+        started = time.time()
+        results = precompress_static_file(src)
+        static_content_etag(src, stat)
+        changed = [enc for enc, state in results.items() if state == "written"]
+        written += len(changed)
+        if changed or any(state.startswith("failed") for state in results.values()):
+            log(f"Precompressed {rel_path}: {results} in {time.time() - started:.1f}s")
+    return written
+
+
+def _http_date(ts: float) -> str:
+    return email.utils.formatdate(ts, usegmt=True)
+
+
+def _parse_http_date(value: str) -> Optional[float]:
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def _parse_byte_range(value: str, size: int) -> Optional[Tuple[int, int]]:
+    """Single "bytes=" range as an inclusive (start, end); None if absent or not understood, (-1, -1) if unsatisfiable."""
+    unit, _, spec = (value or "").partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first == "":
+            suffix = int(last)
+            if suffix <= 0:
+                return (-1, -1)
+            return (max(0, size - suffix), size - 1)
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return (-1, -1)
+    return (start, min(end, size - 1))
+
+
+def _negotiate_encoding(accept_encoding: str, available) -> Optional[str]:
+    weights = {}
+    for part in (accept_encoding or "").lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+    best, best_q = None, 0.0
+    for coding, _ in STATIC_ENCODINGS:
+        if coding not in available:
+            continue
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class GridIndex:
+    """Uniform lon/lat bucket index; items are registered under every cell their bbox touches."""
+
+    def __init__(self, cell_deg: float = 0.25):
+        self.cell_deg = cell_deg
+        self._cells: Dict[Tuple[int, int], array.array] = {}
+        self.size = 0
+
+    def _cell_range(self, west: float, south: float, east: float, north: float):
+        size = self.cell_deg
+        return (
+            range(int(west // size), int(east // size) + 1),
+            range(int(south // size), int(north // size) + 1),
+        )
+
+    def insert(self, item: int, west: float, south: float, east: float, north: float) -> None:
+        xs, ys = self._cell_range(west, south, east, north)
+        for cx in xs:
+            for cy in ys:
+                bucket = self._cells.get((cx, cy))
+                if bucket is None:
+                    bucket = self._cells[(cx, cy)] = array.array("I")
+                bucket.append(item)
+        self.size += 1
+
+    def candidates(self, west: float, south: float, east: float, north: float):
+        """Item ids whose cells overlap the bbox, ascending and de-duplicated; callers still test exact geometry."""
+        xs, ys = self._cell_range(west, south, east, north)
+        if len(xs) * len(ys) > len(self._cells):
+            keys = [key for key in self._cells if key[0] in xs and key[1] in ys]
+        else:
+            keys = [(cx, cy) for cx in xs for cy in ys if (cx, cy) in self._cells]
+        if len(keys) == 1:
+            return list(self._cells[keys[0]])
+        seen = set()
+        for key in keys:
+            seen.update(self._cells[key])
+        return sorted(seen)
+
+
+class CrimeGridIndex:
+    """Columnar view of crime_grid.geojson: point coordinates, dictionary-encoded forces/types and per-month activity bitmasks."""
+
+    def __init__(self, path: Path, stat: os.stat_result, data: dict):
+        self.path = path
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        meta = data.get("meta") or {}
+        features = data.get("features") or []
+        months = {str(m) for m in meta.get("months") or []}
+        for feature in features:
+            months.update(((feature.get("properties") or {}).get("timeline") or {}).keys())
+        self.months = sorted(months)
+        self.meta = dict(meta, months=self.months)
+        month_bits = {month: 1 << i for i, month in enumerate(self.months)}
+
+        self.forces: list = []
+        self.types: list = []
+        force_ids: Dict[str, int] = {}
+        type_ids: Dict[str, int] = {}
+        self.lon = array.array("d")
+        self.lat = array.array("d")
+        self.type_id = array.array("H")
+        self.incidents = array.array("d")
+        self.stops = array.array("d")
+        self.reported = array.array("H")
+        self.force_mask: list = []
+        self.month_mask: list = []
+        self.encoded: list = []
+        self.grid = GridIndex(CRIME_INDEX_CELL_DEG)
+
+        for feature in features:
+            coords = (feature.get("geometry") or {}).get("coordinates") or []
+            try:
+                lon, lat = float(coords[0]), float(coords[1])
+            except (TypeError, ValueError, IndexError):
+                continue
+            props = feature.get("properties") or {}
+            forces = []
+            for name in [props.get("reported_by")] + list(props.get("forces") or []):
+                name = str(name or "").strip()
+                if name and name not in forces:
+                    forces.append(name)
+            mask = 0
+            for name in forces or ["Unknown Force"]:
+                if name not in force_ids:
+                    force_ids[name] = len(self.forces)
+                    self.forces.append(name)
+                mask |= 1 << force_ids[name]
+            crime_type = props.get("dominant_type") or "Crime Hotspot"
+            if crime_type not in type_ids:
+                type_ids[crime_type] = len(self.types)
+                self.types.append(crime_type)
+            active = 0
+            for month, bucket in (props.get("timeline") or {}).items():
+                bucket = bucket or {}
+                try:
+                    total = float(bucket.get("crime") or 0) + float(bucket.get("stop") or 0) + float(bucket.get("outcome") or 0)
+                except (TypeError, ValueError):
+                    continue
+                if total:
+                    active |= month_bits[month]
+            idx = len(self.encoded)
+            self.lon.append(lon)
+            self.lat.append(lat)
+            self.type_id.append(type_ids[crime_type])
+            self.reported.append(force_ids[(forces or ["Unknown Force"])[0]])
+            for column, key in ((self.incidents, "count"), (self.stops, "stop_search_total")):
+                try:
+                    column.append(float(props.get(key) or 0))
+                except (TypeError, ValueError):
+                    column.append(0.0)
+            self.force_mask.append(mask)
+            self.month_mask.append(active)
+            self.encoded.append(json.dumps(feature, separators=(",", ":")).encode("utf-8"))
+            self.grid.insert(idx, lon, lat, lon, lat)
+        self._force_ids = force_ids
+        self._type_ids = type_ids
+
+    @classmethod
+    def load(cls, path: Path) -> "CrimeGridIndex":
+        stat = path.stat()
+        with open(path, "rb") as fh:
+            data = json.load(fh)
+        return cls(path, stat, data)
+
+    def __len__(self) -> int:
+        return len(self.encoded)
+
+    def _month_range_mask(self, month_from: str, month_to: str) -> int:
+        mask = 0
+        for i, month in enumerate(self.months):
+            if month_from and month < month_from:
+                continue
+            if month_to and month > month_to:
+                continue
+            mask |= 1 << i
+        return mask
+
+    def query(
+        self,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        month_from: str = "",
+        month_to: str = "",
+        forces=(),
+        types=(),
+    ) -> list:
+        """Feature ids matching every given filter, in file order."""
+        if bbox:
+            west, south, east, north = bbox
+            ids = self.grid.candidates(west, south, east, north)
+        else:
+            ids = range(len(self.encoded))
+        force_mask = 0
+        for name in forces:
+            if name in self._force_ids:
+                force_mask |= 1 << self._force_ids[name]
+        if forces and not force_mask:
+            return []
+        type_set = {self._type_ids[name] for name in types if name in self._type_ids}
+        if types and not type_set:
+            return []
+        month_mask = self._month_range_mask(month_from, month_to) if (month_from or month_to) else 0
+
+        lon, lat, type_id = self.lon, self.lat, self.type_id
+        out = []
+        for i in ids:
+            if bbox and not (west <= lon[i] <= east and south <= lat[i] <= north):
+                continue
+            if force_mask and not self.force_mask[i] & force_mask:
+                continue
+            if type_set and type_id[i] not in type_set:
+                continue
+            if month_mask and not self.month_mask[i] & month_mask:
+                continue
+            out.append(i)
+        return out
+
+    def summary(self) -> dict:
+        """Cell counts per force and type, plus the incident/stop totals the map's filter lists are labelled with."""
+        force_stats = [{"crimes": 0, "stops": 0, "cells": 0} for _ in self.forces]
+        type_stats = [{"crimes": 0, "cells": 0} for _ in self.types]
+        for mask, tid, incidents, stops in zip(self.force_mask, self.type_id, self.incidents, self.stops):
+            type_stats[tid]["cells"] += 1
+            type_stats[tid]["crimes"] += incidents
+            bit = 0
+            while mask:
+                if mask & 1:
+                    stats = force_stats[bit]
+                    stats["cells"] += 1
+                    stats["crimes"] += incidents
+                    stats["stops"] += stops
+                mask >>= 1
+                bit += 1
+        return {
+            "path": str(self.path),
+            "features": len(self.encoded),
+            "months": self.months,
+            "lite": bool(self.meta.get("lite")),
+            "forces": dict(sorted((name, stats["cells"]) for name, stats in zip(self.forces, force_stats))),
+            "types": dict(sorted((name, stats["cells"]) for name, stats in zip(self.types, type_stats))),
+            "force_stats": dict(sorted(zip(self.forces, force_stats))),
+            "type_stats": dict(sorted(zip(self.types, type_stats))),
+            "grid_cells": len(self.grid._cells),
+        }
+
+
+_crime_index: Optional[CrimeGridIndex] = None
+_crime_index_lock = threading.Lock()
+
+
+def crime_grid_path(root: Path) -> Optional[Path]:
+    for rel in CRIME_GRID_CANDIDATES:
+        candidate = root / rel
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def get_crime_index(root: Path) -> Optional[CrimeGridIndex]:
+    """Current index for the crime grid under root, rebuilt when the source file changes on disk."""
+    global _crime_index
+    path = crime_grid_path(root)
+    if path is None:
+        return None
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    current = _crime_index
+    if current is not None and current.path == path and current.mtime_ns == stat.st_mtime_ns and current.size == stat.st_size:
+        return current
+    with _crime_index_lock:
+        current = _crime_index
+        if current is None or current.path != path or current.mtime_ns != stat.st_mtime_ns or current.size != stat.st_size:
+            started = time.time()
+            current = CrimeGridIndex.load(path)
+            _crime_index = current
+            print(f"Indexed {len(current)} crime grid cells from {path.name} in {time.time() - started:.1f}s")
+        return current
+
+
+def _pb_varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        bits = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(bits | 0x80)
+        else:
+            out.append(bits)
+            return bytes(out)
+
+
+def _pb_field(field: int, payload: bytes) -> bytes:
+    return _pb_varint((field << 3) | 2) + _pb_varint(len(payload)) + payload
+
+
+def _pb_uint(field: int, value: int) -> bytes:
+    return _pb_varint(field << 3) + _pb_varint(value)
+
+
+def _pb_packed(field: int, values) -> bytes:
+    return _pb_field(field, b"".join(_pb_varint(v) for v in values))
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _mvt_value(value) -> bytes:
+    if isinstance(value, bool):
+        return _pb_uint(7, int(value))
+    if isinstance(value, int) and -(1 << 63) <= value < (1 << 63):
+        return _pb_uint(6, _zigzag(value))
+    if isinstance(value, float):
+        return _pb_varint((3 << 3) | 1) + struct.pack("<d", value)
+    return _pb_field(1, str(value).encode("utf-8"))
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    d_lat = math.radians(lat2 - lat1)
+    d_lon = math.radians(lon2 - lon1)
+    a = (
+        math.sin(d_lat / 2) ** 2
+        + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(d_lon / 2) ** 2
+    )
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+
+def _lonlat_to_world(lon: float, lat: float) -> Tuple[float, float]:
+    """Web Mercator position normalised to the 0..1 square."""
+    lat = max(-85.05112878, min(85.05112878, lat))
+    sin_lat = math.sin(math.radians(lat))
+    return (lon + 180.0) / 360.0, 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+
+
+def tile_bounds(z: int, x: int, y: int, buffer: float = 0.0) -> Tuple[float, float, float, float]:
+    """west, south, east, north in degrees, optionally grown by a fraction of the tile."""
+    n = 2 ** z
+
+    def lon(tx):
+        return tx / n * 360.0 - 180.0
+
+    def lat(ty):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+
+    return (lon(x - buffer), lat(y + 1 + buffer), lon(x + 1 + buffer), lat(y - buffer))
+
+
+def _simplify_line(points: list, tolerance: float) -> list:
+    """Iterative Douglas-Peucker; endpoints are always kept."""
+    if len(points) <= 2 or tolerance <= 0:
+        return points
+    keep = bytearray(len(points))
+    keep[0] = keep[-1] = 1
+    tol_sq = tolerance * tolerance
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        ax, ay = points[first]
+        bx, by = points[last]
+        dx, dy = bx - ax, by - ay
+        seg_sq = dx * dx + dy * dy
+        best, best_sq = -1, tol_sq
+        for i in range(first + 1, last):
+            px, py = points[i]
+            if seg_sq:
+                t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / seg_sq))
+                ex, ey = ax + t * dx - px, ay + t * dy - py
+            else:
+                ex, ey = ax - px, ay - py
+            dist_sq = ex * ex + ey * ey
+            if dist_sq > best_sq:
+                best, best_sq = i, dist_sq
+        if best >= 0:
+            keep[best] = 1
+            stack.append((first, best))
+            stack.append((best, last))
+    return [p for p, k in zip(points, keep) if k]
+
+
+def _ring_area(ring: list) -> float:
+    area = 0.0
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+        area += x1 * y2 - x2 * y1
+    return area / 2.0
+
+
+def _clip_ring(ring: list, lo: float, hi: float) -> list:
+    """Sutherland-Hodgman clip of a closed ring against the square [lo, hi]."""
+    for axis, bound, inside_low in ((0, lo, True), (0, hi, False), (1, lo, True), (1, hi, False)):
+        if not ring:
+            break
+        out = []
+        prev = ring[-1]
+        prev_in = prev[axis] >= bound if inside_low else prev[axis] <= bound
+        for point in ring:
+            cur_in = point[axis] >= bound if inside_low else point[axis] <= bound
+            if cur_in != prev_in:
+                t = (bound - prev[axis]) / (point[axis] - prev[axis])
+                cross = (bound, prev[1] + t * (point[1] - prev[1])) if axis == 0 else (prev[0] + t * (point[0] - prev[0]), bound)
+                out.append(cross)
+            if cur_in:
+                out.append(point)
+            prev, prev_in = point, cur_in
+        ring = out
+    return ring
+
+
+def _clip_line(line: list, lo: float, hi: float) -> list:
+    """Liang-Barsky clip of a polyline against the square [lo, hi]; a line that leaves and re-enters comes back
+    as several pieces."""
+    pieces = []
+    current: list = []
+    for (x0, y0), (x1, y1) in zip(line, line[1:]):
+        dx, dy = x1 - x0, y1 - y0
+        t0, t1 = 0.0, 1.0
+        for p, q in ((-dx, x0 - lo), (dx, hi - x0), (-dy, y0 - lo), (dy, hi - y0)):
+            if p == 0:
+                if q < 0:
+                    t0, t1 = 1.0, 0.0
+                    break
+            elif p < 0:
+                t0 = max(t0, q / p)
+            else:
+                t1 = min(t1, q / p)
+        if t0 > t1:
+            if current:
+                pieces.append(current)
+                current = []
+            continue
+        start = (x0 + t0 * dx, y0 + t0 * dy) if t0 > 0 else (x0, y0)
+        end = (x0 + t1 * dx, y0 + t1 * dy) if t1 < 1 else (x1, y1)
+        if not current:
+            current = [start]
+        current.append(end)
+        if t1 < 1:
+            pieces.append(current)
+            current = []
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _encode_geometry(gtype: int, parts: list) -> list:
+    """MVT command stream for parts already in integer tile coordinates."""
+    commands = []
+    cx = cy = 0
+    if gtype == 1:
+        points = [p for part in parts for p in part]
+        commands.append(1 | (len(points) << 3))
+        for x, y in points:
+            commands.extend((_zigzag(x - cx), _zigzag(y - cy)))
+            cx, cy = x, y
+        return commands
+    for part in parts:
+        x, y = part[0]
+        commands.extend((1 | (1 << 3), _zigzag(x - cx), _zigzag(y - cy)))
+        cx, cy = x, y
+        rest = part[1:]
+        commands.append(2 | (len(rest) << 3))
+        for x, y in rest:
+            commands.extend((_zigzag(x - cx), _zigzag(y - cy)))
+            cx, cy = x, y
+        if gtype == 3:
+            commands.append(7 | (1 << 3))
+    return commands
+
+
+class TileSource:
+    """A GeoJSON overlay held in world coordinates with a grid index, cut into MVT tiles on demand."""
+
+    def __init__(self, layer: str, path: Path, stat: os.stat_result, data: dict):
+        self.layer = layer
+        self.path = path
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.signature = f"{stat.st_mtime_ns}-{stat.st_size}"
+        self.geoms: list = []
+        self.props: list = []
+        self.grid = GridIndex(TILE_INDEX_CELL_DEG)
+        self._simplified: Dict[int, Dict[int, tuple]] = {}
+        self._lock = threading.Lock()
+        for feature in data.get("features") or []:
+            geom = self._project(feature.get("geometry") or {})
+            if geom is None:
+                continue
+            props = {}
+            for key, value in (feature.get("properties") or {}).items():
+                if isinstance(value, (str, int, float, bool)):
+                    props[key] = value
+            idx = len(self.geoms)
+            self.geoms.append(geom)
+            self.props.append(props)
+            bbox = geom[2]
+            west, north = bbox[0] * 360.0 - 180.0, math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * bbox[1]))))
+            east, south = bbox[2] * 360.0 - 180.0, math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * bbox[3]))))
+            self.grid.insert(idx, west, south, east, north)
+
+    @staticmethod
+    def _project(geometry: dict):
+        """(mvt_type, parts, world_bbox) with polygon rings wound exterior-clockwise / holes-anticlockwise in tile space."""
+        kind = geometry.get("type")
+        coords = geometry.get("coordinates")
+        try:
+            if kind == "Point":
+                parts, gtype = [[_lonlat_to_world(coords[0], coords[1])]], 1
+            elif kind == "MultiPoint":
+                parts, gtype = [[_lonlat_to_world(c[0], c[1]) for c in coords]], 1
+            elif kind == "LineString":
+                parts, gtype = [[_lonlat_to_world(c[0], c[1]) for c in coords]], 2
+            elif kind == "MultiLineString":
+                parts, gtype = [[_lonlat_to_world(c[0], c[1]) for c in line] for line in coords], 2
+            elif kind in ("Polygon", "MultiPolygon"):
+                polygons = [coords] if kind == "Polygon" else coords
+                parts, gtype = [], 3
+                for polygon in polygons:
+                    for ring_no, ring in enumerate(polygon):
+                        points = [_lonlat_to_world(c[0], c[1]) for c in ring]
+                        if len(points) > 1 and points[0] == points[-1]:
+                            points.pop()
+                        if len(points) < 3:
+                            continue
+                        if (_ring_area(points) > 0) != (ring_no == 0):
+                            points.reverse()
+                        parts.append(points)
+            else:
+                return None
+        except (TypeError, ValueError, IndexError):
+            return None
+        xs = [p[0] for part in parts for p in part]
+        ys = [p[1] for part in parts for p in part]
+        if not xs:
+            return None
+        return (gtype, parts, (min(xs), min(ys), max(xs), max(ys)))
+
+    @classmethod
+    def load(cls, layer: str, path: Path) -> "TileSource":
+        stat = path.stat()
+        with open(path, "rb") as fh:
+            data = json.load(fh)
+        return cls(layer, path, stat, data)
+
+    def __len__(self) -> int:
+        return len(self.geoms)
+
+    def _bbox(self, idx: int) -> tuple:
+        return self.geoms[idx][2]
+
+    def _props(self, idx: int) -> dict:
+        return self.props[idx]
+
+    def _geometry_at(self, idx: int, z: int) -> tuple:
+        gtype, parts, bbox = self.geoms[idx]
+        if gtype == 1 or z >= TILE_SIMPLIFY_MAX_ZOOM:
+            return gtype, parts
+        with self._lock:
+            cached = self._simplified.setdefault(z, {}).get(idx)
+        if cached is not None:
+            return cached
+        tolerance = TILE_SIMPLIFY_PX / (256.0 * (2 ** z))
+        simplified = []
+        for part in parts:
+            if gtype == 3:
+                if abs(_ring_area(part)) < tolerance * tolerance:
+                    continue
+                part = _simplify_line(part + part[:1], tolerance)[:-1]
+                if len(part) < 3:
+                    continue
+            else:
+                part = _simplify_line(part, tolerance)
+            simplified.append(part)
+        cached = (gtype, simplified)
+        with self._lock:
+            self._simplified[z][idx] = cached
+        return cached
+
+    def render(self, z: int, x: int, y: int) -> bytes:
+        """Encoded MVT bytes for one tile; empty bytes when no feature touches it."""
+        n = 2 ** z
+        scale = TILE_EXTENT * n
+        buffer = TILE_BUFFER / TILE_EXTENT
+        west, south, east, north = tile_bounds(z, x, y, buffer)
+        lo, hi = -TILE_BUFFER, TILE_EXTENT + TILE_BUFFER
+        min_wx, min_wy = (x - buffer) / n, (y - buffer) / n
+        max_wx, max_wy = (x + 1 + buffer) / n, (y + 1 + buffer) / n
+        keys: Dict[str, int] = {}
+        values: Dict[bytes, int] = {}
+        features = []
+        for idx in self.grid.candidates(west, south, east, north):
+            bbox = self._bbox(idx)
+            if bbox[0] > max_wx or bbox[2] < min_wx or bbox[1] > max_wy or bbox[3] < min_wy:
+                continue
+            gtype, parts = self._geometry_at(idx, z)
+            tile_parts = []
+            orphan_holes = False
+            for part in parts:
+                if gtype == 3:
+                    exterior = _ring_area(part) > 0
+                    if not exterior and orphan_holes:
+                        continue
+                local = [(px * scale - x * TILE_EXTENT, py * scale - y * TILE_EXTENT) for px, py in part]
+                if gtype == 1:
+                    pieces = [[p for p in local if lo <= p[0] <= hi and lo <= p[1] <= hi]]
+                elif gtype == 2:
+                    pieces = _clip_line(local, lo, hi)
+                else:
+                    pieces = [_clip_ring(local, lo, hi)]
+                for piece in pieces:
+                    rounded = []
+                    for px, py in piece:
+                        point = (int(round(px)), int(round(py)))
+                        if not rounded or rounded[-1] != point:
+                            rounded.append(point)
+                    if gtype == 3 and len(rounded) > 1 and rounded[0] == rounded[-1]:
+                        rounded.pop()
+                    if (gtype == 1 and rounded) or (gtype == 2 and len(rounded) >= 2) or (gtype == 3 and len(rounded) >= 3 and _ring_area(rounded)):
+                        tile_parts.append(rounded)
+                        if gtype == 3 and exterior:
+                            orphan_holes = False
+                    elif gtype == 3 and exterior:
+                        orphan_holes = True
+            if not tile_parts:
+                continue
+            tags = []
+            for key, value in self._props(idx).items():
+                encoded = _mvt_value(value)
+                tags.append(keys.setdefault(key, len(keys)))
+                tags.append(values.setdefault(encoded, len(values)))
+            feature = _pb_uint(1, idx + 1) + _pb_packed(2, tags) + _pb_uint(3, gtype) + _pb_packed(4, _encode_geometry(gtype, tile_parts))
+            features.append(_pb_field(2, feature))
+        if not features:
+            return b""
+        layer = b"".join((
+            _pb_uint(15, 2),
+            _pb_field(1, self.layer.encode("utf-8")),
+            b"".join(features),
+            b"".join(_pb_field(3, key.encode("utf-8")) for key in keys),
+            b"".join(_pb_field(4, value) for value in values),
+            _pb_uint(5, TILE_EXTENT),
+        ))
+        return _pb_field(3, layer)
+
+
+class CrimeTileSource(TileSource):
+    """Crime layer tiles cut from the shared CrimeGridIndex (its grid and point columns) rather than a second
+    copy of the grid. Tiles carry the cell's reporting force, dominant type and incident/stop totals."""
+
+    def __init__(self, index: CrimeGridIndex):
+        self.layer = "crime"
+        self.index = index
+        self.path = index.path
+        self.mtime_ns = index.mtime_ns
+        self.size = index.size
+        self.signature = f"{index.mtime_ns}-{index.size}"
+        self.grid = index.grid
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def _bbox(self, idx: int) -> tuple:
+        wx, wy = _lonlat_to_world(self.index.lon[idx], self.index.lat[idx])
+        return (wx, wy, wx, wy)
+
+    def _props(self, idx: int) -> dict:
+        index = self.index
+        incidents, stops = index.incidents[idx], index.stops[idx]
+        return {
+            "reported_by": index.forces[index.reported[idx]],
+            "dominant_type": index.types[index.type_id[idx]],
+            "count": int(incidents) if incidents.is_integer() else incidents,
+            "stop_search_total": int(stops) if stops.is_integer() else stops,
+        }
+
+    def _geometry_at(self, idx: int, z: int) -> tuple:
+        return 1, [[self._bbox(idx)[:2]]]
+
+
+_tile_sources: Dict[str, TileSource] = {}
+_tile_sources_lock = threading.Lock()
+
+
+def get_tile_source(root: Path, layer: str) -> Optional[TileSource]:
+    """Loaded source for a TILE_LAYERS entry, reloaded when its file changes on disk."""
+    if layer == "crime":
+        index = get_crime_index(root)
+        if index is None:
+            return None
+        current = _tile_sources.get(layer)
+        if current is None or current.index is not index:
+            with _tile_sources_lock:
+                current = _tile_sources.get(layer)
+                if current is None or current.index is not index:
+                    current = _tile_sources[layer] = CrimeTileSource(index)
+        return current
+    path = None
+    for rel in TILE_LAYERS.get(layer, ()):
+        if (root / rel).is_file():
+            path = root / rel
+            break
+    if path is None:
+        return None
+    stat = path.stat()
+    current = _tile_sources.get(layer)
+    if current is not None and current.path == path and current.mtime_ns == stat.st_mtime_ns and current.size == stat.st_size:
+        return current
+    with _tile_sources_lock:
+        current = _tile_sources.get(layer)
+        if current is None or current.path != path or current.mtime_ns != stat.st_mtime_ns or current.size != stat.st_size:
+            started = time.time()
+            current = TileSource.load(layer, path)
+            _tile_sources[layer] = current
+            print(f"Loaded {len(current)} {layer} features for tiling from {path.name} in {time.time() - started:.1f}s")
+        return current
+
+
+def tile_cache_path(cache_dir: Path, source: TileSource, z: int, x: int, y: int) -> Path:
+    return cache_dir / source.layer / source.signature / str(z) / str(x) / f"{y}.mvt"
+
+
+def prune_tile_cache(cache_dir: Path, source: TileSource) -> None:
+    """Drop tiles cut from older versions of a layer's source file."""
+    layer_dir = cache_dir / source.layer
+    if not layer_dir.is_dir():
+        return
+    for child in layer_dir.iterdir():
+        if child.name != source.signature:
+            shutil.rmtree(child, ignore_errors=True)
+
+
+def normalize_company_number(value) -> str:
+    number = re.sub(r"\s+", "", str(value or "")).upper()
+    return number.zfill(8) if number.isdigit() else number
+
+
+def _clean_company_row(row: dict) -> dict:
+    """Source rows carry stray whitespace in their keys (" CompanyNumber"); strip it."""
+    return {str(k).strip(): v for k, v in row.items() if k is not None}
+
+
+def iter_json_array_offsets(path: Path):
+    """Yield (obj, byte_offset, byte_length) for every element of a top-level JSON array file."""
+    raw = path.read_bytes()
+    text = raw.decode("utf-8-sig")
+    ascii_only = len(text) == len(raw)
+    decoder = json.JSONDecoder()
+    idx = text.index("[") + 1
+    byte_pos = idx if ascii_only else len(text[:idx].encode("utf-8")) + (len(raw) - len(raw.lstrip(b"\xef\xbb\xbf")))
+    end_of_text = len(text)
+    while idx < end_of_text:
+        ch = text[idx]
+        if ch in " \t\r\n,":
+            idx += 1
+            byte_pos += 1
+            continue
+        if ch == "]":
+            return
+        obj, end = decoder.raw_decode(text, idx)
+        length = end - idx if ascii_only else len(text[idx:end].encode("utf-8"))
+        yield obj, byte_pos, length
+        byte_pos += length
+        idx = end
+
+
+def iter_csv_offsets(path: Path):
+    """Yield (row_dict, byte_offset, byte_length) for a CSV with a header line, honouring quoted newlines."""
+    with open(path, "rb") as fh:
+        header_line = fh.readline()
+        header = next(csv.reader([header_line.decode("utf-8-sig")]))
+        offset = len(header_line)
+        while True:
+            start = offset
+            chunk = fh.readline()
+            if not chunk:
+                return
+            offset += len(chunk)
+            while chunk.count(b'"') % 2:
+                more = fh.readline()
+                if not more:
+                    break
+                chunk += more
+                offset += len(more)
+            text = chunk.decode("utf-8", errors="replace")
+            if not text.strip():
+                continue
+            values = next(csv.reader([text]))
+            yield dict(zip(header, values)), start, len(chunk)
+
+
+def company_source_files(root: Path) -> list:
+    files = sorted((root / COMPANY_SUBSETS_DIR).glob("*.json"))
+    files += sorted((root / COMPANY_BASIC_DATA_DIR).glob("*.csv"))
+    return files
+
+
+def build_company_index(root: Path, index_dir: Path, log: Callable[[str], None] = print) -> int:
+    """Scan every company source once into a SQLite table of company number -> (file, byte offset, length)."""
+    sources = company_source_files(root)
+    if not sources:
+        log(f"No company sources under {root / COMPANY_SUBSETS_DIR} or {root / COMPANY_BASIC_DATA_DIR}")
+        return 0
+    index_dir.mkdir(parents=True, exist_ok=True)
+    target = index_dir / COMPANY_INDEX_FILE
+    tmp = target.with_suffix(".building")
+    if tmp.exists():
+        tmp.unlink()
+    db = sqlite3.connect(str(tmp))
+    db.executescript(
+        """
+        PRAGMA journal_mode = OFF;
+        PRAGMA synchronous = OFF;
+        CREATE TABLE sources (id INTEGER PRIMARY KEY, path TEXT NOT NULL, size INTEGER, mtime_ns INTEGER, kind TEXT, header TEXT);
+        CREATE TABLE companies (number TEXT PRIMARY KEY, source INTEGER NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL) WITHOUT ROWID;
+        """
+    )
+    total = 0
+    for source_id, path in enumerate(sources):
+        started = time.time()
+        stat = path.stat()
+        if path.suffix.lower() == ".csv":
+            kind = "csv"
+            with open(path, "rb") as fh:
+                header = fh.readline().decode("utf-8-sig").rstrip("\r\n")
+            rows = iter_csv_offsets(path)
+        else:
+            kind, header = "json", ""
+            rows = iter_json_array_offsets(path)
+        db.execute(
+            "INSERT INTO sources VALUES (?, ?, ?, ?, ?, ?)",
+            (source_id, str(path.relative_to(root)), stat.st_size, stat.st_mtime_ns, kind, header),
+        )
+        batch = []
+        count = 0
+        for row, offset, length in rows:
+            number = normalize_company_number(_clean_company_row(row).get("CompanyNumber"))
+            if not number:
+                continue
+            batch.append((number, source_id, offset, length))
+            if len(batch) >= 50000:
+                db.executemany("INSERT OR IGNORE INTO companies VALUES (?, ?, ?, ?)", batch)
+                count += len(batch)
+                batch = []
+        db.executemany("INSERT OR IGNORE INTO companies VALUES (?, ?, ?, ?)", batch)
+        count += len(batch)
+        db.commit()
+        total += count
+        log(f"Indexed {count} companies from {path.name} in {time.time() - started:.1f}s")
+    db.close()
+    os.replace(tmp, target)
+    return total
+
+
+class SQLiteReadPool:
+    """Read-only SQLite connections reused across requests; the threading engine starts a thread per connection, so thread-locals would not be."""
+
+    def __init__(self, path: Path, max_idle: int = 8):
+        self.path = path
+        self.max_idle = max_idle
+        self._idle: list = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+
+    def release(self, db: sqlite3.Connection) -> None:
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(db)
+                return
+        db.close()
+
+    def execute_all(self, sql: str, args=()) -> list:
+        db = self.acquire()
+        try:
+            return db.execute(sql, args).fetchall()
+        finally:
+            self.release(db)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for db in idle:
+            db.close()
+
+
+class CompanyIndex:
+    """Read side of build_company_index: point lookups through SQLite, row bytes read straight from the source files."""
+
+    def __init__(self, root: Path, path: Path):
+        self.root = root
+        self.path = path
+        self.mtime_ns = path.stat().st_mtime_ns
+        self._pool = SQLiteReadPool(path)
+        self._maps: Dict[int, tuple] = {}
+        self._maps_lock = threading.Lock()
+        self.sources: Dict[int, dict] = {}
+        db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            for source_id, rel, size, mtime_ns, kind, header in db.execute("SELECT id, path, size, mtime_ns, kind, header FROM sources"):
+                self.sources[source_id] = {
+                    "path": root / rel,
+                    "kind": kind,
+                    "header": next(csv.reader([header])) if header else None,
+                    "size": size,
+                    "mtime_ns": mtime_ns,
+                    "fresh": True,
+                }
+                self._check_source(source_id)
+            self.count = db.execute("SELECT COUNT(*) FROM companies").fetchone()[0]
+        finally:
+            db.close()
+
+    def _check_source(self, source_id: int) -> bool:
+        # Offsets are only valid for the exact file that was indexed. A source rewritten in place would hand back
+        # a neighbouring row, and reading a mapping past the end of a truncated file raises SIGBUS.
+        source = self.sources[source_id]
+        if source["fresh"]:
+            try:
+                stat = source["path"].stat()
+                source["fresh"] = stat.st_size == source["size"] and stat.st_mtime_ns == source["mtime_ns"]
+            except OSError:
+                source["fresh"] = False
+            if not source["fresh"]:
+                # Dropped rather than closed: a request slicing it right now keeps it alive until it finishes.
+                self._maps.pop(source_id, None)
+        return source["fresh"]
+
+    def _map(self, source_id: int) -> mmap.mmap:
+        # A read-only mapping serves concurrent slices without a shared file position, and works on Windows
+        # where os.pread does not exist.
+        mapped = self._maps.get(source_id)
+        if mapped is None:
+            with self._maps_lock:
+                mapped = self._maps.get(source_id)
+                if mapped is None:
+                    with open(self.sources[source_id]["path"], "rb") as fh:
+                        mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._maps[source_id] = mapped
+        return mapped
+
+    def _read_row(self, number: str, source_id: int, offset: int, length: int) -> Optional[dict]:
+        source = self.sources.get(source_id)
+        if source is None or not self._check_source(source_id):
+            return None
+        try:
+            raw = self._map(source_id)[offset:offset + length]
+            if source["kind"] == "csv":
+                values = next(csv.reader([raw.decode("utf-8", errors="replace")]))
+                row = dict(zip(source["header"], values))
+            else:
+                row = json.loads(raw)
+        except (OSError, ValueError, StopIteration, csv.Error):
+            return None
+        if not isinstance(row, dict):
+            return None
+        row = _clean_company_row(row)
+        return row if normalize_company_number(row.get("CompanyNumber")) == number else None
+
+    def lookup(self, number: str) -> Optional[dict]:
+        key = normalize_company_number(number)
+        hits = self._pool.execute_all("SELECT source, offset, length FROM companies WHERE number = ?", (key,))
+        return self._read_row(key, *hits[0]) if hits else None
+
+    def lookup_many(self, numbers) -> Dict[str, Optional[dict]]:
+        wanted = {normalize_company_number(n): n for n in numbers if str(n or "").strip()}
+        found: Dict[str, Optional[dict]] = {str(original): None for original in wanted.values()}
+        keys = sorted(wanted)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            for number, source_id, offset, length in self._pool.execute_all(
+                f"SELECT number, source, offset, length FROM companies WHERE number IN ({marks})", chunk
+            ):
+                found[str(wanted[number])] = self._read_row(number, source_id, offset, length)
+        return found
+
+    def stats(self) -> dict:
+        return {
+            "path": str(self.path),
+            "companies": self.count,
+            "sources": len(self.sources),
+            "stale_sources": sorted(str(s["path"].name) for s in self.sources.values() if not s["fresh"]),
+        }
+
+
+_company_index: Optional[CompanyIndex] = None
+_company_index_lock = threading.Lock()
+
+
+def get_company_index(root: Path, index_dir: Path) -> Optional[CompanyIndex]:
+    """Open (or reopen after a rebuild) the company index; None until --build-index companies has run."""
+    global _company_index
+    path = index_dir / COMPANY_INDEX_FILE
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    current = _company_index
+    if current is not None and current.path == path and current.mtime_ns == mtime_ns:
+        return current
+    with _company_index_lock:
+        current = _company_index
+        if current is None or current.path != path or current.mtime_ns != mtime_ns:
+            # The old index is only swapped out, not closed: handler threads may still be slicing its mappings, and
+            # its connections and mappings are released once the last of them lets go.
+            current = _company_index = CompanyIndex(root, path)
+        return current
+
+
+def _first_field(row: dict, names) -> str:
+    for name in names:
+        value = row.get(name)
+        if value not in (None, ""):
+            return str(value).strip()
+    return ""
+
+
+def iter_psc_name_records(root: Path):
+    """Records from data/psc_names in JSON array, JSON lines or CSV form."""
+    for path in sorted((root / PSC_NAMES_DIR).glob("*")):
+        suffix = path.suffix.lower()
+        if suffix == ".csv":
+            with open(path, newline="", encoding="utf-8-sig", errors="replace") as fh:
+                yield from csv.DictReader(fh)
+        elif suffix in (".jsonl", ".ndjson"):
+            with open(path, encoding="utf-8", errors="replace") as fh:
+                for line in fh:
+                    line = line.strip()
+                    if line:
+                        try:
+                            yield json.loads(line)
+                        except ValueError:
+                            continue
+        elif suffix == ".json":
+            for record, _, _ in iter_json_array_offsets(path):
+                yield record
+
+
+def _search_entries(root: Path):
+    """(kind, name, company_number, extra_json) for every searchable company and PSC name."""
+    for path in company_source_files(root):
+        rows = iter_csv_offsets(path) if path.suffix.lower() == ".csv" else iter_json_array_offsets(path)
+        for row, _, _ in rows:
+            row = _clean_company_row(row)
+            name = _first_field(row, ("CompanyName",))
+            if not name:
+                continue
+            extra = {
+                "postcode": _first_field(row, ("RegAddress.PostCode",)),
+                "town": _first_field(row, ("RegAddress.PostTown",)),
+                "status": _first_field(row, ("CompanyStatus",)),
+            }
+            yield "company", name, normalize_company_number(row.get("CompanyNumber")), json.dumps(extra, separators=(",", ":"))
+    for record in iter_psc_name_records(root):
+        if not isinstance(record, dict):
+            continue
+        name = _first_field(record, ("name", "full_name", "psc_name", "Name"))
+        if not name:
+            continue
+        extra = {"kind": _first_field(record, ("kind", "psc_kind", "type"))}
+        number = normalize_company_number(_first_field(record, ("company_number", "CompanyNumber")))
+        yield "person", name, number, json.dumps(extra, separators=(",", ":"))
+
+
+def build_search_index(root: Path, index_dir: Path, log: Callable[[str], None] = print) -> int:
+    """FTS5 name index over the company sources and PSC names: a word index with prefix tables plus a trigram index."""
+    index_dir.mkdir(parents=True, exist_ok=True)
+    target = index_dir / SEARCH_INDEX_FILE
+    tmp = target.with_suffix(".building")
+    if tmp.exists():
+        tmp.unlink()
+    db = sqlite3.connect(str(tmp))
+    db.executescript(
+        """
+        PRAGMA journal_mode = OFF;
+        PRAGMA synchronous = OFF;
+        CREATE TABLE entries (id INTEGER PRIMARY KEY, kind TEXT NOT NULL, name TEXT NOT NULL, number TEXT, extra TEXT);
+        """
+    )
+    started = time.time()
+    total = 0
+    batch = []
+    for entry in _search_entries(root):
+        batch.append(entry)
+        if len(batch) >= 50000:
+            db.executemany("INSERT INTO entries (kind, name, number, extra) VALUES (?, ?, ?, ?)", batch)
+            total += len(batch)
+            batch = []
+            log(f"Search index: {total} names read")
+    db.executemany("INSERT INTO entries (kind, name, number, extra) VALUES (?, ?, ?, ?)", batch)
+    total += len(batch)
+    db.commit()
+    log(f"Search index: {total} names read in {time.time() - started:.1f}s, building full-text tables")
+    db.executescript(
+        """
+        CREATE VIRTUAL TABLE entries_words USING fts5(
+            name, kind, content='entries', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+        );
+        CREATE VIRTUAL TABLE entries_trigram USING fts5(name, content='entries', content_rowid='id', tokenize='trigram');
+        INSERT INTO entries_words(entries_words, rank) VALUES ('rank', 'bm25(1.0, 0.0)');
+        INSERT INTO entries_words(entries_words) VALUES ('rebuild');
+        INSERT INTO entries_trigram(entries_trigram) VALUES ('rebuild');
+        INSERT INTO entries_words(entries_words) VALUES ('optimize');
+        INSERT INTO entries_trigram(entries_trigram) VALUES ('optimize');
+        """
+    )
+    db.commit()
+    db.close()
+    os.replace(tmp, target)
+    return total
+
+
+class SearchIndex:
+    """Ranked name search: word/prefix matches by bm25 first, then trigram substring matches to fill the page."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.mtime_ns = path.stat().st_mtime_ns
+        self._pool = SQLiteReadPool(path)
+        db = self._pool.acquire()
+        try:
+            columns = [c[0] for c in db.execute("SELECT * FROM entries_words LIMIT 0").description]
+        finally:
+            self._pool.release(db)
+        # Indexes built before the kind column was added to entries_words need a rebuild.
+        self.current = "kind" in columns
+
+    @staticmethod
+    def _word_query(q: str, kind: str = "") -> str:
+        tokens = re.findall(r"\w+", q.lower())
+        if not tokens:
+            return ""
+        terms = " ".join([f'"{t}"' for t in tokens[:-1]] + [f'"{tokens[-1]}"*'])
+        query = f"name : ({terms})"
+        return f'{query} AND kind : "{kind}"' if kind else query
+
+    def search(self, q: str, kind: str = "", limit: int = 20, offset: int = 0) -> Tuple[list, bool]:
+        """One page of results and whether more exist beyond it."""
+        db = self._pool.acquire()
+        try:
+            rows = self._matching_rows(db, q, kind, limit + 1, offset)
+        finally:
+            self._pool.release(db)
+        return [self._result(row, match) for row, match in rows[:limit]], len(rows) > limit
+
+    def _matching_rows(self, db: sqlite3.Connection, q: str, kind: str, want: int, offset: int) -> list:
+        """Word matches in bm25 order, followed by substring-only matches, paged as one continuous list."""
+        rows = []
+        word_query = self._word_query(q, kind)
+        if word_query:
+            for row in db.execute(
+                "SELECT e.id, e.kind, e.name, e.number, e.extra FROM "
+                "(SELECT rowid, rank AS score FROM entries_words WHERE entries_words MATCH ? ORDER BY rank LIMIT ? OFFSET ?) w "
+                "JOIN entries e ON e.id = w.rowid ORDER BY w.score",
+                (word_query, want, offset),
+            ):
+                rows.append((row, "word"))
+        needle = q.strip()
+        if len(rows) >= want or len(needle) < 3:
+            return rows
+        # The word matches end on this page, so substring matches continue from where they stopped.
+        if not word_query:
+            words = 0
+        elif rows or not offset:
+            words = offset + len(rows)
+        else:
+            words = db.execute("SELECT count(*) FROM entries_words WHERE entries_words MATCH ?", (word_query,)).fetchone()[0]
+        kind_sql = " AND e.kind = ?" if kind else ""
+        exclude_sql = " AND e.id NOT IN (SELECT rowid FROM entries_words WHERE entries_words MATCH ?)" if word_query else ""
+        args = ('"' + needle.replace('"', '""') + '"',) + ((kind,) if kind else ()) + ((word_query,) if word_query else ())
+        for row in db.execute(
+            f"SELECT e.id, e.kind, e.name, e.number, e.extra FROM entries_trigram t JOIN entries e ON e.id = t.rowid "
+            f"WHERE entries_trigram MATCH ?{kind_sql}{exclude_sql} ORDER BY t.rowid LIMIT ? OFFSET ?",
+            args + (want - len(rows), max(0, offset - words)),
+        ):
+            rows.append((row, "substring"))
+        return rows
+
+    @staticmethod
+    def _result(row: tuple, match: str) -> dict:
+        _, kind, name, number, extra = row
+        result = {"kind": kind, "name": name, "company_number": number, "match": match}
+        details = json.loads(extra) if extra else {}
+        if kind == "company":
+            result["title"] = name
+            result["company_status"] = details.get("status", "")
+            result["address_snippet"] = ", ".join(p for p in (details.get("postcode"), details.get("town")) if p)
+        else:
+            result.update({k: v for k, v in details.items() if v})
+        return result
+
+
+_search_index: Optional[SearchIndex] = None
+_search_index_lock = threading.Lock()
+
+
+def get_search_index(index_dir: Path) -> Optional[SearchIndex]:
+    global _search_index
+    path = index_dir / SEARCH_INDEX_FILE
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    current = _search_index
+    if current is not None and current.path == path and current.mtime_ns == mtime_ns:
+        return current
+    with _search_index_lock:
+        current = _search_index
+        if current is None or current.path != path or current.mtime_ns != mtime_ns:
+            current = _search_index = SearchIndex(path)
+        return current
+
+
+def iter_psc_records(root: Path):
+    """(company_number, psc_item) from data/psc_by_company: bulk-snapshot JSON lines ({"company_number", "data"}),
+    flat records, or JSON files mapping company numbers to PSC lists."""
+
+    def unwrap(record, number=""):
+        if not isinstance(record, dict):
+            return None
+        item = record.get("data") if isinstance(record.get("data"), dict) else record
+        number = number or record.get("company_number") or item.get("company_number") or ""
+        number = normalize_company_number(number)
+        return (number, item) if number else None
+
+    for path in sorted((root / PSC_BY_COMPANY_DIR).rglob("*")):
+        suffix = path.suffix.lower()
+        if suffix in (".jsonl", ".ndjson", ".txt"):
+            with open(path, encoding="utf-8", errors="replace") as fh:
+                for line in fh:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        hit = unwrap(json.loads(line))
+                    except ValueError:
+                        continue
+                    if hit:
+                        yield hit
+        elif suffix == ".json":
+            with open(path, encoding="utf-8", errors="replace") as fh:
+                data = json.load(fh)
+            if isinstance(data, dict) and not ("company_number" in data or "data" in data):
+                for number, items in data.items():
+                    if isinstance(items, dict):
+                        items = items.get("items") or []
+                    for item in items or []:
+                        hit = unwrap(item, number)
+                        if hit:
+                            yield hit
+                continue
+            for record in data if isinstance(data, list) else [data]:
+                if isinstance(record, dict) and isinstance(record.get("items"), list):
+                    for item in record["items"]:
+                        hit = unwrap(item, record.get("company_number") or path.stem)
+                        if hit:
+                            yield hit
+                    continue
+                hit = unwrap(record)
+                if hit:
+                    yield hit
+
+
+def _psc_normalize_name(name: str) -> str:
+    normalized = re.sub(r"[^A-Z0-9 ]", "", re.sub(r"\s+", " ", name.upper())).strip()
+    return re.sub(r"^(?:(?:MR|MRS|MS|MISS|DR|PROF|SIR|DAME|LORD|LADY) )+", "", normalized)
+
+
+def _psc_node_key(item: dict, company_number: str) -> Tuple[str, str, str]:
+    """(node_key, kind, label) for a PSC; UK-registered corporate PSCs resolve to their company node."""
+    name = str(item.get("name") or "").strip()
+    if not name:
+        elements = item.get("name_elements") or {}
+        name = " ".join(str(elements.get(k) or "") for k in ("forename", "middle_name", "surname")).strip()
+    kind = str(item.get("kind") or "")
+    if not name:
+        # Super-secure and unnamed PSCs must not collapse into one shared hub node.
+        return f"unnamed:{company_number}:{kind}", "person", "Unnamed PSC"
+    name = re.sub(r"\s+", " ", name)
+    normalized = _psc_normalize_name(name)
+    if "corporate" in kind or "legal-person" in kind:
+        ident = item.get("identification") or {}
+        number = normalize_company_number(ident.get("registration_number"))
+        where = " ".join(str(ident.get(k) or "") for k in ("country_registered", "place_registered")).lower()
+        uk = not where or any(w in where for w in ("england", "wales", "scotland", "northern ireland", "united kingdom", "uk", "companies house"))
+        if uk and re.fullmatch(r"\d{8}|[A-Z]{2}\d{6}", number):
+            return f"company:{number}", "company", name
+        return f"entity:{normalized}", "entity", name
+    dob = item.get("date_of_birth") or {}
+    born = f"{dob.get('year', '')}-{str(dob.get('month', '')).zfill(2)}" if dob.get("year") else ""
+    return f"person:{normalized}|{born}", "person", name
+
+
+def build_psc_graph(root: Path, index_dir: Path, log: Callable[[str], None] = print) -> int:
+    """Compile PSC records into CSR adjacency (psc_graph.bin) plus node metadata (psc_graph.sqlite)."""
+    index_dir.mkdir(parents=True, exist_ok=True)
+    node_ids: Dict[str, int] = {}
+    node_meta: list = []
+    natures_ids: Dict[str, int] = {}
+    src = array.array("I")
+    dst = array.array("I")
+    attrs = array.array("I")
+    started = time.time()
+
+    def node(key: str, kind: str, label: str, number: str = "") -> int:
+        idx = node_ids.get(key)
+        if idx is None:
+            idx = node_ids[key] = len(node_meta)
+            node_meta.append((idx, kind, key, label, number))
+        elif kind == "company" and node_meta[idx][3] == number and label != number:
+            node_meta[idx] = (idx, kind, key, label, number)
+        return idx
+
+    for records, (number, item) in enumerate(iter_psc_records(root), 1):
+        if str(item.get("kind") or "").endswith("statement"):
+            continue
+        company = node(f"company:{number}", "company", number, number)
+        key, kind, label = _psc_node_key(item, number)
+        owner = node(key, kind, label, key[len("company:"):] if kind == "company" else "")
+        if owner == company:
+            continue
+        natures = ";".join(sorted(item.get("natures_of_control") or []))
+        nature_id = natures_ids.setdefault(natures, len(natures_ids))
+        flags = nature_id & PSC_EDGE_NATURE_MASK
+        if item.get("ceased_on"):
+            flags |= PSC_EDGE_CEASED
+        # Stored both ways so traversal can walk up to owners and down to holdings.
+        src.append(owner)
+        dst.append(company)
+        attrs.append(flags)
+        src.append(company)
+        dst.append(owner)
+        attrs.append(flags | PSC_EDGE_INBOUND)
+        if records % 500000 == 0:
+            log(f"PSC graph: {records} records, {len(node_meta)} nodes")
+
+    count = len(node_meta)
+    offsets = array.array("Q", bytes(8 * (count + 1)))
+    for s in src:
+        offsets[s + 1] += 1
+    for i in range(count):
+        offsets[i + 1] += offsets[i]
+    cursor = array.array("Q", offsets[:-1]) if count else array.array("Q")
+    neighbors = array.array("I", bytes(4 * len(src)))
+    edge_attrs = array.array("I", bytes(4 * len(src)))
+    for s, d, a in zip(src, dst, attrs):
+        pos = cursor[s]
+        neighbors[pos] = d
+        edge_attrs[pos] = a
+        cursor[s] = pos + 1
+    del src, dst, attrs, cursor
+
+    bin_path = index_dir / PSC_GRAPH_FILE
+    db_path = index_dir / PSC_GRAPH_NODES_FILE
+    tmp_bin = bin_path.with_name(bin_path.name + ".building")
+    tmp_db = db_path.with_name(db_path.name + ".building")
+    with open(tmp_bin, "wb") as fh:
+        fh.write(struct.pack(PSC_GRAPH_HEADER, PSC_GRAPH_MAGIC, count, len(neighbors)))
+        offsets.tofile(fh)
+        neighbors.tofile(fh)
+        edge_attrs.tofile(fh)
+    if tmp_db.exists():
+        tmp_db.unlink()
+    db = sqlite3.connect(str(tmp_db))
+    db.executescript(
+        """
+        PRAGMA journal_mode = OFF;
+        PRAGMA synchronous = OFF;
+        CREATE TABLE nodes (id INTEGER PRIMARY KEY, kind TEXT NOT NULL, key TEXT NOT NULL, label TEXT, number TEXT);
+        CREATE TABLE natures (id INTEGER PRIMARY KEY, value TEXT NOT NULL);
+        """
+    )
+    db.executemany("INSERT INTO nodes VALUES (?, ?, ?, ?, ?)", node_meta)
+    db.executemany("INSERT INTO natures VALUES (?, ?)", [(i, v) for v, i in natures_ids.items()])
+    db.executescript("CREATE UNIQUE INDEX nodes_key ON nodes(key); CREATE INDEX nodes_label ON nodes(label COLLATE NOCASE);")
+    db.commit()
+    db.close()
+    os.replace(tmp_db, db_path)
+    os.replace(tmp_bin, bin_path)
+    log(f"PSC graph: {count} nodes, {len(neighbors) // 2} edges in {time.time() - started:.1f}s")
+    return count
+
+
+class PscGraph:
+    """mmap-backed CSR adjacency over companies, people and corporate entities, with node metadata in SQLite."""
+
+    def __init__(self, bin_path: Path, db_path: Path):
+        self.path = bin_path
+        self.mtime_ns = bin_path.stat().st_mtime_ns
+        self._fh = open(bin_path, "rb")
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        header_size = struct.calcsize(PSC_GRAPH_HEADER)
+        magic, self.node_count, self.edge_count = struct.unpack_from(PSC_GRAPH_HEADER, self._mm, 0)
+        if magic != PSC_GRAPH_MAGIC:
+            raise ValueError(f"{bin_path} is not a PSC graph file")
+        view = memoryview(self._mm)
+        offsets_end = header_size + 8 * (self.node_count + 1)
+        neighbors_end = offsets_end + 4 * self.edge_count
+        self.offsets = view[header_size:offsets_end].cast("Q")
+        self.neighbors = view[offsets_end:neighbors_end].cast("I")
+        self.edge_attrs = view[neighbors_end:neighbors_end + 4 * self.edge_count].cast("I")
+        self._pool = SQLiteReadPool(db_path)
+        self.natures = dict(self._pool.execute_all("SELECT id, value FROM natures"))
+
+    def find(self, company: str = "", key: str = "", name: str = "") -> list:
+        """Start node ids for a company number, an exact node key or a case-insensitive name."""
+        if company:
+            rows = self._pool.execute_all("SELECT id FROM nodes WHERE key = ?", (f"company:{normalize_company_number(company)}",))
+        elif key:
+            rows = self._pool.execute_all("SELECT id FROM nodes WHERE key = ?", (key,))
+        else:
+            normalized = _psc_normalize_name(name)
+            rows = self._pool.execute_all(
+                "SELECT id FROM nodes WHERE key >= ? AND key < ? UNION SELECT id FROM nodes WHERE key = ? "
+                "UNION SELECT id FROM nodes WHERE label = ? COLLATE NOCASE LIMIT 20",
+                (f"person:{normalized}|", f"person:{normalized}|\uffff", f"entity:{normalized}", name.strip()),
+            )
+        return [row[0] for row in rows]
+
+    def traverse(self, starts: list, depth: int, fanout: int, max_nodes: int, include_ceased: bool = False, direction: str = "both") -> dict:
+        """Breadth-first walk from starts; each node expands at most fanout edges, and the walk stops at max_nodes."""
+        depth_of: Dict[int, int] = {s: 0 for s in starts}
+        frontier = list(depth_of)
+        edges = []
+        truncated = False
+        for level in range(1, depth + 1):
+            next_frontier = []
+            for node_id in frontier:
+                taken = 0
+                for pos in range(self.offsets[node_id], self.offsets[node_id + 1]):
+                    attr = self.edge_attrs[pos]
+                    if attr & PSC_EDGE_CEASED and not include_ceased:
+                        continue
+                    inbound = bool(attr & PSC_EDGE_INBOUND)
+                    if (direction == "owners" and not inbound) or (direction == "holdings" and inbound):
+                        continue
+                    if taken >= fanout:
+                        truncated = True
+                        break
+                    taken += 1
+                    other = self.neighbors[pos]
+                    if other not in depth_of:
+                        if len(depth_of) >= max_nodes:
+                            truncated = True
+                            continue
+                        depth_of[other] = level
+                        next_frontier.append(other)
+                    owner, owned = (other, node_id) if inbound else (node_id, other)
+                    edges.append((owner, owned, attr))
+            frontier = next_frontier
+            if not frontier:
+                break
+
+        meta = {}
+        ids = list(depth_of)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            for row in self._pool.execute_all(
+                f"SELECT id, kind, key, label, number FROM nodes WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ):
+                meta[row[0]] = row
+        nodes = []
+        for node_id, node_depth in depth_of.items():
+            _, kind, key, label, number = meta.get(node_id, (node_id, "", "", "", ""))
+            node = {"id": node_id, "kind": kind, "key": key, "label": label, "depth": node_depth}
+            if number:
+                node["company_number"] = number
+            nodes.append(node)
+        seen_edges = set()
+        edge_list = []
+        for owner, owned, attr in edges:
+            if (owner, owned) in seen_edges or owner not in depth_of or owned not in depth_of:
+                continue
+            seen_edges.add((owner, owned))
+            natures = self.natures.get(attr & PSC_EDGE_NATURE_MASK, "")
+            edge_list.append({
+                "from": owner,
+                "to": owned,
+                "natures_of_control": natures.split(";") if natures else [],
+                "ceased": bool(attr & PSC_EDGE_CEASED),
+            })
+        return {"nodes": nodes, "edges": edge_list, "truncated": truncated}
+
+
+_psc_graph: Optional[PscGraph] = None
+_psc_graph_lock = threading.Lock()
+
+
+def get_psc_graph(index_dir: Path) -> Optional[PscGraph]:
+    global _psc_graph
+    bin_path = index_dir / PSC_GRAPH_FILE
+    try:
+        mtime_ns = bin_path.stat().st_mtime_ns
+    except OSError:
+        return None
+    current = _psc_graph
+    if current is not None and current.mtime_ns == mtime_ns:
+        return current
+    with _psc_graph_lock:
+        current = _psc_graph
+        if current is None or current.mtime_ns != mtime_ns:
+            # The old mapping is left for the garbage collector; requests may still be walking it.
+            current = _psc_graph = PscGraph(bin_path, index_dir / PSC_GRAPH_NODES_FILE)
+        return current
+
+
+def normalize_postcode(value) -> str:
+    return re.sub(r"[^A-Z0-9]", "", str(value or "").upper())
+
+
+def format_postcode(key: str) -> str:
+    return f"{key[:-3]} {key[-3:]}" if len(key) > 3 else key
+
+
+def onspd_source_files(root: Path) -> list:
+    """The single-file ONSPD extract when present, otherwise every CSV whose header carries pcd/lat/long."""
+    base = root / ONSPD_DIR
+    whole = sorted(base.rglob("ONSPD_*_UK.csv"))
+    if whole:
+        return whole[-1:]
+    files = []
+    for path in sorted(base.rglob("*.csv")):
+        with open(path, encoding="utf-8-sig", errors="replace") as fh:
+            header = {h.strip().lower() for h in next(csv.reader([fh.readline()]), [])}
+        if {"lat", "long"} <= header and header & {"pcd", "pcds", "pcd2"}:
+            files.append(path)
+    return files
+
+
+def onspd_area_names(root: Path) -> Dict[str, str]:
+    """GSS code -> name from the ONSPD Documents lookups (any CSV with a *CD and a *NM column)."""
+    names: Dict[str, str] = {}
+    for path in sorted((root / ONSPD_DIR).rglob("*.csv")):
+        with open(path, encoding="utf-8-sig", errors="replace") as fh:
+            reader = csv.reader(fh)
+            header = [h.strip().upper() for h in next(reader, [])]
+            code_col = next((i for i, h in enumerate(header) if h.endswith("CD")), None)
+            name_col = next((i for i, h in enumerate(header) if h.endswith("NM")), None)
+            if code_col is None or name_col is None or "LAT" in header:
+                continue
+            for row in reader:
+                if len(row) > max(code_col, name_col) and row[code_col] and row[name_col]:
+                    names.setdefault(row[code_col].strip(), row[name_col].strip())
+    return names
+
+
+def build_postcode_table(root: Path, index_dir: Path, log: Callable[[str], None] = print) -> int:
+    """Pack ONSPD into postcodes.bin: fixed-width records sorted by postcode, then a cell-ordered copy of the
+    located record numbers with a cell directory for nearest-postcode searches."""
+    sources = onspd_source_files(root)
+    if not sources:
+        log(f"No ONSPD CSV found under {root / ONSPD_DIR}")
+        return 0
+    started = time.time()
+    strings: Dict[str, Dict[str, int]] = {field: {"": 0} for field in ONSPD_CODE_FIELDS}
+    records = []
+    for path in sources:
+        with open(path, newline="", encoding="utf-8-sig", errors="replace") as fh:
+            reader = csv.reader(fh)
+            header = [h.strip().lower() for h in next(reader, [])]
+            col = {name: i for i, name in enumerate(header)}
+            key_col = next(col[name] for name in ("pcd", "pcds", "pcd2") if name in col)
+            code_cols = [(strings[field], col.get(field)) for field in ONSPD_CODE_FIELDS]
+            lat_col, lon_col, term_col = col["lat"], col["long"], col.get("doterm")
+            for row in reader:
+                try:
+                    key = normalize_postcode(row[key_col])
+                    lat, lon = float(row[lat_col]), float(row[lon_col])
+                except (IndexError, ValueError):
+                    continue
+                if not key or len(key) > 8:
+                    continue
+                flags = 0
+                if term_col is not None and row[term_col].strip():
+                    flags |= ONSPD_FLAG_TERMINATED
+                if lat > 90 or (lat == 0 and lon == 0):
+                    flags |= ONSPD_FLAG_NO_LOCATION
+                    lat = lon = 0.0
+                codes = []
+                for table, idx in code_cols:
+                    value = row[idx].strip() if idx is not None and idx < len(row) else ""
+                    code = table.get(value)
+                    if code is None:
+                        code = table[value] = len(table)
+                    codes.append(code)
+                records.append(struct.pack(ONSPD_RECORD, key.encode("ascii"), round(lat * 1e6), round(lon * 1e6), *codes, flags))
+        log(f"ONSPD: {len(records)} rows after {path.name}")
+
+    # Sorting the packed records orders them by key; live rows win over terminated duplicates.
+    records.sort(key=lambda rec: (rec[:8], rec[-1] & ONSPD_FLAG_TERMINATED))
+    unique = []
+    last_key = None
+    for rec in records:
+        if rec[:8] != last_key:
+            unique.append(rec)
+            last_key = rec[:8]
+    records = unique
+
+    size = struct.calcsize(ONSPD_RECORD)
+    cells = []
+    for i, rec in enumerate(records):
+        _, lat_e6, lon_e6, *_, flags = struct.unpack(ONSPD_RECORD, rec)
+        if flags:
+            continue
+        cells.append((_onspd_cell(lat_e6 / 1e6, lon_e6 / 1e6), i))
+    cells.sort()
+    spatial = array.array("I", (i for _, i in cells))
+    cell_keys = array.array("Q")
+    cell_starts = array.array("I")
+    for pos, (cell, _) in enumerate(cells):
+        if not cell_keys or cell_keys[-1] != cell:
+            cell_keys.append(cell)
+            cell_starts.append(pos)
+    cell_starts.append(len(cells))
+
+    meta = {
+        "fields": list(ONSPD_CODE_FIELDS),
+        "codes": {field: sorted(table, key=table.get) for field, table in strings.items()},
+        "names": {},
+        "sources": [str(p.relative_to(root)) for p in sources],
+    }
+    names = onspd_area_names(root)
+    used = {code for codes in meta["codes"].values() for code in codes}
+    meta["names"] = {code: name for code, name in names.items() if code in used}
+    meta_bytes = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+    meta_bytes += b" " * (-len(meta_bytes) % 8)
+
+    index_dir.mkdir(parents=True, exist_ok=True)
+    target = index_dir / POSTCODE_TABLE_FILE
+    tmp = target.with_name(target.name + ".building")
+    with open(tmp, "wb") as fh:
+        fh.write(struct.pack(ONSPD_HEADER, ONSPD_MAGIC, len(records), len(spatial), len(cell_keys), len(meta_bytes)))
+        fh.write(meta_bytes)
+        for rec in records:
+            fh.write(rec)
+        fh.write(b"\0" * (-(len(records) * size) % 8))
+        cell_keys.tofile(fh)
+        spatial.tofile(fh)
+        cell_starts.tofile(fh)
+    os.replace(tmp, target)
+    log(f"ONSPD: {len(records)} postcodes ({len(spatial)} located) packed in {time.time() - started:.1f}s")
+    return len(records)
+
+
+_ONSPD_LATLON = struct.Struct("<ii")
+
+
+def _onspd_cell(lat: float, lon: float) -> int:
+    cy = int((lat + 90.0) // ONSPD_CELL_DEG)
+    cx = int((lon + 180.0) // ONSPD_CELL_DEG)
+    return (cy << 32) | cx
+
+
+class PostcodeTable:
+    """mmap view of postcodes.bin: binary search on postcode, ring search over the cell directory for nearest."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.mtime_ns = path.stat().st_mtime_ns
+        self._fh = open(path, "rb")
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        header_size = struct.calcsize(ONSPD_HEADER)
+        magic, self.count, located, cell_count, meta_len = struct.unpack_from(ONSPD_HEADER, self._mm, 0)
+        if magic != ONSPD_MAGIC:
+            raise ValueError(f"{path} is not a postcode table")
+        meta = json.loads(bytes(self._mm[header_size:header_size + meta_len]))
+        self.fields = meta["fields"]
+        self.codes = meta["codes"]
+        self.names = meta["names"]
+        self.record_size = struct.calcsize(ONSPD_RECORD)
+        self._records_at = header_size + meta_len
+        pos = self._records_at + self.count * self.record_size
+        pos += -pos % 8
+        view = memoryview(self._mm)
+        self._cell_keys = view[pos:pos + 8 * cell_count].cast("Q")
+        pos += 8 * cell_count
+        self._spatial = view[pos:pos + 4 * located].cast("I")
+        pos += 4 * located
+        self._cell_starts = view[pos:pos + 4 * (cell_count + 1)].cast("I")
+
+    def _key_at(self, i: int) -> bytes:
+        start = self._records_at + i * self.record_size
+        return self._mm[start:start + 8]
+
+    def _record(self, i: int) -> dict:
+        key, lat_e6, lon_e6, *codes, flags = struct.unpack_from(ONSPD_RECORD, self._mm, self._records_at + i * self.record_size)
+        postcode = key.rstrip(b"\0").decode("ascii")
+        result = {
+            "postcode": format_postcode(postcode),
+            "latitude": None if flags & ONSPD_FLAG_NO_LOCATION else lat_e6 / 1e6,
+            "longitude": None if flags & ONSPD_FLAG_NO_LOCATION else lon_e6 / 1e6,
+            "terminated": bool(flags & ONSPD_FLAG_TERMINATED),
+        }
+        for field, code in zip(self.fields, codes):
+            value = self.codes[field][code]
+            result[field] = value or None
+            if value in self.names:
+                result[f"{field}_name"] = self.names[value]
+        return result
+
+    def lookup(self, postcode: str) -> Optional[dict]:
+        key = normalize_postcode(postcode)
+        if not key or len(key) > 8:
+            return None
+        target = key.encode("ascii").ljust(8, b"\0")
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self._key_at(lo) == target:
+            return self._record(lo)
+        return None
+
+    def _cell_range(self, cell: int) -> range:
+        lo, hi = 0, len(self._cell_keys)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._cell_keys[mid] < cell:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self._cell_keys) and self._cell_keys[lo] == cell:
+            return range(self._cell_starts[lo], self._cell_starts[lo + 1])
+        return range(0)
+
+    def nearest(self, lat: float, lon: float, limit: int = 1, max_km: float = ONSPD_NEAREST_MAX_KM) -> list:
+        """Up to limit live postcodes within max_km, closest first, each with distance_m."""
+        cy0 = int((lat + 90.0) // ONSPD_CELL_DEG)
+        cx0 = int((lon + 180.0) // ONSPD_CELL_DEG)
+        # Candidates are ranked by an equirectangular distance in km, which is plenty at these ranges.
+        ky = 6371.0 * math.pi / 180.0
+        kx = ky * math.cos(math.radians(lat))
+        # One cell is at least this many km wide in both axes.
+        cell_km = ONSPD_CELL_DEG * ky * math.cos(math.radians(min(abs(lat) + ONSPD_CELL_DEG, 89.0)))
+        unpack_latlon = _ONSPD_LATLON.unpack_from
+        mm, base, size, spatial = self._mm, self._records_at + 8, self.record_size, self._spatial
+        max_sq = max_km * max_km
+        found = []
+        ring = 0
+        while True:
+            for cy in range(cy0 - ring, cy0 + ring + 1):
+                edge_row = cy in (cy0 - ring, cy0 + ring)
+                for cx in (range(cx0 - ring, cx0 + ring + 1) if edge_row else (cx0 - ring, cx0 + ring)):
+                    for pos in self._cell_range((cy << 32) | cx):
+                        i = spatial[pos]
+                        lat_e6, lon_e6 = unpack_latlon(mm, base + i * size)
+                        dx = (lon_e6 / 1e6 - lon) * kx
+                        dy = (lat_e6 / 1e6 - lat) * ky
+                        dist_sq = dx * dx + dy * dy
+                        if dist_sq <= max_sq:
+                            found.append((dist_sq, i))
+            if len(found) > limit:
+                found.sort()
+                del found[limit:]
+            # Anything outside the searched square is at least ring * cell_km away.
+            covered_km = ring * cell_km
+            if covered_km >= max_km or (len(found) >= limit and max(found)[0] <= covered_km * covered_km):
+                break
+            ring += 1
+        found.sort()
+        results = []
+        for _, i in found:
+            record = self._record(i)
+            record["distance_m"] = round(haversine_km(lat, lon, record["latitude"], record["longitude"]) * 1000.0, 1)
+            results.append(record)
+        return results
+
+
+_postcode_table: Optional[PostcodeTable] = None
+_postcode_table_lock = threading.Lock()
+
+
+def get_postcode_table(index_dir: Path) -> Optional[PostcodeTable]:
+    global _postcode_table
+    path = index_dir / POSTCODE_TABLE_FILE
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    current = _postcode_table
+    if current is not None and current.mtime_ns == mtime_ns:
+        return current
+    with _postcode_table_lock:
+        current = _postcode_table
+        if current is None or current.mtime_ns != mtime_ns:
+            current = _postcode_table = PostcodeTable(path)
+        return current
+
+
+class PolygonIndex:
+    """Point-in-polygon over GeoJSON (Multi)Polygons: a bbox grid picks candidates, and per-polygon latitude bands
+    keep ray casting to the few edges that can cross the point's latitude."""
+
+    def __init__(self, features: list, bands: int = 256):
+        self.props: list = []
+        self._polygons: list = []
+        self.grid = GridIndex(1.0)
+        for feature in features:
+            geometry = feature.get("geometry") or {}
+            coords = geometry.get("coordinates") or []
+            if geometry.get("type") == "Polygon":
+                polygons = [coords]
+            elif geometry.get("type") == "MultiPolygon":
+                polygons = coords
+            else:
+                continue
+            edges = []
+            for polygon in polygons:
+                for ring in polygon:
+                    try:
+                        points = [(float(p[0]), float(p[1])) for p in ring]
+                    except (TypeError, ValueError, IndexError):
+                        continue
+                    edges.extend(zip(points, points[1:] + points[:1]))
+            edges = [e for e in edges if e[0][1] != e[1][1]]
+            if not edges:
+                continue
+            xs = [x for (x1, _), (x2, _) in edges for x in (x1, x2)]
+            ys = [y for (_, y1), (_, y2) in edges for y in (y1, y2)]
+            west, south, east, north = min(xs), min(ys), max(xs), max(ys)
+            band_h = (north - south) / bands or 1.0
+            buckets = [[] for _ in range(bands)]
+            for (x1, y1), (x2, y2) in edges:
+                lo = max(0, int((min(y1, y2) - south) / band_h))
+                hi = min(bands - 1, int((max(y1, y2) - south) / band_h))
+                for b in range(lo, hi + 1):
+                    buckets[b].append((x1, y1, x2, y2))
+            idx = len(self._polygons)
+            self._polygons.append(((west, south, east, north), band_h, buckets))
+            self.props.append(feature.get("properties") or {})
+            self.grid.insert(idx, west, south, east, north)
+
+    def _contains(self, idx: int, lon: float, lat: float) -> bool:
+        (west, south, east, north), band_h, buckets = self._polygons[idx]
+        if not (west <= lon <= east and south <= lat <= north):
+            return False
+        band = min(len(buckets) - 1, int((lat - south) / band_h))
+        inside = False
+        for x1, y1, x2, y2 in buckets[band]:
+            if (y1 > lat) != (y2 > lat) and lon < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+                inside = not inside
+        return inside
+
+    def containing(self, lon: float, lat: float) -> list:
+        return [self.props[i] for i in self.grid.candidates(lon, lat, lon, lat) if self._contains(i, lon, lat)]
+
+
+def police_force_name(props: dict) -> str:
+    for key in ("PFA22NM", "PFA23NM", "PFA21NM", "PFA20NM", "force_name", "FORCE_NAME", "name", "NAME"):
+        value = props.get(key)
+        if isinstance(value, str) and value.strip():
+            return value.strip()
+    for key, value in props.items():
+        if re.search(r"(^|_)PFA\d{2}NM$", str(key), re.I) and isinstance(value, str) and value.strip():
+            return value.strip()
+    return ""
+
+
+def police_force_code(props: dict) -> str:
+    for key in ("PFA22CD", "PFA23CD", "PFA21CD", "PFA20CD", "force_code", "FORCE_CODE", "code", "CODE"):
+        value = props.get(key)
+        if value is not None and str(value).strip():
+            return str(value).strip()
+    for key, value in props.items():
+        if re.search(r"(^|_)PFA\d{2}CD$", str(key), re.I) and value is not None and str(value).strip():
+            return str(value).strip()
+    return ""
+
+
+_force_areas: Optional[Tuple[int, PolygonIndex]] = None
+_force_areas_lock = threading.Lock()
+
+
+def get_force_area_index(root: Path) -> Optional[PolygonIndex]:
+    """Police force polygons from FORCE_AREAS_FILE, reloaded when the file changes."""
+    global _force_areas
+    path = root / FORCE_AREAS_FILE
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    current = _force_areas
+    if current is not None and current[0] == mtime_ns:
+        return current[1]
+    with _force_areas_lock:
+        current = _force_areas
+        if current is None or current[0] != mtime_ns:
+            with open(path, "rb") as fh:
+                data = json.load(fh)
+            current = _force_areas = (mtime_ns, PolygonIndex(data.get("features") or []))
+        return current[1]
+
+
+LOCAL_INDEX_BUILDERS: Dict[str, Callable[[Path, Path], int]] = {
+    "companies": build_company_index,
+    "search": build_search_index,
+    "psc": build_psc_graph,
+    "postcodes": build_postcode_table,
+}
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def _unit_vector(lat: float, lon: float) -> Tuple[float, float, float]:
+    phi, lam = math.radians(lat), math.radians(lon)
+    return (math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi))
+
+
+class SphereKDTree:
+    """Static 3-d KD-tree over unit-sphere vectors; chord length is monotonic in great-circle distance, so
+    Euclidean pruning gives exact k-nearest and radius answers."""
+
+    def __init__(self, points: list):
+        self.vectors = [_unit_vector(lat, lon) for lat, lon in points]
+        self._point: list = []
+        self._axis: list = []
+        self._left: list = []
+        self._right: list = []
+        self.root = self._build(list(range(len(self.vectors))), 0)
+
+    def _build(self, ids: list, depth: int) -> int:
+        if not ids:
+            return -1
+        axis = depth % 3
+        ids.sort(key=lambda i: self.vectors[i][axis])
+        mid = len(ids) // 2
+        node = len(self._point)
+        self._point.append(ids[mid])
+        self._axis.append(axis)
+        self._left.append(-1)
+        self._right.append(-1)
+        self._left[node] = self._build(ids[:mid], depth + 1)
+        self._right[node] = self._build(ids[mid + 1:], depth + 1)
+        return node
+
+    def nearest(self, lat: float, lon: float, k: int = 1, max_km: Optional[float] = None) -> list:
+        """Up to k (distance_km, point index) pairs, nearest first, optionally within max_km."""
+        if k <= 0 or self.root < 0:
+            return []
+        q = _unit_vector(lat, lon)
+        bound = float("inf")
+        if max_km is not None:
+            bound = (2.0 * math.sin(min(math.pi, max_km / EARTH_RADIUS_KM) / 2.0)) ** 2
+        heap: list = []  # max-heap on squared chord via negation
+        stack = [self.root]
+        vectors, point_of, axis_of, left, right = self.vectors, self._point, self._axis, self._left, self._right
+        while stack:
+            node = stack.pop()
+            if node < 0:
+                continue
+            idx = point_of[node]
+            v = vectors[idx]
+            d2 = (v[0] - q[0]) ** 2 + (v[1] - q[1]) ** 2 + (v[2] - q[2]) ** 2
+            limit = -heap[0][0] if len(heap) >= k else bound
+            if d2 <= limit:
+                heapq.heappush(heap, (-d2, idx))
+                if len(heap) > k:
+                    heapq.heappop(heap)
+                limit = -heap[0][0] if len(heap) >= k else bound
+            diff = q[axis_of[node]] - v[axis_of[node]]
+            near, far = (left[node], right[node]) if diff < 0 else (right[node], left[node])
+            if diff * diff <= limit:
+                stack.append(far)
+            stack.append(near)
+        out = sorted((-neg, idx) for neg, idx in heap)
+        return [(2.0 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(d2) / 2.0)), idx) for d2, idx in out]
+
+    def within(self, lat: float, lon: float, radius_km: float) -> list:
+        return self.nearest(lat, lon, k=len(self.vectors), max_km=radius_km)
+
+
+def _station_key(text: str) -> str:
+    text = str(text or "").lower().replace("&", " and ").replace("'", "").replace("’", "")
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+
+
+def _trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class StationSearchIndex:
+    """Typeahead over station names, CRS codes and aliases: a sorted prefix array answers prefix and
+    word-prefix hits by bisection, a trigram index supplies fuzzy matches, and top-k comes from a heap."""
+
+    def __init__(self, items: list, aliases: Optional[Dict[str, str]] = None):
+        self.items = items
+        by_crs = {st["crs"]: i for i, st in enumerate(items)}
+        entries = []
+        self._names = [_station_key(st["name"]) for st in items]
+        self._trigrams: Dict[str, list] = {}
+        for i, key in enumerate(self._names):
+            words = key.split(" ")
+            for w in range(len(words)):
+                # Whole-name prefixes keep the old startswith + substring score (80 + 40); word prefixes score as substrings.
+                entries.append((" ".join(words[w:]), i, 120.0 if w == 0 else 40.0))
+            for gram in _trigrams(key):
+                self._trigrams.setdefault(gram, []).append(i)
+        self._crs = by_crs
+        self._crs_sorted = sorted(by_crs)
+        self._aliases: Dict[str, list] = {}
+        for alias, crs in (aliases or {}).items():
+            if crs.upper() in by_crs:
+                self._aliases.setdefault(_station_key(alias), []).append(by_crs[crs.upper()])
+        entries.sort()
+        self._keys = [key for key, _, _ in entries]
+        self._entries = [(i, score) for _, i, score in entries]
+        self._cache: "OrderedDict[Tuple[str, int], list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _scores(self, q: str) -> Dict[int, float]:
+        key = _station_key(q)
+        if not key:
+            return {}
+        scores: Dict[int, float] = {}
+        lo = bisect.bisect_left(self._keys, key)
+        hi = bisect.bisect_left(self._keys, key + "\uffff", lo)
+        for i, score in self._entries[lo:hi]:
+            if score > scores.get(i, 0.0):
+                scores[i] = score
+        code = key.replace(" ", "").upper()
+        if len(code) <= 3 and code.isalnum():
+            j = bisect.bisect_left(self._crs_sorted, code)
+            while j < len(self._crs_sorted) and self._crs_sorted[j].startswith(code):
+                crs = self._crs_sorted[j]
+                i = self._crs[crs]
+                scores[i] = scores.get(i, 0.0) + (200.0 if crs == code else 120.0)
+                j += 1
+        for i in self._aliases.get(key, ()):
+            scores[i] = max(scores.get(i, 0.0), 250.0)
+        if len(key) >= 3:
+            grams = _trigrams(key)
+            overlap: Dict[int, int] = {}
+            for gram in grams:
+                for i in self._trigrams.get(gram, ()):
+                    overlap[i] = overlap.get(i, 0) + 1
+            for i, shared in overlap.items():
+                similarity = shared / len(grams)
+                if similarity >= STATION_FUZZY_MIN and i not in scores:
+                    scores[i] = round(30.0 * similarity, 2)
+        return scores
+
+    def search(self, q: str, limit: int = 20) -> list:
+        cache_key = (_station_key(q), limit)
+        with self._lock:
+            hit = self._cache.get(cache_key)
+            if hit is not None:
+                self._cache.move_to_end(cache_key)
+                return hit
+        scores = self._scores(q)
+        top = heapq.nsmallest(limit, scores.items(), key=lambda kv: (-kv[1], self.items[kv[0]]["name"]))
+        out = [self.items[i] for i, _ in top]
+        with self._lock:
+            self._cache[cache_key] = out
+            while len(self._cache) > STATION_SEARCH_CACHE:
+                self._cache.popitem(last=False)
+        return out
+
+
+class StationCatalog:
+    """Rail stations keyed by CRS with a KD-tree over the located ones."""
+
+    def __init__(self, items: list):
+        self.items = items
+        self.by_crs = {st["crs"]: st for st in items}
+        self.search = StationSearchIndex(items, STATION_ALIASES)
+        self._located = []
+        points = []
+        for st in items:
+            try:
+                lat, lon = float(st.get("lat")), float(st.get("lon"))
+            except (TypeError, ValueError):
+                continue
+            self._located.append(st)
+            points.append((lat, lon))
+        self.tree = SphereKDTree(points)
+
+    def near(self, lat: float, lon: float, limit: int, radius_km: float, exclude: str = "") -> list:
+        hits = self.tree.nearest(lat, lon, k=limit + (1 if exclude else 0), max_km=radius_km)
+        out = []
+        for d, idx in hits:
+            st = self._located[idx]
+            if st["crs"] == exclude:
+                continue
+            cp = dict(st)
+            cp["distanceKm"] = round(d, 2)
+            out.append(cp)
+        return out[:limit]
+
+
+def parse_station_rows(raw) -> list:
+    items = []
+    if isinstance(raw, list):
+        for r in raw:
+            crs = str(r.get("crsCode") or "").strip().upper()
+            name = str(r.get("stationName") or "").strip()
+            if len(crs) == 3 and name:
+                items.append(
+                    {
+                        "crs": crs,
+                        "name": name,
+                        "country": str(r.get("constituentCountry") or "").strip().lower(),
+                        "lat": r.get("lat"),
+                        "lon": r.get("long"),
+                    }
+                )
+    return items
+
+
+def read_station_catalog_file(path: Path) -> Optional[Tuple[list, dict]]:
+    """(items, meta) from the gzipped JSON written by write_station_catalog_file, or None when absent/corrupt."""
+    try:
+        with gzip.open(path, "rb") as fh:
+            doc = json.loads(fh.read().decode("utf-8"))
+    except (OSError, ValueError, EOFError):
+        return None
+    cols = doc.get("columns") or []
+    rows = doc.get("rows")
+    if not isinstance(rows, list) or cols != list(STATION_FIELDS):
+        return None
+    return [dict(zip(STATION_FIELDS, row)) for row in rows], doc.get("meta") or {}
+
+
+def write_station_catalog_file(path: Path, items: list, meta: dict):
+    doc = {"meta": meta, "columns": list(STATION_FIELDS), "rows": [[st.get(k) for k in STATION_FIELDS] for st in items]}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with gzip.open(tmp, "wb", compresslevel=9) as fh:
+        fh.write(json.dumps(doc, separators=(",", ":")).encode("utf-8"))
+    os.replace(tmp, path)
+
+
+def refresh_station_catalog(path: Optional[Path], timeout: float = 25) -> str:
+    """Revalidate the catalog upstream with If-None-Match/If-Modified-Since. Returns "updated" or "not-modified";
+    network errors propagate. A new StationCatalog replaces the old one in a single assignment, so readers
+    always see a complete catalog."""
+    with _station_catalog_cache["refresh_lock"]:
+        meta = dict(_station_catalog_cache["meta"])
+        req = urllib.request.Request(UK_RAIL_STATIONS_URL)
+        req.add_header("Accept", "application/json")
+        req.add_header("User-Agent", "ControlRoom/1.0 (+https://localhost)")
+        if _station_catalog_cache["catalog"] is not None:
+            if meta.get("etag"):
+                req.add_header("If-None-Match", meta["etag"])
+            if meta.get("last_modified"):
+                req.add_header("If-Modified-Since", meta["last_modified"])
+        try:
+            with _upstream_pool.urlopen(req, timeout=timeout) as resp:
+                status = resp.status
+                body = resp.read()
+                headers = resp.headers
+        except urllib.error.HTTPError as exc:
+            if exc.code != 304:
+                raise
+            status, body, headers = 304, b"", exc.headers
+        meta["checked_at"] = time.time()
+        if status == 304:
+            _station_catalog_cache["meta"] = meta
+            outcome = "not-modified"
+            items = _station_catalog_cache["catalog"].items
+        else:
+            items = parse_station_rows(json.loads(body.decode("utf-8", errors="replace")))
+            if not items:
+                raise ValueError("upstream station catalog is empty")
+            meta.update(etag=headers.get("ETag") or "", last_modified=headers.get("Last-Modified") or "", fetched_at=meta["checked_at"])
+            _station_catalog_cache["meta"] = meta
+            _station_catalog_cache["catalog"] = StationCatalog(items)
+            outcome = "updated"
+        if path is not None:
+            try:
+                write_station_catalog_file(path, items, meta)
+            except OSError as exc:
+                print(f"!! Could not persist station catalog to {path}: {exc}", file=sys.stderr)
+        return outcome
+
+
+def load_station_catalog(path: Optional[Path]) -> "StationCatalog":
+    """The in-memory catalog, else the persisted copy, else a blocking upstream fetch (first run only)."""
+    catalog = _station_catalog_cache["catalog"]
+    if catalog is not None:
+        return catalog
+    with _station_catalog_cache["load_lock"]:
+        catalog = _station_catalog_cache["catalog"]
+        if catalog is None and path is not None:
+            stored = read_station_catalog_file(path)
+            if stored is not None:
+                _station_catalog_cache["meta"] = stored[1]
+                catalog = _station_catalog_cache["catalog"] = StationCatalog(stored[0])
+        if catalog is None:
+            refresh_station_catalog(path)
+            catalog = _station_catalog_cache["catalog"]
+        return catalog
+
+
+def station_catalog_refresher(path: Optional[Path], interval_s: float):
+    """Background loop: revalidate whenever the last check is older than interval_s."""
+    while True:
+        checked = float(_station_catalog_cache["meta"].get("checked_at") or 0)
+        wait = checked + interval_s - time.time()
+        if wait <= 0:
+            try:
+                print(f"Station catalog refresh: {refresh_station_catalog(path)}")
+            except Exception as exc:
+                print(f"!! Station catalog refresh failed: {exc}", file=sys.stderr)
+                _station_catalog_cache["meta"] = dict(_station_catalog_cache["meta"], checked_at=time.time() - interval_s + 300)
+            continue
+        time.sleep(min(wait, 3600))
+
+
+@dataclass
+class DevServerConfig:
+    host: str = DEFAULT_HOST
+    port: int = DEFAULT_PORT
+    root: Path = PROJECT_ROOT
+    cache_mb: int = DEFAULT_CACHE_MB
+    pool_size: int = DEFAULT_POOL_SIZE
+    pool_idle_s: float = DEFAULT_POOL_IDLE_S
+    pool_max_lifetime_s: float = DEFAULT_POOL_MAX_LIFETIME_S
+    upstream_concurrency: int = DEFAULT_UPSTREAM_CONCURRENCY
+    engine: str = DEFAULT_ENGINE
+    workers: int = DEFAULT_WORKERS
+    static_cache_mb: int = DEFAULT_STATIC_CACHE_MB
+    precompress: str = "background"
+    tile_cache: Optional[Path] = None
+    index_dir: Path = PROJECT_ROOT / ".cache" / "index"
+    build_indexes: Tuple[str, ...] = ()
+    warm: str = "off"
+    flight_history: Optional[Path] = None
+
+
+def parse_server_config(argv: Optional[list] = None) -> DevServerConfig:
+    parser = argparse.ArgumentParser(
+        description="Control Room development server"
+    )
+    parser.add_argument("port", nargs="?", type=int, help="Port to bind (default: 8000 or CR_DEV_PORT)")
+    parser.add_argument("--port", dest="override_port", type=int, help="Explicit port override")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Host/interface to bind (default: %(default)s)")
+    parser.add_argument(
+        "--root",
+        type=Path,
+        default=PROJECT_ROOT,
+        help="Root directory to serve static assets from",
+    )
+    parser.add_argument(
+        "--cache-mb",
+        type=int,
+        default=DEFAULT_CACHE_MB,
+        help="Upstream response cache size in MB, 0 disables (default: %(default)s or CR_CACHE_MB)",
+    )
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=DEFAULT_POOL_SIZE,
+        help="Idle keep-alive connections kept per upstream host, 0 disables reuse (default: %(default)s or CR_POOL_SIZE)",
+    )
+    parser.add_argument(
+        "--pool-idle",
+        type=float,
+        default=DEFAULT_POOL_IDLE_S,
+        help="Seconds an idle upstream connection is kept (default: %(default)s or CR_POOL_IDLE_S)",
+    )
+    parser.add_argument(
+        "--pool-max-lifetime",
+        type=float,
+        default=DEFAULT_POOL_MAX_LIFETIME_S,
+        help="Maximum age in seconds of a reused upstream connection (default: %(default)s or CR_POOL_MAX_LIFETIME_S)",
+    )
+    parser.add_argument(
+        "--upstream-concurrency",
+        type=int,
+        default=DEFAULT_UPSTREAM_CONCURRENCY,
+        help="Maximum in-flight requests per upstream host, 0 for unbounded (default: %(default)s or CR_UPSTREAM_CONCURRENCY)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=("threading", "asyncio"),
+        default=DEFAULT_ENGINE if DEFAULT_ENGINE in {"threading", "asyncio"} else "threading",
+        help="Server core: thread per connection, or an asyncio event loop with a bounded worker pool (default: %(default)s or CR_ENGINE)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="Route worker threads for --engine asyncio (default: %(default)s or CR_WORKERS)",
+    )
+    parser.add_argument(
+        "--static-cache-mb",
+        type=int,
+        default=DEFAULT_STATIC_CACHE_MB,
+        help="Memory budget for cached static payloads in MB (default: %(default)s or CR_STATIC_CACHE_MB)",
+    )
+    parser.add_argument(
+        "--precompress",
+        choices=("background", "only", "off"),
+        default="background",
+        help="Write .gz/.br/.zst siblings for precompressed static rules in the background at startup, "
+        "or only do that and exit (build step), or skip it (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--tile-cache",
+        default=DEFAULT_TILE_CACHE_DIR,
+        help="Directory for cut vector tiles, or 'off' (default: <root>/.cache/tiles or CR_TILE_CACHE_DIR)",
+    )
+    parser.add_argument(
+        "--index-dir",
+        default=DEFAULT_INDEX_DIR,
+        help="Directory holding the offline /local/* indexes (default: <root>/.cache/index or CR_INDEX_DIR)",
+    )
+    parser.add_argument(
+        "--build-index",
+        action="append",
+        choices=sorted(LOCAL_INDEX_BUILDERS),
+        default=[],
+        help="Build an offline index from the local datasets and exit; repeat for several",
+    )
+    parser.add_argument(
+        "--warm",
+        nargs="?",
+        const="background",
+        choices=("off", "background", "block"),
+        default="off",
+        help="Preload the station catalog, precompressed statics and local indexes concurrently; "
+        "/__control_room_health reports ready once done. 'block' finishes before binding (default: %(default)s, bare flag: background)",
+    )
+    parser.add_argument(
+        "--flight-history",
+        nargs="?",
+        const="",
+        default=os.environ.get("CR_FLIGHT_HISTORY_DIR") or None,
+        help="Keep the FR24 poller running and record flight tracks for /api/flights/history; "
+        "optional directory for the segment log (default when given: <root>/.cache/flights, or CR_FLIGHT_HISTORY_DIR)",
+    )
+    args = parser.parse_args(argv)
+    host = args.host or DEFAULT_HOST
+    positional_port = getattr(args, "port", None)
+    port = args.override_port or positional_port or DEFAULT_PORT
+    root = args.root.resolve()
+    if args.tile_cache == "off":
+        tile_cache = None
+    else:
+        tile_cache = Path(args.tile_cache).resolve() if args.tile_cache else root / ".cache" / "tiles"
+    return DevServerConfig(
+        host=host,
+        port=port,
+        root=root,
+        cache_mb=max(0, args.cache_mb),
+        pool_size=max(0, args.pool_size),
+        pool_idle_s=max(0.0, args.pool_idle),
+        pool_max_lifetime_s=max(0.0, args.pool_max_lifetime),
+        upstream_concurrency=max(0, args.upstream_concurrency),
+        engine=args.engine,
+        workers=max(1, args.workers),
+        static_cache_mb=max(0, args.static_cache_mb),
+        precompress=args.precompress,
+        tile_cache=tile_cache,
+        index_dir=Path(args.index_dir).resolve() if args.index_dir else root / ".cache" / "index",
+        build_indexes=tuple(args.build_index),
+        warm=args.warm,
+        flight_history=None if args.flight_history is None else (Path(args.flight_history).resolve() if args.flight_history else root / ".cache" / "flights"),
+    )
+
+
+_warmup_state = {
+    "mode": "off",
+    "ready": True,
+    "started_at": None,
+    "finished_at": None,
+    "tasks": {},
+}
+
+
+def warmup_tasks(config: "DevServerConfig") -> list:
+    """(name, callable) pairs for --warm. Each returns a short detail string or None when there is nothing to load."""
+    root, index_dir = config.root, config.index_dir
+
+    def stations():
+        return f"{len(load_station_catalog(index_dir / STATION_CATALOG_FILE).items)} stations"
+
+    def statics():
+        return f"{precompress_static_assets(root, log=lambda _msg: None)} variant(s) written"
+
+    def tile_sources():
+        loaded = [layer for layer in TILE_LAYERS if get_tile_source(root, layer) is not None]
+        return f"{len(loaded)} layer(s)" if loaded else None
+
+    def loaded(getter, *args):
+        return lambda: "loaded" if getter(*args) is not None else None
+
+    tasks = [
+        ("stations", stations),
+        ("crime", loaded(get_crime_index, root)),
+        ("force-areas", loaded(get_force_area_index, root)),
+        ("tile-sources", tile_sources),
+        ("companies", loaded(get_company_index, root, index_dir)),
+        ("search", loaded(get_search_index, index_dir)),
+        ("psc", loaded(get_psc_graph, index_dir)),
+        ("postcodes", loaded(get_postcode_table, index_dir)),
+    ]
+    if config.precompress != "off":
+        tasks.insert(1, ("statics", statics))
+    return tasks
+
+
+def run_warmup(config: "DevServerConfig", log=print) -> bool:
+    """Run the warm-up tasks concurrently, recording progress in _warmup_state. Returns True when none failed."""
+    tasks = warmup_tasks(config)
+    state = _warmup_state
+    state.update(ready=False, started_at=time.time(), finished_at=None)
+    state["tasks"] = {name: {"state": "pending"} for name, _ in tasks}
+    done = [0]
+    done_lock = threading.Lock()
+
+    def run(name, fn):
+        entry = state["tasks"][name]
+        entry["state"] = "running"
+        started = time.perf_counter()
+        try:
+            detail = fn()
+            entry.update(state="done" if detail is not None else "skipped", detail=detail or "no local data")
+        except Exception as exc:
+            entry.update(state="failed", detail=str(exc))
+        entry["took_s"] = round(time.perf_counter() - started, 3)
+        with done_lock:
+            done[0] += 1
+            log(f"Warm-up [{done[0]}/{len(tasks)}] {name}: {entry['state']} ({entry['detail']}) in {entry['took_s']:.2f}s")
+
+    with ThreadPoolExecutor(max_workers=WARMUP_WORKERS, thread_name_prefix="cr-warm") as pool:
+        for name, fn in tasks:
+            pool.submit(run, name, fn)
+    state.update(ready=True, finished_at=time.time())
+    failed = [name for name, entry in state["tasks"].items() if entry["state"] == "failed"]
+    log(f"Warm-up finished in {state['finished_at'] - state['started_at']:.1f}s" + (f"; failed: {', '.join(failed)}" if failed else ""))
+    return not failed
+
+
+def b64(s: str) -> str:
+    return base64.b64encode(s.encode("utf-8")).decode("ascii")
+
+
+def load_env_file():
+    env_path = PROJECT_ROOT / ".env"
+    if env_path.exists():
+        print(f"Loading environment from: {env_path}")
+        with open(env_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#") and "=" in line:
+                    key, value = line.split("=", 1)
+                    os.environ[key.strip()] = value.strip()
+                    if key.strip() == "CH_API_KEY":
+                        print(f"CH_API_KEY loaded: {value.strip()[:8]}...")
+                    if key.strip() == "OS_PLACES_API_KEY":
+                        print(f"OS_PLACES_API_KEY loaded: {value.strip()[:8]}...")
+                    if key.strip() == "NRE_LDBWS_TOKEN":
+                        print(f"NRE_LDBWS_TOKEN loaded: {value.strip()[:8]}...")
+                    if key.strip() == "DVLA_API_KEY":
+                        print(f"DVLA_API_KEY loaded: {value.strip()[:8]}...")
+    else:
+        print(f"Warning: No .env file found at {env_path}")
+        print("Set CH_API_KEY environment variable or create .env file")
+
+
+@dataclass
+class RouteSpec:
+    method: str
+    prefix: str
+    handler: str
+    summary: str = ""
+    func: Optional[Callable] = None
+
+    @property
+    def display(self) -> str:
+        return self.prefix + ("*" if self.prefix.endswith("/") else "")
+
+
+class _RouteNode:
+    __slots__ = ("children", "spec", "subtree_spec")
+
+    def __init__(self):
+        self.children: Dict[str, "_RouteNode"] = {}
+        self.spec: Optional[RouteSpec] = None
+        self.subtree_spec: Optional[RouteSpec] = None
+
+
+class RouteTable:
+    """Segment trie over route prefixes; lookup cost follows path depth, not route count.
+
+    "/a/b" matches /a/b and anything below it, while "/a/" only matches paths below /a.
+    The deepest matching prefix wins.
+    """
+
+    def __init__(self, handler_class, routes):
+        self.routes = list(routes)
+        self._roots: Dict[str, _RouteNode] = {}
+        for spec in self.routes:
+            spec.func = getattr(handler_class, spec.handler)
+            node = self._roots.setdefault(spec.method, _RouteNode())
+            for segment in spec.prefix.strip("/").split("/"):
+                node = node.children.setdefault(segment, _RouteNode())
+            if spec.prefix.endswith("/"):
+                node.subtree_spec = spec
+            else:
+                node.spec = spec
+
+    def match(self, method: str, path: str) -> Optional[RouteSpec]:
+        node = self._roots.get(method)
+        if node is None:
+            return None
+        segments = path.split("/")[1:]
+        best = None
+        for i, segment in enumerate(segments):
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if node.spec is not None:
+                best = node.spec
+            if node.subtree_spec is not None and i + 1 < len(segments):
+                best = node.subtree_spec
+        return best
+
+
+class Handler(SimpleHTTPRequestHandler):
+    tile_cache_dir: Optional[Path] = None
+    index_dir: Path = PROJECT_ROOT / ".cache" / "index"
+
+    def end_headers(self):
+        # Dev UX: always disable browser caching for HTML/CSS/JS so UI changes are immediate.
+        # The static engine sets its own revalidating Cache-Control so unchanged files can still be 304s.
+        path = urlsplit(getattr(self, "path", "")).path.lower()
+        if getattr(self, "_static_response", False):
+            pass
+        elif path == "/" or path.endswith(".html") or path.endswith(".css") or path.endswith(".js"):
+            self.send_header("Cache-Control", "no-store, no-cache, must-revalidate, max-age=0")
+            self.send_header("Pragma", "no-cache")
+            self.send_header("Expires", "0")
+        super().end_headers()
+
+    def _serve_static_asset(self, head_only: bool = False) -> bool:
+        rel_path = unquote(self.route_url.path).lstrip("/")
+        if not rel_path or rel_path.endswith("/"):
+            rel_path += "index.html"
+        rule = match_static_rule(rel_path)
+        if rule is None:
+            return False
+        root = Path(self.directory).resolve()
+        try:
+            fs_path = (root / rel_path).resolve(strict=True)
+        except (FileNotFoundError, OSError):
+            return False
+        if not fs_path.is_file() or not fs_path.is_relative_to(root):
+            return False
+        stat = fs_path.stat()
+        content_type = rule.content_type or self.guess_type(str(fs_path))
+        last_modified = _http_date(stat.st_mtime)
+
+        # Never compress large files in the request thread; they only get siblings from the precompression stage.
+        variants = {}
+        for encoding, ext in STATIC_ENCODINGS:
+            sibling = fs_path.with_name(fs_path.name + ext)
+            try:
+                sib_stat = sibling.stat()
+            except FileNotFoundError:
+                continue
+            if sib_stat.st_mtime >= stat.st_mtime:
+                variants[encoding] = (sibling, sib_stat)
+        if (
+            "gzip" not in variants
+            and STATIC_PRECOMPRESS_MIN_BYTES <= stat.st_size <= STATIC_INLINE_GZIP_MAX_BYTES
+            and _is_compressible_type(content_type)
+        ):
+            variants["gzip"] = None
+
+        # Hashing a huge file would stall this request; it gets a weak validator until warm-up has hashed it.
+        content_hash = static_content_etag(fs_path, stat, compute=stat.st_size < STATIC_STREAM_THRESHOLD)
+
+        def etag_for(enc: Optional[str]) -> str:
+            suffix = f"-{enc}" if enc else ""
+            if content_hash:
+                return f'"{content_hash}{suffix}"'
+            return f'W/"{stat.st_size:x}-{stat.st_mtime_ns:x}{suffix}"'
+
+        range_header = self.headers.get("Range")
+        encoding = None if range_header else _negotiate_encoding(self.headers.get("Accept-Encoding") or "", variants)
+        etag = etag_for(encoding)
+
+        self._static_response = True
+        if self._static_not_modified(stat, [etag_for(None)] + [etag_for(enc) for enc in variants]):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+            self.send_header("Cache-Control", rule.cache_control)
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return True
+
+        byte_range = None
+        if range_header:
+            if_range = self.headers.get("If-Range")
+            if not if_range or if_range.strip() in {etag, last_modified}:
+                byte_range = _parse_byte_range(range_header, stat.st_size)
+        if byte_range == (-1, -1):
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{stat.st_size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return True
+
+        payload = None
+        body_path, body_size = fs_path, stat.st_size
+        if encoding and variants[encoding] is not None:
+            body_path, body_size = variants[encoding][0], variants[encoding][1].st_size
+        elif encoding:
+            version = (stat.st_mtime_ns, stat.st_size)
+            payload = _static_cache.get((str(fs_path), "gzip"), version)
+            if payload is None:
+                payload = gzip.compress(fs_path.read_bytes(), 6)
+                _static_cache.put((str(fs_path), "gzip"), version, payload)
+            body_size = len(payload)
+
+        self.send_response(206 if byte_range else 200)
+        self.send_header("Content-Type", content_type)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Cache-Control", rule.cache_control)
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        self.send_header("Accept-Ranges", "bytes")
+        if byte_range:
+            start, end = byte_range
+            self.send_header("Content-Range", f"bytes {start}-{end}/{stat.st_size}")
+            self.send_header("Content-Length", str(end - start + 1))
+        else:
+            self.send_header("Content-Length", str(body_size))
+        self.end_headers()
+        if head_only:
+            return True
+
+        if byte_range:
+            self._send_file_body(fs_path, byte_range[0], byte_range[1] - byte_range[0] + 1)
+            return True
+        if payload is not None:
+            self.wfile.write(payload)
+            return True
+        # Files the memory cache would not keep anyway go out zero-copy from disk.
+        if body_size >= STATIC_STREAM_THRESHOLD or not _static_cache.accepts(body_size):
+            self._send_file_body(body_path, 0, body_size)
+            return True
+        version = (body_path.stat().st_mtime_ns, body_size)
+        payload = _static_cache.get((str(body_path), ""), version)
+        if payload is None:
+            payload = body_path.read_bytes()
+            _static_cache.put((str(body_path), ""), version, payload)
+        self.wfile.write(payload)
+        return True
+
+    def _static_not_modified(self, stat, etags) -> bool:
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            offered = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in offered or bool(offered & {tag.removeprefix("W/") for tag in etags})
+        since = _parse_http_date(self.headers.get("If-Modified-Since") or "")
+        return since is not None and int(stat.st_mtime) <= since
+
+    def _send_file_body(self, fs_path: Path, offset: int, length: int):
+        """Send a file slice without copying it through Python buffers where the platform allows."""
+        if length <= 0:
+            return
+        with fs_path.open("rb") as f:
+            if isinstance(self.connection, socket.socket):
+                # socket.sendfile uses os.sendfile (kernel zero-copy) and falls back to send() on its own,
+                # e.g. for TLS sockets or platforms without sendfile.
+                self.wfile.flush()
+                self.connection.sendfile(f, offset, length)
+                return
+            # No raw socket (asyncio bridge): write straight out of the page cache via mmap.
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    end = offset + length
+                    for start in range(offset, end, STATIC_MMAP_CHUNK_BYTES):
+                        self.wfile.write(view[start:min(end, start + STATIC_MMAP_CHUNK_BYTES)])
+                finally:
+                    view.release()
+
+    def _haversine_km(self, lat1, lon1, lat2, lon2):
+        return haversine_km(lat1, lon1, lat2, lon2)
+
+    def _load_station_catalog(self) -> "StationCatalog":
+        return load_station_catalog(self.index_dir / STATION_CATALOG_FILE)
+
+    def _send_json_error(self, status: int, payload: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_proxied(self, status: int, content_type: str, body: bytes, cache_state: str = "", age: float = 0.0):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Content-Length", str(len(body)))
+        if cache_state:
+            self.send_header("X-Cache", cache_state)
+            self.send_header("Age", str(int(age)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _accepts_encoding(self, coding: str) -> bool:
+        return coding in (self.headers.get("Accept-Encoding") or "").lower()
+
+    def _relay_upstream(self, resp, default_type: str, extra_headers: Optional[Dict[str, str]] = None, compress: bool = False):
+        """Stream an upstream response to the client chunk by chunk instead of buffering the body."""
+        content_type = resp.headers.get("Content-Type", default_type)
+        upstream_encoding = resp.headers.get("Content-Encoding")
+        length = resp.headers.get("Content-Length")
+        compressor = None
+        if compress and not upstream_encoding and self._accepts_encoding("gzip") and _is_compressible_type(content_type):
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        chunked = compressor is not None or not length
+        if chunked and self.request_version != "HTTP/1.1":
+            # HTTP/1.0 clients cannot decode chunked framing; delimit the body by closing instead.
+            chunked = False
+            self.close_connection = True
+
+        self.send_response(resp.status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        for key, value in (extra_headers or {}).items():
+            self.send_header(key, value)
+        if upstream_encoding:
+            self.send_header("Content-Encoding", upstream_encoding)
+        elif compressor is not None:
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Vary", "Accept-Encoding")
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        elif length and compressor is None:
+            self.send_header("Content-Length", length)
+        self.end_headers()
+
+        def emit(data: bytes):
+            if not data:
+                return
+            if chunked:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            else:
+                self.wfile.write(data)
+
+        try:
+            while True:
+                chunk = resp.read(STREAM_CHUNK_BYTES)
+                if not chunk:
+                    break
+                emit(compressor.compress(chunk) if compressor is not None else chunk)
+            if compressor is not None:
+                emit(compressor.flush())
+            if chunked:
+                self.wfile.write(b"0\r\n\r\n")
+        except Exception:
+            # Headers are already on the wire, so the only honest signal left is a truncated connection.
+            self.close_connection = True
+
+    def _stream_proxy_get(self, upstream_url: str, headers: Optional[Dict[str, str]] = None):
+        req = urllib.request.Request(upstream_url)
+        req.add_header("User-Agent", "ControlRoom/1.0 (+https://localhost)")
+        for key, value in (headers or {}).items():
+            req.add_header(key, value)
+        try:
+            with _upstream_pool.urlopen(req, timeout=30) as resp:
+                self._relay_upstream(resp, "application/json")
+        except urllib.error.HTTPError as e:
+            body = e.read() if hasattr(e, "read") else b"{}"
+            self._send_json_error(e.code, body)
+        except Exception as e:
+            payload = ("{\"error\":\"Upstream failed\",\"detail\":\"%s\"}" % str(e)).encode("utf-8")
+            self._send_json_error(502, payload)
+        return True
+
+    def _proxy_get(self, upstream_url: str, headers: Optional[Dict[str, str]] = None):
+        policy = _proxy_cache_policy(self.route_url.path) if _response_cache.enabled else None
+        if not policy:
+            return self._stream_proxy_get(upstream_url, headers)
+        key = _proxy_cache_key(upstream_url, headers)
+        entry, state = _response_cache.lookup(key)
+        if entry is not None:
+            if state == "STALE" and _response_cache.begin_refresh(key):
+                threading.Thread(
+                    target=_refresh_cache_entry,
+                    args=(key, upstream_url, headers, policy),
+                    daemon=True,
+                ).start()
+            self._send_proxied(entry.status, entry.content_type, entry.body, state, entry.age(time.time()))
+            return True
+
+        try:
+            status, content_type, body = _upstream_flights.do(
+                "proxy:" + key, lambda: _fetch_upstream(upstream_url, headers)
+            )
+        except Exception as e:
+            payload = ("{\"error\":\"Upstream failed\",\"detail\":\"%s\"}" % str(e)).encode("utf-8")
+            self._send_json_error(502, payload)
+            return True
+        if status >= 400:
+            self._send_json_error(status, body)
+            return True
+        if status == 200:
+            _response_cache.store(key, _CacheEntry(status, content_type, body, time.time(), *policy))
+        self._send_proxied(status, content_type, body, "MISS")
+        return True
+
+    def _send_json_body(self, body: bytes, status: int = 200, cache_control: str = ""):
+        """Pre-encoded JSON, gzipped on the fly when the client accepts it and the body is worth compressing."""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Vary", "Accept-Encoding")
+        if cache_control:
+            self.send_header("Cache-Control", cache_control)
+        if len(body) >= STATIC_PRECOMPRESS_MIN_BYTES and self._accepts_encoding("gzip"):
+            body = gzip.compress(body, compresslevel=5)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _send_json(self, payload, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json_response(self, resp) -> Optional[dict]:
+        try:
+            raw = resp.read().decode("utf-8", errors="replace")
+            data = json.loads(raw)
+            return data if isinstance(data, dict) else None
+        except Exception:
+            return None
+
+    def _is_allowed_raildata_url(self, url: str) -> bool:
+        try:
+            parsed = urlsplit(str(url or "").strip())
+            if parsed.scheme not in {"http", "https"}:
+                return False
+            host = (parsed.hostname or "").lower()
+            return host in RAILDATA_ALLOWED_HOSTS
+        except Exception:
+            return False
+
+    def _render_url_template(self, url_template: str, values: Dict[str, str]):
+        url = str(url_template or "")
+        needed = [part[1] for part in re.findall(r"(\{([A-Za-z0-9_]+)\})", url)]
+        missing = []
+        for key in needed:
+            value = str(values.get(key, "")).strip()
+            if not value:
+                missing.append(key)
+                continue
+            url = url.replace(f"{{{key}}}", quote_plus(value))
+        return url, missing
+
+    def _proxy_raildata_url(self, upstream_url: str, auth_mode: str = "token", apikey_env: str = "RAILDATA_API_KEY"):
+        if not self._is_allowed_raildata_url(upstream_url):
+            self._send_json(
+                {
+                    "error": "Blocked RailData URL host",
+                    "url": upstream_url,
+                    "allowed_hosts": sorted(RAILDATA_ALLOWED_HOSTS),
+                },
+                status=400,
+            )
+            return True
+
+        req = urllib.request.Request(upstream_url)
+        req.add_header("Accept", "application/json, application/xml, text/xml, text/plain, application/octet-stream")
+        req.add_header("User-Agent", "ControlRoom/1.0 (+https://localhost)")
+
+        if auth_mode == "token":
+            token, err = self._get_raildata_auth_token()
+            if err:
+                self._send_json(err, status=500)
+                return True
+            req.add_header("X-Auth-Token", token or "")
+        elif auth_mode == "apikey":
+            api_key = os.environ.get(apikey_env, "").strip()
+            if not api_key:
+                self._send_json({"error": f"{apikey_env} env var not set"}, status=500)
+                return True
+            req.add_header("x-apikey", api_key)
+        elif auth_mode == "basic":
+            username = os.environ.get("RAILDATA_USERNAME", "").strip()
+            password = os.environ.get("RAILDATA_PASSWORD", "").strip()
+            if not username or not password:
+                self._send_json({"error": "RAILDATA_USERNAME and RAILDATA_PASSWORD required for basic auth endpoint"}, status=500)
+                return True
+            req.add_header("Authorization", f"Basic {b64(f'{username}:{password}')}")
+
+        try:
+            with _upstream_pool.urlopen(req, timeout=40) as resp:
+                self._relay_upstream(resp, "application/octet-stream", compress=True)
+                return True
+        except urllib.error.HTTPError as e:
+            body = e.read() if hasattr(e, "read") else b"{}"
+            if e.code == 401 and auth_mode == "token" and not os.environ.get("RAILDATA_AUTH_TOKEN", "").strip():
+                _raildata_auth_cache["token"] = ""
+            self._send_json_error(e.code, body)
+            return True
+        except Exception as e:
+            self._send_json({"error": "RailData upstream failed", "detail": str(e)}, status=502)
+            return True
+
+    def _get_raildata_auth_token(self) -> Tuple[Optional[str], Optional[dict]]:
+        direct = os.environ.get("RAILDATA_AUTH_TOKEN", "").strip()
+        if direct:
+            return direct, None
+
+        cached = _raildata_auth_cache.get("token", "").strip()
+        if cached:
+            return cached, None
+
+        username = os.environ.get("RAILDATA_USERNAME", "").strip()
+        password = os.environ.get("RAILDATA_PASSWORD", "").strip()
+        if not username or not password:
+            return None, {"error": "RAILDATA credentials not set (use RAILDATA_AUTH_TOKEN or RAILDATA_USERNAME/RAILDATA_PASSWORD)"}
 
         attempts = [
             ("/api/v1/token", {"username": username, "password": password}),
@@ -393,7 +4800,7 @@ class Handler(SimpleHTTPRequestHandler):
                 req.add_header("Accept", "application/json")
                 req.add_header("Content-Type", "application/json")
                 req.add_header("User-Agent", "ControlRoom/1.0 (+https://localhost)")
-                with urllib.request.urlopen(req, timeout=20) as resp:
+                with _upstream_pool.urlopen(req, timeout=20) as resp:
                     data = self._read_json_response(resp) or {}
                     token = str(
                         data.get("token")
@@ -528,7 +4935,7 @@ class Handler(SimpleHTTPRequestHandler):
             req.add_header("Accept", "application/json")
             req.add_header("x-apikey", api_key)
             req.add_header("User-Agent", "ControlRoom/1.0 (+https://localhost)")
-            with urllib.request.urlopen(req, timeout=30) as resp:
+            with _upstream_pool.urlopen(req, timeout=30) as resp:
                 text = resp.read().decode("utf-8", errors="replace")
                 parsed = json.loads(text)
                 return self._normalize_raildata_board(parsed, board_type, crs), None
@@ -557,7 +4964,7 @@ class Handler(SimpleHTTPRequestHandler):
             req.add_header("Accept", "application/json")
             req.add_header("x-apikey", api_key)
             req.add_header("User-Agent", "ControlRoom/1.0 (+https://localhost)")
-            with urllib.request.urlopen(req, timeout=30) as resp:
+            with _upstream_pool.urlopen(req, timeout=30) as resp:
                 text = resp.read().decode("utf-8", errors="replace")
                 parsed = json.loads(text)
                 def stop_obj(x):
@@ -640,94 +5047,13 @@ class Handler(SimpleHTTPRequestHandler):
         return envelope.encode("utf-8")
 
     def _http_get_json_gzip(self, url: str, timeout_s: int = 15):
-        try:
-            req = urllib.request.Request(
-                url,
-                headers={
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0 Safari/537.36",
-                    "Accept": "application/json, text/plain, */*",
-                    "Accept-Encoding": "gzip",
-                    "Referer": "https://www.flightradar24.com/",
-                    "Origin": "https://www.flightradar24.com",
-                },
-            )
-            with urllib.request.urlopen(req, timeout=timeout_s) as resp:
-                raw = resp.read()
-                enc = (resp.headers.get("Content-Encoding") or "").strip().lower()
-                if enc == "gzip":
-                    raw = gzip.decompress(raw)
-            return json.loads(raw.decode("utf-8", errors="replace"))
-        except Exception:
-            return None
+        return http_get_json_gzip(url, timeout_s)
 
     def _fr24_fetch_feed(self, bounds):
-        try:
-            n, s, w, e = bounds
-        except Exception:
-            n, s, w, e = FR24_DEFAULT_BOUNDS
-        params = {
-            "faa": "1",
-            "satellite": "1",
-            "mlat": "1",
-            "flarm": "1",
-            "adsb": "1",
-            "gnd": "1",
-            "air": "1",
-            "vehicles": "0",
-            "estimated": "1",
-            "maxage": "14400",
-            "gliders": "0",
-            "stats": "1",
-            "limit": "1500",
-            "bounds": f"{n},{s},{w},{e}",
-        }
-        url = FR24_FEED_URL + "?" + urlencode(params)
-        return self._http_get_json_gzip(url, timeout_s=15)
+        return http_get_json_gzip(fr24_feed_url(bounds), timeout_s=15)
 
     def _fr24_extract_flights(self, payload):
-        flights = []
-        if not isinstance(payload, dict):
-            return flights
-        for fid, info in payload.items():
-            fid_s = str(fid or "")
-            if not fid_s or not fid_s[0].isdigit():
-                continue
-            if not isinstance(info, list) or len(info) < 17:
-                continue
-
-            def at(i):
-                try:
-                    return info[i]
-                except Exception:
-                    return None
-
-            lat = at(1)
-            lon = at(2)
-            if lat is None or lon is None:
-                continue
-            flights.append(
-                {
-                    "id": fid_s,
-                    "icao24": at(0),
-                    "lat": lat,
-                    "lon": lon,
-                    "heading": at(3),
-                    "altitude": at(4),
-                    "speed": at(5),
-                    "squawk": at(6),
-                    "aircraft": at(8),
-                    "registration": at(9),
-                    "time": at(10),
-                    "origin": at(11),
-                    "destination": at(12),
-                    "number": at(13),
-                    "onGround": at(14),
-                    "verticalSpeed": at(15),
-                    "callsign": at(16),
-                    "airlineIcao": at(18),
-                }
-            )
-        return flights
+        return fr24_extract_flights(payload)
 
     def _fr24_fetch_details(self, flight_id: str):
         fid = str(flight_id or "").strip()
@@ -743,6 +5069,10 @@ class Handler(SimpleHTTPRequestHandler):
             return None, {"error": "NRE_LDBWS_TOKEN env var not set"}
 
         endpoint = os.environ.get("NRE_LDBWS_URL", NRE_LDBWS_URL).strip() or NRE_LDBWS_URL
+        flight_key = "ldbws:" + hashlib.sha256(f"{endpoint}\n{token}\n{method}\n{body_xml}".encode("utf-8")).hexdigest()
+        return _upstream_flights.do(flight_key, lambda: self._call_ldbws_uncoalesced(endpoint, token, method, body_xml))
+
+    def _call_ldbws_uncoalesced(self, endpoint: str, token: str, method: str, body_xml: str):
         payload = self._build_ldbws_envelope(token, method, body_xml)
         req = urllib.request.Request(endpoint, data=payload, method="POST")
         req.add_header("Content-Type", "text/xml; charset=utf-8")
@@ -751,7 +5081,7 @@ class Handler(SimpleHTTPRequestHandler):
         req.add_header("User-Agent", "ControlRoom/1.0 (+https://localhost)")
 
         try:
-            with urllib.request.urlopen(req, timeout=30) as resp:
+            with _upstream_pool.urlopen(req, timeout=30) as resp:
                 xml_body = resp.read()
                 root = ET.fromstring(xml_body)
                 for el in root.iter():
@@ -831,778 +5161,1531 @@ class Handler(SimpleHTTPRequestHandler):
             "delayReason": self._find_first_text(details, "delayReason", ""),
         }
 
-    def do_GET(self):
-        clean_path = self.path.split("?", 1)[0]
-        if clean_path in STATIC_ACCELERATED_FILES and self._serve_accelerated_static(clean_path):
+    def _get_health(self):
+        ready = _warmup_state["ready"]
+        self._send_json(
+            {
+                "ok": True,
+                "ready": ready,
+                "warmup": {
+                    "mode": _warmup_state["mode"],
+                    "started_at": _warmup_state["started_at"],
+                    "finished_at": _warmup_state["finished_at"],
+                    "tasks": _warmup_state["tasks"],
+                },
+                "service": "control-room-dev-server",
+                "ts": int(time.time()),
+                "cache": _response_cache.stats(),
+                "coalescing": _upstream_flights.stats(),
+                "flightPoller": _flight_poller.stats(),
+                "stream": _stream_hub.stats(),
+                "flightTracks": _flight_tracks.stats() if _flight_tracks else None,
+                "pool": _upstream_pool.stats(),
+                "engine": self.server.stats() if hasattr(self.server, "stats") else {"name": "threading"},
+            },
+            status=200 if ready else 503,
+        )
+
+    def _get_companies_house(self):
+        api_key = os.environ.get("CH_API_KEY", "").strip()
+        if not api_key:
+            self._send_json_error(500, b'{"error":"CH_API_KEY env var not set"}')
+            return
+
+        upstream_url = CH_API_BASE + self.path.replace("/ch", "", 1)
+        self._proxy_get(
+            upstream_url,
+            headers={
+                "Authorization": "Basic " + b64(f"{api_key}:"),
+                "Accept": "application/json",
+            },
+        )
+
+    def _get_tfl(self):
+        upstream_url = TFL_API_BASE + self.path.replace("/tfl", "", 1)
+        self._proxy_get(upstream_url, headers={"Accept": "application/json"})
+
+    def _get_postcodes(self):
+        upstream_url = POSTCODES_API_BASE + self.path.replace("/postcodes", "", 1)
+        self._proxy_get(upstream_url, headers={"Accept": "application/json"})
+
+    def _get_webtris(self):
+        upstream_url = WEBTRIS_API_BASE + "/" + self.path.replace("/webtris/", "", 1)
+        self._proxy_get(upstream_url, headers={"Accept": "application/json"})
+
+    def _get_dvla_health(self):
+        key = os.environ.get("DVLA_API_KEY", "").strip()
+        self._send_json({"ok": True, "configured": bool(key), "endpoint": f"{DVLA_VES_API_BASE}/vehicle-enquiry/v1/vehicles"})
+
+    def _get_osplaces_postcode(self):
+        os_key = os.environ.get("OS_PLACES_API_KEY", "").strip()
+        if not os_key:
+            self._send_json_error(500, b'{"error":"OS_PLACES_API_KEY env var not set"}')
+            return
+
+        params = self.query
+        postcode = (params.get("postcode") or [""])[0].strip()
+        if not postcode:
+            self._send_json_error(400, b'{"error":"postcode query parameter required"}')
+            return
+
+        query = urlencode(
+            {
+                "postcode": postcode,
+                "key": os_key,
+                "maxresults": "1",
+                "output_srs": "EPSG:4326",
+            }
+        )
+        upstream_url = f"{OS_PLACES_API_BASE}/postcode?{query}"
+        self._proxy_get(upstream_url, headers={"Accept": "application/json"})
+
+    def _get_osplaces_find(self):
+        os_key = os.environ.get("OS_PLACES_API_KEY", "").strip()
+        if not os_key:
+            self._send_json_error(500, b'{"error":"OS_PLACES_API_KEY env var not set"}')
+            return
+
+        params = self.query
+        raw_query = (params.get("query") or [""])[0].strip()
+        if not raw_query:
+            self._send_json_error(400, b'{"error":"query parameter required"}')
+            return
+
+        query = urlencode(
+            {
+                "query": raw_query,
+                "key": os_key,
+                "dataset": "DPA,LPI",
+                "maxresults": "20",
+                "output_srs": "EPSG:4326",
+            }
+        )
+        upstream_url = f"{OS_PLACES_API_BASE}/find?{query}"
+        self._proxy_get(upstream_url, headers={"Accept": "application/json"})
+
+    def _get_streetview_static(self):
+        params = self.query
+        location = (params.get("location") or [""])[0].strip()
+        size = (params.get("size") or ["400x250"])[0].strip()
+        fov = (params.get("fov") or ["90"])[0].strip()
+        heading = (params.get("heading") or ["0"])[0].strip()
+        pitch = (params.get("pitch") or ["0"])[0].strip()
+        key = (params.get("key") or [""])[0].strip() or os.environ.get("GOOGLE_STREETVIEW_API_KEY", "").strip()
+        if not key:
+            self._send_json_error(500, b'{"error":"GOOGLE_STREETVIEW_API_KEY missing"}')
             return
+        if not location:
+            self._send_json_error(400, b'{"error":"location query parameter required"}')
+            return
+
+        upstream_qs = urlencode(
+            {
+                "size": size,
+                "location": location,
+                "fov": fov,
+                "heading": heading,
+                "pitch": pitch,
+                "key": key,
+            }
+        )
+        upstream_url = f"https://maps.googleapis.com/maps/api/streetview?{upstream_qs}"
+        req = urllib.request.Request(upstream_url)
+        req.add_header("User-Agent", "ControlRoom/1.0 (+https://localhost)")
+        try:
+            with _upstream_pool.urlopen(req, timeout=30) as resp:
+                self._relay_upstream(resp, "image/jpeg", {"Cache-Control": "no-store"})
+                return
+        except urllib.error.HTTPError as e:
+            err_body = e.read() if hasattr(e, "read") else b"{}"
+            self._send_json_error(e.code, err_body)
+            return
+        except Exception as e:
+            self._send_json({"error": "Street View upstream failed", "detail": str(e)}, status=502)
+            return
+
+    def _get_nre_health(self):
+        token = os.environ.get("NRE_LDBWS_TOKEN", "").strip()
+        live_dep_url = os.environ.get("RAILDATA_LIVE_DEPARTURE_URL", "").strip()
+        live_dep_key = os.environ.get("RAILDATA_LIVE_DEPARTURE_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()
+        live_board_url = os.environ.get("RAILDATA_LIVE_BOARD_URL", "").strip()
+        live_board_key = os.environ.get("RAILDATA_LIVE_BOARD_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()
+
+        raildata_departures_ready = bool(live_dep_url and live_dep_key)
+        raildata_arrivals_ready = bool(live_board_url and live_board_key)
+        configured = bool(token or raildata_departures_ready or raildata_arrivals_ready)
+
+        provider = "darwin" if token else ("raildata" if (raildata_departures_ready or raildata_arrivals_ready) else "none")
+        catalog, meta = _station_catalog_cache["catalog"], _station_catalog_cache["meta"]
+        self._send_json(
+            {
+                "ok": True,
+                "configured": configured,
+                "provider": provider,
+                "endpoint": os.environ.get("NRE_LDBWS_URL", NRE_LDBWS_URL),
+                "fallback": {
+                    "raildata_departures_ready": raildata_departures_ready,
+                    "raildata_arrivals_ready": raildata_arrivals_ready,
+                },
+                "stations": {
+                    "count": len(catalog.items) if catalog is not None else 0,
+                    "etag": meta.get("etag", ""),
+                    "fetched_at": meta.get("fetched_at"),
+                    "checked_at": meta.get("checked_at"),
+                },
+            }
+        )
+
+    def _get_raildata_health(self):
+        has_direct_token = bool(os.environ.get("RAILDATA_AUTH_TOKEN", "").strip())
+        has_credentials = bool(os.environ.get("RAILDATA_USERNAME", "").strip() and os.environ.get("RAILDATA_PASSWORD", "").strip())
+        self._send_json(
+            {
+                "ok": True,
+                "configured": bool(has_direct_token or has_credentials),
+                "auth_mode": "token" if has_direct_token else ("username_password" if has_credentials else ("apikey" if os.environ.get("RAILDATA_API_KEY", "").strip() else "none")),
+                "kb_feeds": sorted(RAILDATA_KB_FEEDS.keys()),
+                "helpers": [
+                    "/raildata/feeds",
+                    "/raildata/feeds/available",
+                    "/raildata/disruptions",
+                    "/raildata/performance",
+                    "/raildata/performance/reference",
+                    "/raildata/reference",
+                    "/raildata/naptan",
+                    "/raildata/nptg",
+                    "/raildata/proxy?url=<full-feed-url>",
+                ],
+                "endpoint": RAILDATA_API_BASE,
+            }
+        )
+
+    def _get_raildata_feeds_available(self):
+        return self._proxy_raildata_url(f"{RAILDATA_API_BASE}/api/feeds/available", auth_mode="token")
 
-        if self.path.startswith("/__control_room_health"):
+    def _get_raildata_feeds(self):
+        return self._proxy_raildata_url(f"{RAILDATA_API_BASE}/api/feeds", auth_mode="token")
+
+    def _get_raildata_user(self):
+        return self._proxy_raildata_url(f"{RAILDATA_API_BASE}/api/user", auth_mode="token")
+
+    def _get_raildata_kb(self):
+        parsed = self.route_url
+        feed = parsed.path.replace("/raildata/kb/", "", 1).strip().lower()
+        env_url_map = {
+            "tocs": os.environ.get("RAILDATA_TOC_URL", "").strip(),
+            "stations": os.environ.get("RAILDATA_KB_STATIONS_URL", "").strip(),
+        }
+        env_key_map = {
+            "tocs": "RAILDATA_TOC_API_KEY",
+            "stations": "RAILDATA_KB_STATIONS_API_KEY",
+        }
+        explicit_url = env_url_map.get(feed, "")
+        query = f"?{parsed.query}" if parsed.query else ""
+        if explicit_url:
+            return self._proxy_raildata_url(f"{explicit_url}{query}", auth_mode="apikey", apikey_env=env_key_map.get(feed, "RAILDATA_API_KEY"))
+
+        upstream_path = RAILDATA_KB_FEEDS.get(feed)
+        if not upstream_path:
             self._send_json(
                 {
-                    "ok": True,
-                    "service": "control-room-dev-server",
-                    "ts": int(time.time()),
-                }
+                    "error": "Unknown KB feed",
+                    "feed": feed,
+                    "supported_feeds": sorted(RAILDATA_KB_FEEDS.keys()),
+                },
+                status=400,
+            )
+            return
+        upstream_url = f"{RAILDATA_API_BASE}{upstream_path}{query}"
+        mode = "apikey" if (os.environ.get("RAILDATA_TOC_API_KEY", "").strip() or os.environ.get("RAILDATA_KB_STATIONS_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()) else "token"
+        return self._proxy_raildata_url(upstream_url, auth_mode=mode)
+
+    def _get_raildata_disruptions(self):
+        configured = os.environ.get("RAILDATA_DISRUPTIONS_URL", "").strip()
+        upstream_url = configured or f"{RAILDATA_API_BASE}{RAILDATA_KB_FEEDS['incidents']}"
+        mode = "apikey" if (os.environ.get("RAILDATA_DISRUPTIONS_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()) else "token"
+        return self._proxy_raildata_url(upstream_url, auth_mode=mode, apikey_env="RAILDATA_DISRUPTIONS_API_KEY")
+
+    def _get_raildata_performance_reference(self):
+        configured = os.environ.get("RAILDATA_NWR_PERFORMANCE_REFERENCE_URL", "").strip()
+        if not configured:
+            self._send_json(
+                {
+                    "error": "RAILDATA_NWR_PERFORMANCE_REFERENCE_URL not set",
+                    "hint": "Paste the exact subscribed endpoint URL from Rail Data My Feeds.",
+                },
+                status=400,
             )
             return
+        mode = "apikey" if (os.environ.get("RAILDATA_NWR_PERFORMANCE_REFERENCE_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()) else "token"
+        return self._proxy_raildata_url(configured, auth_mode=mode, apikey_env="RAILDATA_NWR_PERFORMANCE_REFERENCE_API_KEY")
 
-        if self.path.startswith("/ch/"):
-            api_key = os.environ.get("CH_API_KEY", "").strip()
-            if not api_key:
-                self._send_json_error(500, b'{"error":"CH_API_KEY env var not set"}')
-                return
+    def _get_raildata_performance(self):
+        configured = os.environ.get("RAILDATA_NWR_PERFORMANCE_URL", "").strip()
+        if not configured:
+            self._send_json(
+                {
+                    "error": "RAILDATA_NWR_PERFORMANCE_URL not set",
+                    "hint": "Paste the exact subscribed endpoint URL from Rail Data My Feeds.",
+                },
+                status=400,
+            )
+            return
+        params = self.query
+        rendered, missing = self._render_url_template(
+            configured,
+            {"stanoxGroup": (params.get("stanoxGroup") or [""])[0]},
+        )
+        if missing:
+            self._send_json({"error": "Missing required query parameter(s)", "missing": missing}, status=400)
+            return
+        mode = "apikey" if (os.environ.get("RAILDATA_NWR_PERFORMANCE_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()) else "token"
+        return self._proxy_raildata_url(rendered, auth_mode=mode, apikey_env="RAILDATA_NWR_PERFORMANCE_API_KEY")
+
+    def _get_raildata_reference(self):
+        configured = os.environ.get("RAILDATA_REFERENCE_DATA_URL", "").strip()
+        if not configured:
+            self._send_json(
+                {
+                    "error": "RAILDATA_REFERENCE_DATA_URL not set",
+                    "hint": "Paste the exact subscribed endpoint URL from Rail Data My Feeds.",
+                },
+                status=400,
+            )
+            return
+        params = self.query
+        rendered, missing = self._render_url_template(
+            configured,
+            {"currentVersion": (params.get("currentVersion") or [""])[0]},
+        )
+        if missing:
+            self._send_json({"error": "Missing required query parameter(s)", "missing": missing}, status=400)
+            return
+        mode = "apikey" if (os.environ.get("RAILDATA_REFERENCE_DATA_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()) else "token"
+        return self._proxy_raildata_url(rendered, auth_mode=mode, apikey_env="RAILDATA_REFERENCE_DATA_API_KEY")
+
+    def _get_raildata_naptan(self):
+        configured = os.environ.get("RAILDATA_NAPTAN_URL", "").strip()
+        if not configured:
+            self._send_json(
+                {
+                    "error": "RAILDATA_NAPTAN_URL not set",
+                    "hint": "Paste NaPTAN endpoint URL from Rail Data My Feeds.",
+                },
+                status=400,
+            )
+            return
+        mode = "apikey" if (os.environ.get("RAILDATA_NAPTAN_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()) else "token"
+        return self._proxy_raildata_url(configured, auth_mode=mode, apikey_env="RAILDATA_NAPTAN_API_KEY")
+
+    def _get_raildata_nptg(self):
+        configured = os.environ.get("RAILDATA_NPTG_URL", "").strip()
+        if not configured:
+            self._send_json(
+                {
+                    "error": "RAILDATA_NPTG_URL not set",
+                    "hint": "Paste NPTG endpoint URL from Rail Data My Feeds.",
+                },
+                status=400,
+            )
+            return
+        mode = "apikey" if (os.environ.get("RAILDATA_NPTG_API_KEY", "").strip() or os.environ.get("RAILDATA_NAPTAN_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()) else "token"
+        apikey_env = "RAILDATA_NPTG_API_KEY"
+        if not os.environ.get(apikey_env, "").strip() and os.environ.get("RAILDATA_NAPTAN_API_KEY", "").strip():
+            apikey_env = "RAILDATA_NAPTAN_API_KEY"
+        return self._proxy_raildata_url(configured, auth_mode=mode, apikey_env=apikey_env)
+
+    def _get_raildata_service_details(self):
+        configured = os.environ.get("RAILDATA_SERVICE_DETAILS_URL", "").strip()
+        if not configured:
+            self._send_json(
+                {
+                    "error": "RAILDATA_SERVICE_DETAILS_URL not set",
+                    "hint": "Paste Service Details endpoint URL from Rail Data My Feeds.",
+                },
+                status=400,
+            )
+            return
+        params = self.query
+        rendered, missing = self._render_url_template(
+            configured,
+            {"serviceid": (params.get("serviceid") or [""])[0]},
+        )
+        if missing:
+            self._send_json({"error": "Missing required query parameter(s)", "missing": missing}, status=400)
+            return
+        mode = "apikey" if (os.environ.get("RAILDATA_SERVICE_DETAILS_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()) else "token"
+        return self._proxy_raildata_url(rendered, auth_mode=mode, apikey_env="RAILDATA_SERVICE_DETAILS_API_KEY")
 
-            upstream_url = CH_API_BASE + self.path.replace("/ch", "", 1)
-            self._proxy_get(
-                upstream_url,
-                headers={
-                    "Authorization": "Basic " + b64(f"{api_key}:"),
-                    "Accept": "application/json",
+    def _get_raildata_live_board(self):
+        configured = os.environ.get("RAILDATA_LIVE_BOARD_URL", "").strip()
+        if not configured:
+            self._send_json(
+                {
+                    "error": "RAILDATA_LIVE_BOARD_URL not set",
+                    "hint": "Paste Live Arrival and Departure Boards endpoint URL from Rail Data My Feeds.",
                 },
+                status=400,
+            )
+            return
+        params = self.query
+        rendered, missing = self._render_url_template(
+            configured,
+            {"crs": (params.get("crs") or [""])[0]},
+        )
+        if missing:
+            self._send_json({"error": "Missing required query parameter(s)", "missing": missing}, status=400)
+            return
+        mode = "apikey" if (os.environ.get("RAILDATA_LIVE_BOARD_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()) else "token"
+        return self._proxy_raildata_url(rendered, auth_mode=mode, apikey_env="RAILDATA_LIVE_BOARD_API_KEY")
+
+    def _get_raildata_proxy(self):
+        params = self.query
+        url = ((params.get("url") or [""])[0]).strip()
+        auth_mode = ((params.get("auth") or ["token"])[0]).strip().lower()
+        if not url:
+            self._send_json({"error": "url query parameter required"}, status=400)
+            return
+        if auth_mode not in {"token", "basic", "apikey", "none"}:
+            self._send_json({"error": "auth must be token|basic|apikey|none"}, status=400)
+            return
+        return self._proxy_raildata_url(url, auth_mode=auth_mode if auth_mode != "none" else "")
+
+    def _get_nre_board(self):
+        params = self.query
+        crs = ((params.get("crs") or [""])[0]).strip().upper()
+        rows = ((params.get("rows") or ["10"])[0]).strip()
+        if not crs or len(crs) != 3:
+            self._send_json({"error": "crs query parameter required (3-letter station code)"}, status=400)
+            return
+        method = "GetDepartureBoard" if self.path.startswith("/nre/departures") else "GetArrivalBoard"
+        body = f"<ldb:numRows>{rows or '10'}</ldb:numRows><ldb:crs>{crs}</ldb:crs>"
+        root, err = self._call_ldbws(method, body)
+        if err:
+            board_type = "departures" if method == "GetDepartureBoard" else "arrivals"
+            fallback_board, fb_err = self._fetch_raildata_board_fallback(crs, board_type)
+            if fallback_board:
+                self._send_json({"ok": True, "type": board_type, "provider": "raildata", "board": fallback_board})
+                return
+            self._send_json({"error": err.get("error", "NRE failed"), "detail": err.get("detail", ""), "fallback": fb_err or {}}, status=502)
+            return
+        board = self._parse_station_board(root)
+        self._send_json({"ok": True, "type": "departures" if method == "GetDepartureBoard" else "arrivals", "board": board})
+
+    def _get_nre_stations(self):
+        params = self.query
+        q = ((params.get("q") or [""])[0]).strip().lower()
+        crs = ((params.get("crs") or [""])[0]).strip().upper()
+        limit_s = ((params.get("limit") or ["20"])[0]).strip()
+        try:
+            limit = max(1, min(5000, int(limit_s)))
+        except Exception:
+            limit = 20
+        try:
+            radius_km = max(0.1, min(STATION_NEARBY_MAX_KM, float((params.get("radius_km") or [STATION_NEARBY_DEFAULT_KM])[0])))
+        except ValueError:
+            radius_km = STATION_NEARBY_DEFAULT_KM
+        try:
+            catalog = self._load_station_catalog()
+        except Exception as e:
+            self._send_json({"ok": False, "error": "station catalog unavailable", "detail": str(e), "stations": []}, status=502)
+            return
+        items = catalog.items
+
+        if crs and len(crs) == 3:
+            base = catalog.by_crs.get(crs)
+            if not base:
+                self._send_json({"ok": True, "base": None, "stations": []})
+                return
+            try:
+                lat1 = float(base.get("lat"))
+                lon1 = float(base.get("lon"))
+            except Exception:
+                self._send_json({"ok": True, "base": base, "stations": []})
+                return
+            out = catalog.near(lat1, lon1, limit, radius_km, exclude=crs)
+            self._send_json({"ok": True, "base": base, "radiusKm": radius_km, "stations": out})
+            return
+
+        if params.get("lat") and params.get("lon"):
+            point = self._query_lat_lon()
+            if point is None:
+                return
+            out = catalog.near(point[0], point[1], limit, radius_km)
+            self._send_json({"ok": True, "base": None, "radiusKm": radius_km, "stations": out})
+            return
+
+        if not q:
+            top = items[:limit]
+            self._send_json({"ok": True, "stations": top})
+            return
+
+        self._send_json({"ok": True, "stations": catalog.search.search(q, limit)})
+
+    def _get_nre_service(self):
+        params = self.query
+        service_id = ((params.get("service_id") or [""])[0]).strip()
+        if not service_id:
+            self._send_json({"error": "service_id query parameter required"}, status=400)
+            return
+        body = f"<ldb:serviceID>{service_id}</ldb:serviceID>"
+        root, err = self._call_ldbws("GetServiceDetails", body)
+        if err:
+            fallback_service, fb_err = self._fetch_raildata_service_details_fallback(service_id)
+            if fallback_service:
+                self._send_json({"ok": True, "provider": "raildata", "service": fallback_service})
+                return
+            self._send_json({"error": err.get("error", "NRE failed"), "detail": err.get("detail", ""), "fallback": fb_err or {}}, status=502)
+            return
+        self._send_json({"ok": True, "service": self._parse_service_details(root)})
+
+    def _get_geo_search(self):
+        params = self.query
+        q = ((params.get("q") or [""])[0]).strip()
+        limit = ((params.get("limit") or ["1"])[0]).strip()
+        if not q:
+            self._send_json({"error": "q query parameter required"}, status=400)
+            return
+        upstream = f"{NOMINATIM_BASE}?q={quote_plus(q)}&format=jsonv2&limit={quote_plus(limit)}"
+        self._proxy_get(
+            upstream,
+            headers={
+                "Accept": "application/json",
+                "User-Agent": "ControlRoom/1.0 (+https://localhost)",
+            },
+        )
+
+    def _query_list(self, name: str) -> list:
+        values = []
+        for raw in self.query.get(name) or []:
+            values.extend(part.strip() for part in raw.split(",") if part.strip())
+        return values
+
+    def _query_bbox(self, name: str = "bbox") -> Optional[Tuple[float, float, float, float]]:
+        """west,south,east,north; raises ValueError when present but malformed."""
+        raw = ((self.query.get(name) or [""])[0]).strip()
+        if not raw:
+            return None
+        parts = [float(p) for p in raw.split(",")]
+        if len(parts) != 4:
+            raise ValueError("bbox must be west,south,east,north")
+        if not all(math.isfinite(p) for p in parts):
+            raise ValueError("bbox values must be finite numbers")
+        west, south, east, north = parts
+        return (min(west, east), min(south, north), max(west, east), max(south, north))
+
+    def _crime_index_or_error(self) -> Optional[CrimeGridIndex]:
+        try:
+            index = get_crime_index(Path(self.directory))
+        except (OSError, ValueError) as exc:
+            self._send_json({"error": f"Crime grid could not be indexed: {exc}"}, status=500)
+            return None
+        if index is None:
+            self._send_json({"error": "Crime grid not found", "candidates": list(CRIME_GRID_CANDIDATES)}, status=404)
+        return index
+
+    def _get_crime_meta(self):
+        index = self._crime_index_or_error()
+        if index is None:
+            return
+        self._send_json(index.summary())
+
+    def _get_crime_query(self):
+        params = self.query
+        try:
+            bbox = self._query_bbox()
+            limit = int((params.get("limit") or [CRIME_QUERY_DEFAULT_LIMIT])[0])
+        except ValueError as exc:
+            self._send_json({"error": str(exc)}, status=400)
+            return
+        index = self._crime_index_or_error()
+        if index is None:
+            return
+        ids = index.query(
+            bbox=bbox,
+            month_from=((params.get("from") or [""])[0]).strip(),
+            month_to=((params.get("to") or [""])[0]).strip(),
+            forces=self._query_list("force"),
+            types=self._query_list("type"),
+        )
+        matched = len(ids)
+        if limit > 0:
+            ids = ids[:limit]
+        meta = dict(index.meta, total=len(index), matched=matched, returned=len(ids), truncated=len(ids) < matched)
+        body = b"".join((
+            b'{"type":"FeatureCollection","meta":',
+            json.dumps(meta, separators=(",", ":")).encode("utf-8"),
+            b',"features":[',
+            b",".join(index.encoded[i] for i in ids),
+            b"]}",
+        ))
+        self._send_json_body(body)
+
+    def _get_tile(self):
+        match = re.fullmatch(r"/tiles/([A-Za-z0-9_-]+)/(\d+)/(\d+)/(\d+)\.mvt", self.route_url.path)
+        if not match:
+            self._send_json({"error": "expected /tiles/{layer}/{z}/{x}/{y}.mvt", "layers": sorted(TILE_LAYERS)}, status=400)
+            return
+        layer = match.group(1)
+        z, x, y = (int(v) for v in match.group(2, 3, 4))
+        if layer not in TILE_LAYERS:
+            self._send_json({"error": f"Unknown tile layer {layer}", "layers": sorted(TILE_LAYERS)}, status=404)
+            return
+        if z > TILE_MAX_ZOOM or x >= 2 ** z or y >= 2 ** z:
+            self._send_json({"error": "Tile coordinates out of range"}, status=400)
+            return
+        try:
+            source = get_tile_source(Path(self.directory), layer)
+        except (OSError, ValueError) as exc:
+            self._send_json({"error": f"Tile source for {layer} could not be loaded: {exc}"}, status=500)
+            return
+        if source is None:
+            self._send_json({"error": f"No source file for tile layer {layer}"}, status=404)
+            return
+
+        cache_dir = self.tile_cache_dir
+        cached = tile_cache_path(cache_dir, source, z, x, y) if cache_dir else None
+        body = None
+        cache_state = "MISS"
+        if cached is not None:
+            try:
+                body = cached.read_bytes()
+                cache_state = "HIT"
+            except OSError:
+                body = None
+        if body is None:
+            body = source.render(z, x, y)
+            if cached is not None:
+                try:
+                    if not cached.parent.is_dir():
+                        prune_tile_cache(cache_dir, source)
+                        cached.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = cached.with_suffix(f".tmp{threading.get_ident()}")
+                    tmp.write_bytes(body)
+                    os.replace(tmp, cached)
+                except OSError as exc:
+                    self.log_message("Tile cache write failed for %s: %s", cached, exc)
+
+        etag = f'"{source.signature}-{z}-{x}-{y}"'
+        if etag in (self.headers.get("If-None-Match") or ""):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.mapbox-vector-tile")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Cache-Control", "public, max-age=3600")
+        self.send_header("ETag", etag)
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("X-Cache", cache_state)
+        if len(body) >= 512 and self._accepts_encoding("gzip"):
+            body = gzip.compress(body, compresslevel=5)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json_body(self) -> Optional[dict]:
+        """Parsed JSON object from the request body; sends a 400 and returns None when it is not one."""
+        try:
+            length = int(self.headers.get("Content-Length", "0"))
+        except ValueError:
+            length = 0
+        raw = self.rfile.read(length) if length > 0 else b"{}"
+        try:
+            body = json.loads(raw.decode("utf-8", errors="replace"))
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            self._send_json({"error": "Invalid JSON body"}, status=400)
+            return None
+        return body
+
+    def _company_index_or_error(self) -> Optional[CompanyIndex]:
+        try:
+            index = get_company_index(Path(self.directory), self.index_dir)
+        except (OSError, sqlite3.Error) as exc:
+            self._send_json({"error": f"Company index could not be opened: {exc}"}, status=500)
+            return None
+        if index is None:
+            self._send_json(
+                {"error": "Company index not built", "hint": "python scripts/dev_server.py --build-index companies"},
+                status=503,
+            )
+        return index
+
+    def _get_local_company(self):
+        number = unquote(self.route_url.path[len("/local/company/"):]).strip("/")
+        if not number:
+            self._send_json({"error": "company number required"}, status=400)
+            return
+        index = self._company_index_or_error()
+        if index is None:
+            return
+        row = index.lookup(number)
+        if row is None:
+            self._send_json({"error": f"Company {normalize_company_number(number)} not found"}, status=404)
+            return
+        self._send_json(row)
+
+    def _send_company_batch(self, numbers: list):
+        if not numbers:
+            self._send_json({"error": "numbers required"}, status=400)
+            return
+        if len(numbers) > LOCAL_BATCH_LIMIT:
+            self._send_json({"error": f"At most {LOCAL_BATCH_LIMIT} numbers per request"}, status=400)
+            return
+        index = self._company_index_or_error()
+        if index is None:
+            return
+        results = index.lookup_many(numbers)
+        body = json.dumps({"results": results, "found": sum(1 for r in results.values() if r)}).encode("utf-8")
+        self._send_json_body(body)
+
+    def _get_local_companies(self):
+        self._send_company_batch(self._query_list("numbers"))
+
+    def _post_local_companies(self):
+        body = self._read_json_body()
+        if body is None:
+            return
+        numbers = body.get("numbers")
+        if not isinstance(numbers, list):
+            self._send_json({"error": "numbers must be a list"}, status=400)
+            return
+        self._send_company_batch([str(n) for n in numbers if n is not None])
+
+    def _get_local_search(self):
+        params = self.query
+        q = ((params.get("q") or [""])[0]).strip()
+        kind = ((params.get("kind") or [""])[0]).strip().lower()
+        if not q:
+            self._send_json({"error": "q query parameter required"}, status=400)
+            return
+        if kind not in ("", "company", "person"):
+            self._send_json({"error": "kind must be company or person"}, status=400)
+            return
+        try:
+            limit = max(1, min(SEARCH_MAX_LIMIT, int((params.get("limit") or ["20"])[0])))
+            page = max(1, int((params.get("page") or ["1"])[0]))
+        except ValueError:
+            self._send_json({"error": "limit and page must be integers"}, status=400)
+            return
+        try:
+            index = get_search_index(self.index_dir)
+            if index is None:
+                self._send_json({"error": "Search index not built", "hint": "python scripts/dev_server.py --build-index search"}, status=503)
+                return
+            if not index.current:
+                self._send_json({"error": "Search index is out of date", "hint": "python scripts/dev_server.py --build-index search"}, status=503)
+                return
+            started = time.perf_counter()
+            results, has_more = index.search(q, kind=kind, limit=limit, offset=(page - 1) * limit)
+        except sqlite3.Error as exc:
+            self._send_json({"error": f"Search failed: {exc}"}, status=500)
+            return
+        self._send_json({
+            "query": q,
+            "page": page,
+            "limit": limit,
+            "has_more": has_more,
+            "took_ms": round((time.perf_counter() - started) * 1000, 2),
+            "results": results,
+        })
+
+    def _get_local_psc_graph(self):
+        params = self.query
+
+        def param(name, default=""):
+            return ((params.get(name) or [default])[0]).strip()
+
+        try:
+            depth = max(1, min(PSC_GRAPH_MAX_DEPTH, int(param("depth", "2"))))
+            fanout = max(1, int(param("fanout", "50")))
+            max_nodes = max(1, min(PSC_GRAPH_MAX_NODES, int(param("max_nodes", "500"))))
+        except ValueError:
+            self._send_json({"error": "depth, fanout and max_nodes must be integers"}, status=400)
+            return
+        direction = param("direction", "both").lower()
+        if direction not in ("both", "owners", "holdings"):
+            self._send_json({"error": "direction must be both, owners or holdings"}, status=400)
+            return
+        company, key, name = param("company"), param("key"), param("name")
+        if not (company or key or name):
+            self._send_json({"error": "company, key or name query parameter required"}, status=400)
+            return
+        try:
+            graph = get_psc_graph(self.index_dir)
+            if graph is None:
+                self._send_json({"error": "PSC graph not built", "hint": "python scripts/dev_server.py --build-index psc"}, status=503)
+                return
+            started = time.perf_counter()
+            starts = graph.find(company=company, key=key, name=name)
+            if not starts:
+                self._send_json({"error": "No matching company or person in the PSC graph"}, status=404)
+                return
+            result = graph.traverse(
+                starts,
+                depth=depth,
+                fanout=fanout,
+                max_nodes=max_nodes,
+                include_ceased=param("ceased", "0").lower() in {"1", "true", "yes", "on"},
+                direction=direction,
             )
+        except (OSError, ValueError, sqlite3.Error) as exc:
+            self._send_json({"error": f"PSC graph unavailable: {exc}"}, status=500)
+            return
+
+        unnamed = [n for n in result["nodes"] if n["kind"] == "company" and n["label"] == n.get("company_number")]
+        if unnamed:
+            try:
+                companies = get_company_index(Path(self.directory), self.index_dir)
+            except (OSError, sqlite3.Error):
+                companies = None
+            if companies is not None:
+                rows = companies.lookup_many([n["company_number"] for n in unnamed])
+                for node in unnamed:
+                    row = rows.get(node["company_number"])
+                    if row and row.get("CompanyName"):
+                        node["label"] = row["CompanyName"]
+        result.update(starts=starts, depth=depth, took_ms=round((time.perf_counter() - started) * 1000, 2))
+        self._send_json_body(json.dumps(result).encode("utf-8"))
+
+    def _postcode_table_or_error(self) -> Optional[PostcodeTable]:
+        try:
+            table = get_postcode_table(self.index_dir)
+        except (OSError, ValueError) as exc:
+            self._send_json({"error": f"Postcode table could not be opened: {exc}"}, status=500)
+            return None
+        if table is None:
+            self._send_json({"error": "Postcode table not built", "hint": "python scripts/dev_server.py --build-index postcodes"}, status=503)
+        return table
+
+    def _get_local_postcode(self):
+        postcode = unquote(self.route_url.path[len("/local/postcode/"):]).strip("/")
+        if not normalize_postcode(postcode):
+            self._send_json({"error": "postcode required"}, status=400)
             return
-
-        if self.path.startswith("/tfl/"):
-            upstream_url = TFL_API_BASE + self.path.replace("/tfl", "", 1)
-            self._proxy_get(upstream_url, headers={"Accept": "application/json"})
+        table = self._postcode_table_or_error()
+        if table is None:
             return
-
-        if self.path.startswith("/postcodes/"):
-            upstream_url = POSTCODES_API_BASE + self.path.replace("/postcodes", "", 1)
-            self._proxy_get(upstream_url, headers={"Accept": "application/json"})
+        record = table.lookup(postcode)
+        if record is None:
+            self._send_json({"status": 404, "error": "Postcode not found"}, status=404)
             return
+        self._send_json({"status": 200, "result": record})
 
-        if self.path.startswith("/webtris/"):
-            upstream_url = WEBTRIS_API_BASE + "/" + self.path.replace("/webtris/", "", 1)
-            self._proxy_get(upstream_url, headers={"Accept": "application/json"})
+    def _post_local_postcodes(self):
+        body = self._read_json_body()
+        if body is None:
             return
-
-        if self.path.startswith("/dvla/health"):
-            key = os.environ.get("DVLA_API_KEY", "").strip()
-            self._send_json({"ok": True, "configured": bool(key), "endpoint": f"{DVLA_VES_API_BASE}/vehicle-enquiry/v1/vehicles"})
+        postcodes = body.get("postcodes")
+        if not isinstance(postcodes, list) or not postcodes:
+            self._send_json({"error": "postcodes must be a non-empty list"}, status=400)
             return
+        if len(postcodes) > POSTCODE_BATCH_LIMIT:
+            self._send_json({"error": f"At most {POSTCODE_BATCH_LIMIT} postcodes per request"}, status=400)
+            return
+        table = self._postcode_table_or_error()
+        if table is None:
+            return
+        results = {}
+        for raw in postcodes:
+            query = str(raw or "")
+            if query not in results:
+                results[query] = table.lookup(query)
+        payload = {"status": 200, "found": sum(1 for r in results.values() if r), "results": results}
+        self._send_json_body(json.dumps(payload).encode("utf-8"))
+
+    def _query_lat_lon(self) -> Optional[Tuple[float, float]]:
+        """lat/lon query parameters (lng/long accepted); sends a 400 and returns None when missing or invalid."""
+        params = self.query
+        try:
+            lat = float((params.get("lat") or [""])[0])
+            lon = float((params.get("lon") or params.get("lng") or params.get("long") or [""])[0])
+        except ValueError:
+            self._send_json({"error": "lat and lon query parameters required"}, status=400)
+            return None
+        if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+            self._send_json({"error": "lat/lon out of range"}, status=400)
+            return None
+        return lat, lon
 
-        if self.path.startswith("/osplaces/postcode"):
-            os_key = os.environ.get("OS_PLACES_API_KEY", "").strip()
-            if not os_key:
-                self._send_json_error(500, b'{"error":"OS_PLACES_API_KEY env var not set"}')
-                return
-
-            parsed = urlsplit(self.path)
-            params = parse_qs(parsed.query or "")
-            postcode = (params.get("postcode") or [""])[0].strip()
-            if not postcode:
-                self._send_json_error(400, b'{"error":"postcode query parameter required"}')
-                return
+    def _get_local_postcodes_nearest(self):
+        point = self._query_lat_lon()
+        if point is None:
+            return
+        params = self.query
+        try:
+            limit = max(1, min(100, int((params.get("limit") or ["1"])[0])))
+            radius_m = max(1.0, min(ONSPD_NEAREST_MAX_KM * 1000.0, float((params.get("radius_m") or [ONSPD_NEAREST_MAX_KM * 1000.0])[0])))
+        except ValueError:
+            self._send_json({"error": "limit and radius_m must be numbers"}, status=400)
+            return
+        table = self._postcode_table_or_error()
+        if table is None:
+            return
+        self._send_json({"status": 200, "result": table.nearest(point[0], point[1], limit=limit, max_km=radius_m / 1000.0)})
 
-            query = urlencode(
-                {
-                    "postcode": postcode,
-                    "key": os_key,
-                    "maxresults": "1",
-                    "output_srs": "EPSG:4326",
-                }
+    def _get_local_reverse(self):
+        point = self._query_lat_lon()
+        if point is None:
+            return
+        lat, lon = point
+        try:
+            radius_m = max(1.0, min(ONSPD_NEAREST_MAX_KM * 1000.0, float((self.query.get("radius_m") or [ONSPD_NEAREST_MAX_KM * 1000.0])[0])))
+        except ValueError:
+            self._send_json({"error": "radius_m must be a number"}, status=400)
+            return
+        try:
+            table = get_postcode_table(self.index_dir)
+            areas = get_force_area_index(Path(self.directory))
+        except (OSError, ValueError) as exc:
+            self._send_json({"error": f"Reverse geocoding data unavailable: {exc}"}, status=500)
+            return
+        if table is None and areas is None:
+            self._send_json(
+                {"error": "No offline reverse geocoding data", "hint": "python scripts/dev_server.py --build-index postcodes"},
+                status=503,
             )
-            upstream_url = f"{OS_PLACES_API_BASE}/postcode?{query}"
-            self._proxy_get(upstream_url, headers={"Accept": "application/json"})
             return
 
-        if self.path.startswith("/osplaces/find"):
-            os_key = os.environ.get("OS_PLACES_API_KEY", "").strip()
-            if not os_key:
-                self._send_json_error(500, b'{"error":"OS_PLACES_API_KEY env var not set"}')
-                return
-
-            parsed = urlsplit(self.path)
-            params = parse_qs(parsed.query or "")
-            raw_query = (params.get("query") or [""])[0].strip()
-            if not raw_query:
-                self._send_json_error(400, b'{"error":"query parameter required"}')
+        started = time.perf_counter()
+        nearest = table.nearest(lat, lon, limit=1, max_km=radius_m / 1000.0) if table is not None else []
+        postcode = nearest[0] if nearest else None
+        force = None
+        if areas is not None:
+            hits = areas.containing(lon, lat)
+            if hits:
+                force = {"name": police_force_name(hits[0]), "code": police_force_code(hits[0]), "source": "polygon"}
+        if force is None and postcode and postcode.get("pfa"):
+            force = {"name": postcode.get("pfa_name", ""), "code": postcode["pfa"], "source": "onspd"}
+        self._send_json({
+            "status": 200,
+            "result": {
+                "latitude": lat,
+                "longitude": lon,
+                "postcode": postcode["postcode"] if postcode else None,
+                "distance_m": postcode["distance_m"] if postcode else None,
+                "force": force,
+                "details": postcode,
+                "took_us": round((time.perf_counter() - started) * 1e6, 1),
+            },
+        })
+
+    def _get_stream(self):
+        names = self._query_list("topics")
+        if not names:
+            self._send_json({"error": "topics query parameter required", "topics": ["flights", *STREAM_URL_TOPICS]}, status=400)
+            return
+        wanted = []
+        for raw in names:
+            kind, _, arg = raw.partition(":")
+            kind = kind.strip().lower()
+            if kind == "flights":
+                if not _flight_poller.enabled:
+                    self._send_json({"error": "flight poller disabled (CR_FR24_POLL_S=0)"}, status=503)
+                    return
+                try:
+                    bbox = self._query_bbox() or tuple(
+                        float((self.query.get(k) or [UK_AIRSPACE_BOUNDS[side]])[0]) for k, side in (("w", "west"), ("s", "south"), ("e", "east"), ("n", "north"))
+                    )
+                    if not all(math.isfinite(v) for v in bbox):
+                        raise ValueError("bbox values must be finite numbers")
+                except ValueError:
+                    self._send_json({"error": "bbox must be west,south,east,north (or n/s/w/e numbers)"}, status=400)
+                    return
+                uk_only = ((self.query.get("ukOnly") or ["0"])[0]).strip().lower() in {"1", "true", "yes", "on"}
+                w, s, e, n = bbox
+                name = f"flights:{n:g},{s:g},{w:g},{e:g}" + (":uk" if uk_only else "")
+                wanted.append((name, lambda name=name, view=(n, s, w, e), uk_only=uk_only: FlightStreamTopic(_stream_hub, name, _flight_poller, view, uk_only)))
+            elif kind in STREAM_URL_TOPICS:
+                event, template, interval = STREAM_URL_TOPICS[kind]
+                if "{arg}" in template:
+                    arg = arg.strip().upper()
+                    if not re.fullmatch(r"[A-Z]{3}", arg):
+                        self._send_json({"error": f"topic {kind} needs a CRS code, e.g. {kind}:KGX"}, status=400)
+                        return
+                name = f"{kind}:{arg}" if "{arg}" in template else kind
+                path = template.format(arg=quote(arg))
+                wanted.append((name, lambda name=name, event=event, path=path, interval=interval: UrlStreamTopic(_stream_hub, name, event, self.server, path, interval)))
+            else:
+                self._send_json({"error": f"unknown topic {raw!r}", "topics": ["flights", *STREAM_URL_TOPICS]}, status=400)
                 return
 
-            query = urlencode(
+        subscribed = _stream_hub.subscribe(wanted)
+        if subscribed is None:
+            self._send_json({"error": "too many stream clients"}, status=503)
+            return
+        sub, topics = subscribed
+        self.close_connection = True
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("X-Accel-Buffering", "no")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.write(sse_frame("subscribed", {"topics": [t.name for t in topics]}).replace(b"event:", b"retry: 5000\nevent:", 1))
+            self.wfile.flush()
+            while not sub.dropped:
+                try:
+                    frame = sub.queue.get(timeout=STREAM_HEARTBEAT_S)
+                except queue.Empty:
+                    frame = b": keepalive\n\n"
+                self.wfile.write(frame)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError, OSError):
+            pass
+        finally:
+            _stream_hub.unsubscribe(sub, topics)
+
+    def _get_flightradar_flights(self):
+        params = self.query
+
+        uk_only_raw = ((params.get("ukOnly") or ["0"])[0]).strip().lower()
+        uk_only = uk_only_raw in {"1", "true", "yes", "on"}
+
+        def as_float(value, fallback):
+            try:
+                return float(str(value).strip())
+            except Exception:
+                return fallback
+
+        n = as_float((params.get("n") or [None])[0], FR24_DEFAULT_BOUNDS[0])
+        s = as_float((params.get("s") or [None])[0], FR24_DEFAULT_BOUNDS[1])
+        w = as_float((params.get("w") or [None])[0], FR24_DEFAULT_BOUNDS[2])
+        e = as_float((params.get("e") or [None])[0], FR24_DEFAULT_BOUNDS[3])
+
+        n = max(-90.0, min(90.0, n))
+        s = max(-90.0, min(90.0, s))
+        w = max(-180.0, min(180.0, w))
+        e = max(-180.0, min(180.0, e))
+
+        since = ((params.get("since") or [""])[0]).strip()
+        poller = _flight_poller
+        if poller.enabled and (uk_only or poller.covers(n, s, w, e)) and poller.touch():
+            result = poller.query((n, s, w, e), uk_only, since)
+            memo_key = (n, s, w, e, uk_only, since)
+            self._send_flights(
                 {
-                    "query": raw_query,
-                    "key": os_key,
-                    "dataset": "DPA,LPI",
-                    "maxresults": "20",
-                    "output_srs": "EPSG:4326",
-                }
+                    "ok": True,
+                    "bounds": {"n": n, "s": s, "w": w, "e": e},
+                    "ukOnly": uk_only,
+                    "source": "poller",
+                    "cursor": result["cursor"],
+                    "delta": result["delta"],
+                    "removed": result["removed"],
+                    "generatedAt": result["updatedAt"],
+                },
+                result["flights"],
+                memo=lambda build: poller.encoded(memo_key + self._flights_variant(), result["cursor"], build),
             )
-            upstream_url = f"{OS_PLACES_API_BASE}/find?{query}"
-            self._proxy_get(upstream_url, headers={"Accept": "application/json"})
-            return
-
-        if self.path.startswith("/streetview/static"):
-            parsed = urlsplit(self.path)
-            params = parse_qs(parsed.query or "")
-            location = (params.get("location") or [""])[0].strip()
-            size = (params.get("size") or ["400x250"])[0].strip()
-            fov = (params.get("fov") or ["90"])[0].strip()
-            heading = (params.get("heading") or ["0"])[0].strip()
-            pitch = (params.get("pitch") or ["0"])[0].strip()
-            key = (params.get("key") or [""])[0].strip() or os.environ.get("GOOGLE_STREETVIEW_API_KEY", "").strip()
-            if not key:
-                self._send_json_error(500, b'{"error":"GOOGLE_STREETVIEW_API_KEY missing"}')
-                return
-            if not location:
-                self._send_json_error(400, b'{"error":"location query parameter required"}')
-                return
+            return
+        if poller.enabled and (uk_only or poller.covers(n, s, w, e)) and poller.last_error:
+            # The poller just failed against the same upstream; a direct fetch would only stall on it again.
+            self._send_json({"ok": False, "error": poller.last_error, "source": "poller"}, status=502)
+            return
 
-            upstream_qs = urlencode(
-                {
-                    "size": size,
-                    "location": location,
-                    "fov": fov,
-                    "heading": heading,
-                    "pitch": pitch,
-                    "key": key,
-                }
-            )
-            upstream_url = f"https://maps.googleapis.com/maps/api/streetview?{upstream_qs}"
-            req = urllib.request.Request(upstream_url)
-            req.add_header("User-Agent", "ControlRoom/1.0 (+https://localhost)")
-            try:
-                with urllib.request.urlopen(req, timeout=30) as resp:
-                    body = resp.read()
-                    self.send_response(resp.status)
-                    self.send_header("Content-Type", resp.headers.get("Content-Type", "image/jpeg"))
-                    self.send_header("Cache-Control", "no-store")
-                    self.send_header("Access-Control-Allow-Origin", "*")
-                    self.end_headers()
-                    self.wfile.write(body)
-                    return
-            except urllib.error.HTTPError as e:
-                err_body = e.read() if hasattr(e, "read") else b"{}"
-                self._send_json_error(e.code, err_body)
-                return
-            except Exception as e:
-                self._send_json({"error": "Street View upstream failed", "detail": str(e)}, status=502)
-                return
+        data = self._fr24_fetch_feed((n, s, w, e))
+        if not data:
+            self._send_json({"ok": False, "error": "FlightRadar24 fetch failed"}, status=502)
+            return
 
-        if self.path.startswith("/nre/health"):
-            token = os.environ.get("NRE_LDBWS_TOKEN", "").strip()
-            live_dep_url = os.environ.get("RAILDATA_LIVE_DEPARTURE_URL", "").strip()
-            live_dep_key = os.environ.get("RAILDATA_LIVE_DEPARTURE_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()
-            live_board_url = os.environ.get("RAILDATA_LIVE_BOARD_URL", "").strip()
-            live_board_key = os.environ.get("RAILDATA_LIVE_BOARD_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()
+        flights = self._fr24_extract_flights(data)
+        if uk_only:
+            flights = [f for f in flights if fr24_in_uk_scope(f)]
 
-            raildata_departures_ready = bool(live_dep_url and live_dep_key)
-            raildata_arrivals_ready = bool(live_board_url and live_board_key)
-            configured = bool(token or raildata_departures_ready or raildata_arrivals_ready)
+        self._send_flights(
+            {
+                "ok": True,
+                "bounds": {"n": n, "s": s, "w": w, "e": e},
+                "ukOnly": uk_only,
+                "source": "upstream",
+                "generatedAt": time.time(),
+            },
+            flights,
+        )
 
-            provider = "darwin" if token else ("raildata" if (raildata_departures_ready or raildata_arrivals_ready) else "none")
-            self._send_json(
-                {
-                    "ok": True,
-                    "configured": configured,
-                    "provider": provider,
-                    "endpoint": os.environ.get("NRE_LDBWS_URL", NRE_LDBWS_URL),
-                    "fallback": {
-                        "raildata_departures_ready": raildata_departures_ready,
-                        "raildata_arrivals_ready": raildata_arrivals_ready,
-                    },
-                }
-            )
+    def _flights_format(self) -> str:
+        fmt = ((self.query.get("format") or ["json"])[0]).strip().lower()
+        return fmt if fmt in {"columnar", "binary"} else "json"
+
+    def _flights_variant(self) -> Tuple[str, bool]:
+        return self._flights_format(), self._accepts_encoding("gzip")
+
+    def _send_flights(self, meta: dict, flights: list, memo: Optional[Callable] = None):
+        """Flight list as objects (default), format=columnar JSON, or format=binary (see flights_binary)."""
+        fmt, gzip_ok = self._flights_variant()
+
+        def build() -> Tuple[str, bytes, str]:
+            if fmt == "binary":
+                content_type, body = "application/octet-stream", flights_binary(dict(meta, format="binary"), flights)
+            else:
+                if fmt == "columnar":
+                    payload = dict(meta, format="columnar", **flights_columnar(flights))
+                else:
+                    payload = dict(meta, count=len(flights), flights=flights)
+                content_type, body = "application/json", json.dumps(payload, separators=(",", ":")).encode("utf-8")
+            if gzip_ok and len(body) >= STATIC_PRECOMPRESS_MIN_BYTES:
+                return content_type, gzip.compress(body, compresslevel=5), "gzip"
+            return content_type, body, ""
+
+        content_type, body, encoding = memo(build) if memo is not None else build()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Vary", "Accept-Encoding")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _query_time(self, name: str, default: float) -> float:
+        """Epoch seconds or ISO 8601 (naive values are UTC); raises ValueError when malformed."""
+        raw = ((self.query.get(name) or [""])[0]).strip()
+        if not raw:
+            return default
+        try:
+            value = float(raw)
+        except ValueError:
+            parsed = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+            value = (parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)).timestamp()
+        if not math.isfinite(value):
+            raise ValueError(f"{name} must be a finite time")
+        return value
+
+    def _get_flight_history(self):
+        store = _flight_tracks
+        if store is None:
+            self._send_json({"ok": False, "error": "Flight history is not being recorded", "hint": "start the server with --flight-history"}, status=503)
+            return
+        try:
+            bbox = self._query_bbox()
+            t1 = self._query_time("to", time.time())
+            t0 = self._query_time("from", t1 - 3600)
+            limit = max(1, min(FLIGHT_HISTORY_MAX_POINTS, int((self.query.get("limit") or [FLIGHT_HISTORY_MAX_POINTS])[0])))
+        except ValueError as exc:
+            self._send_json({"ok": False, "error": f"Invalid query: {exc}"}, status=400)
+            return
+        if t1 < t0 or t1 - t0 > FLIGHT_HISTORY_MAX_WINDOW_S:
+            self._send_json({"ok": False, "error": f"from/to must span 0..{FLIGHT_HISTORY_MAX_WINDOW_S:g} seconds"}, status=400)
+            return
+        started = time.perf_counter()
+        result = store.query(t0, t1, bbox, limit)
+        result.update(ok=True, **{"from": t0, "to": t1, "bbox": bbox, "fields": ["ts", "lat", "lon", "altitude", "speed", "heading"]})
+        result["tookMs"] = round((time.perf_counter() - started) * 1000, 1)
+        self._send_json_body(json.dumps(result, separators=(",", ":")).encode("utf-8"), cache_control="no-store")
+
+    def _get_flightradar_flight(self):
+        params = self.query
+        fid = str((params.get("id") or [""])[0] or "").strip()
+        if not fid:
+            self._send_json({"ok": False, "error": "Missing id"}, status=400)
+            return
+        include_trail = str((params.get("trail") or ["1"])[0]).strip().lower() not in {"0", "false", "no", "off"}
+        details = self._fr24_fetch_details(fid)
+        if not details:
+            self._send_json({"ok": False, "error": "FlightRadar24 details fetch failed"}, status=502)
             return
 
-        if self.path.startswith("/raildata/health"):
-            has_direct_token = bool(os.environ.get("RAILDATA_AUTH_TOKEN", "").strip())
-            has_credentials = bool(os.environ.get("RAILDATA_USERNAME", "").strip() and os.environ.get("RAILDATA_PASSWORD", "").strip())
+        out = {
+            "identification": details.get("identification") or {},
+            "status": details.get("status") or {},
+            "aircraft": details.get("aircraft") or {},
+            "airline": details.get("airline") or {},
+            "airport": details.get("airport") or {},
+            "time": details.get("time") or {},
+            "trail": [],
+        }
+        if include_trail:
+            trail = details.get("trail")
+            if isinstance(trail, list):
+                out["trail"] = trail[-600:]
+        self._send_json({"ok": True, "id": fid, "details": out, "generatedAt": time.time()})
+
+    def _get_flight_schedule(self):
+        params = self.query
+        callsign = ((params.get("callsign") or [""])[0]).strip().upper()
+        icao24 = ((params.get("icao24") or [""])[0]).strip().lower()
+        key = os.environ.get("AVIATIONSTACK_API_KEY", "").strip()
+        if not key:
             self._send_json(
                 {
-                    "ok": True,
-                    "configured": bool(has_direct_token or has_credentials),
-                    "auth_mode": "token" if has_direct_token else ("username_password" if has_credentials else ("apikey" if os.environ.get("RAILDATA_API_KEY", "").strip() else "none")),
-                    "kb_feeds": sorted(RAILDATA_KB_FEEDS.keys()),
-                    "helpers": [
-                        "/raildata/feeds",
-                        "/raildata/feeds/available",
-                        "/raildata/disruptions",
-                        "/raildata/performance",
-                        "/raildata/performance/reference",
-                        "/raildata/reference",
-                        "/raildata/naptan",
-                        "/raildata/nptg",
-                        "/raildata/proxy?url=<full-feed-url>",
-                    ],
-                    "endpoint": RAILDATA_API_BASE,
-                }
+                    "ok": False,
+                    "reason": "AVIATIONSTACK_API_KEY env var not set",
+                    "flight": None,
+                },
+                status=200,
             )
             return
+        if not callsign and not icao24:
+            self._send_json({"ok": False, "reason": "callsign or icao24 required", "flight": None}, status=400)
+            return
 
-        if self.path.startswith("/raildata/feeds/available"):
-            return self._proxy_raildata_url(f"{RAILDATA_API_BASE}/api/feeds/available", auth_mode="token")
-
-        if self.path.startswith("/raildata/feeds"):
-            return self._proxy_raildata_url(f"{RAILDATA_API_BASE}/api/feeds", auth_mode="token")
+        upstream_params = {"access_key": key, "limit": "12"}
+        if callsign:
+            upstream_params["flight_iata"] = callsign
+        upstream_url = f"{AVIATIONSTACK_BASE}/flights?{urlencode(upstream_params)}"
+        req = urllib.request.Request(upstream_url)
+        req.add_header("Accept", "application/json")
+        req.add_header("User-Agent", "ControlRoom/1.0 (+https://localhost)")
+        try:
+            with _upstream_pool.urlopen(req, timeout=25) as resp:
+                body = json.loads(resp.read().decode("utf-8", errors="replace"))
+        except urllib.error.HTTPError as e:
+            detail = ""
+            try:
+                detail = e.read().decode("utf-8", errors="replace")[:500]
+            except Exception:
+                detail = str(e)
+            self._send_json({"ok": False, "reason": f"aviationstack HTTP {e.code}", "detail": detail}, status=502)
+            return
+        except Exception as e:
+            self._send_json({"ok": False, "reason": "aviationstack request failed", "detail": str(e)}, status=502)
+            return
 
-        if self.path.startswith("/raildata/user"):
-            return self._proxy_raildata_url(f"{RAILDATA_API_BASE}/api/user", auth_mode="token")
+        items = body.get("data") if isinstance(body, dict) else []
+        if not isinstance(items, list):
+            items = []
+
+        def score(item):
+            val = 0
+            cs = str(item.get("flight", {}).get("iata", "")).upper()
+            if callsign and cs == callsign:
+                val += 50
+            if item.get("live"):
+                val += 20
+            if item.get("flight_status"):
+                val += 10
+            return val
+
+        items.sort(key=score, reverse=True)
+        top = items[0] if items else None
+        if not top:
+            self._send_json({"ok": True, "reason": "no schedule match", "flight": None}, status=200)
+            return
 
-        if self.path.startswith("/raildata/kb/"):
-            parsed = urlsplit(self.path)
-            feed = parsed.path.replace("/raildata/kb/", "", 1).strip().lower()
-            env_url_map = {
-                "tocs": os.environ.get("RAILDATA_TOC_URL", "").strip(),
-                "stations": os.environ.get("RAILDATA_KB_STATIONS_URL", "").strip(),
-            }
-            env_key_map = {
-                "tocs": "RAILDATA_TOC_API_KEY",
-                "stations": "RAILDATA_KB_STATIONS_API_KEY",
-            }
-            explicit_url = env_url_map.get(feed, "")
-            query = f"?{parsed.query}" if parsed.query else ""
-            if explicit_url:
-                return self._proxy_raildata_url(f"{explicit_url}{query}", auth_mode="apikey", apikey_env=env_key_map.get(feed, "RAILDATA_API_KEY"))
-
-            upstream_path = RAILDATA_KB_FEEDS.get(feed)
-            if not upstream_path:
-                self._send_json(
-                    {
-                        "error": "Unknown KB feed",
-                        "feed": feed,
-                        "supported_feeds": sorted(RAILDATA_KB_FEEDS.keys()),
-                    },
-                    status=400,
-                )
-                return
-            upstream_url = f"{RAILDATA_API_BASE}{upstream_path}{query}"
-            mode = "apikey" if (os.environ.get("RAILDATA_TOC_API_KEY", "").strip() or os.environ.get("RAILDATA_KB_STATIONS_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()) else "token"
-            return self._proxy_raildata_url(upstream_url, auth_mode=mode)
-
-        if self.path.startswith("/raildata/disruptions"):
-            configured = os.environ.get("RAILDATA_DISRUPTIONS_URL", "").strip()
-            upstream_url = configured or f"{RAILDATA_API_BASE}{RAILDATA_KB_FEEDS['incidents']}"
-            mode = "apikey" if (os.environ.get("RAILDATA_DISRUPTIONS_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()) else "token"
-            return self._proxy_raildata_url(upstream_url, auth_mode=mode, apikey_env="RAILDATA_DISRUPTIONS_API_KEY")
-
-        if self.path.startswith("/raildata/performance/reference"):
-            configured = os.environ.get("RAILDATA_NWR_PERFORMANCE_REFERENCE_URL", "").strip()
-            if not configured:
-                self._send_json(
-                    {
-                        "error": "RAILDATA_NWR_PERFORMANCE_REFERENCE_URL not set",
-                        "hint": "Paste the exact subscribed endpoint URL from Rail Data My Feeds.",
-                    },
-                    status=400,
-                )
-                return
-            mode = "apikey" if (os.environ.get("RAILDATA_NWR_PERFORMANCE_REFERENCE_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()) else "token"
-            return self._proxy_raildata_url(configured, auth_mode=mode, apikey_env="RAILDATA_NWR_PERFORMANCE_REFERENCE_API_KEY")
+        dep = top.get("departure") or {}
+        arr = top.get("arrival") or {}
+        flight_obj = top.get("flight") or {}
+        airline = top.get("airline") or {}
+        out = {
+            "ok": True,
+            "flight": {
+                "flight_code": flight_obj.get("iata") or flight_obj.get("icao") or callsign,
+                "status": top.get("flight_status") or "unknown",
+                "airline": airline.get("name") or "",
+                "departure": {
+                    "airport": dep.get("airport") or dep.get("iata") or dep.get("icao"),
+                    "scheduled": dep.get("scheduled"),
+                    "estimated": dep.get("estimated"),
+                    "actual": dep.get("actual"),
+                    "delay": dep.get("delay"),
+                },
+                "arrival": {
+                    "airport": arr.get("airport") or arr.get("iata") or arr.get("icao"),
+                    "scheduled": arr.get("scheduled"),
+                    "estimated": arr.get("estimated"),
+                    "actual": arr.get("actual"),
+                    "delay": arr.get("delay"),
+                },
+            },
+        }
+        self._send_json(out, status=200)
 
-        if self.path.startswith("/raildata/performance"):
-            configured = os.environ.get("RAILDATA_NWR_PERFORMANCE_URL", "").strip()
-            if not configured:
-                self._send_json(
-                    {
-                        "error": "RAILDATA_NWR_PERFORMANCE_URL not set",
-                        "hint": "Paste the exact subscribed endpoint URL from Rail Data My Feeds.",
-                    },
-                    status=400,
-                )
-                return
-            parsed = urlsplit(self.path)
-            params = parse_qs(parsed.query or "")
-            rendered, missing = self._render_url_template(
-                configured,
-                {"stanoxGroup": (params.get("stanoxGroup") or [""])[0]},
-            )
-            if missing:
-                self._send_json({"error": "Missing required query parameter(s)", "missing": missing}, status=400)
-                return
-            mode = "apikey" if (os.environ.get("RAILDATA_NWR_PERFORMANCE_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()) else "token"
-            return self._proxy_raildata_url(rendered, auth_mode=mode, apikey_env="RAILDATA_NWR_PERFORMANCE_API_KEY")
+    def _post_dvla_vehicle(self):
+        api_key = os.environ.get("DVLA_API_KEY", "").strip()
+        if not api_key:
+            self._send_json({"error": "DVLA_API_KEY env var not set"}, status=500)
+            return
+        length = 0
+        try:
+            length = int(self.headers.get("Content-Length", "0"))
+        except Exception:
+            length = 0
+        raw = self.rfile.read(length) if length > 0 else b"{}"
+        try:
+            body = json.loads(raw.decode("utf-8", errors="replace"))
+        except Exception:
+            self._send_json({"error": "Invalid JSON body"}, status=400)
+            return
+        registration = str(body.get("registrationNumber") or "").upper().replace(" ", "").strip()
+        if not registration:
+            self._send_json({"error": "registrationNumber is required"}, status=400)
+            return
 
-        if self.path.startswith("/raildata/reference"):
-            configured = os.environ.get("RAILDATA_REFERENCE_DATA_URL", "").strip()
-            if not configured:
-                self._send_json(
-                    {
-                        "error": "RAILDATA_REFERENCE_DATA_URL not set",
-                        "hint": "Paste the exact subscribed endpoint URL from Rail Data My Feeds.",
-                    },
-                    status=400,
-                )
-                return
-            parsed = urlsplit(self.path)
-            params = parse_qs(parsed.query or "")
-            rendered, missing = self._render_url_template(
-                configured,
-                {"currentVersion": (params.get("currentVersion") or [""])[0]},
-            )
-            if missing:
-                self._send_json({"error": "Missing required query parameter(s)", "missing": missing}, status=400)
+        upstream_url = f"{DVLA_VES_API_BASE}/vehicle-enquiry/v1/vehicles"
+        payload = json.dumps({"registrationNumber": registration}).encode("utf-8")
+        req = urllib.request.Request(upstream_url, data=payload, method="POST")
+        req.add_header("Accept", "application/json")
+        req.add_header("Content-Type", "application/json")
+        req.add_header("x-api-key", api_key)
+        req.add_header("User-Agent", "ControlRoom/1.0 (+https://localhost)")
+        try:
+            with _upstream_pool.urlopen(req, timeout=25) as resp:
+                body = resp.read()
+                self.send_response(resp.status)
+                self.send_header("Content-Type", resp.headers.get("Content-Type", "application/json"))
+                self.send_header("Access-Control-Allow-Origin", "*")
+                self.end_headers()
+                self.wfile.write(body)
                 return
-            mode = "apikey" if (os.environ.get("RAILDATA_REFERENCE_DATA_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()) else "token"
-            return self._proxy_raildata_url(rendered, auth_mode=mode, apikey_env="RAILDATA_REFERENCE_DATA_API_KEY")
+        except urllib.error.HTTPError as e:
+            err_body = e.read() if hasattr(e, "read") else b"{}"
+            self._send_json_error(e.code, err_body)
+            return
+        except Exception as e:
+            self._send_json({"error": "DVLA upstream failed", "detail": str(e)}, status=502)
+            return
 
-        if self.path.startswith("/raildata/naptan"):
-            configured = os.environ.get("RAILDATA_NAPTAN_URL", "").strip()
-            if not configured:
-                self._send_json(
-                    {
-                        "error": "RAILDATA_NAPTAN_URL not set",
-                        "hint": "Paste NaPTAN endpoint URL from Rail Data My Feeds.",
-                    },
-                    status=400,
-                )
-                return
-            mode = "apikey" if (os.environ.get("RAILDATA_NAPTAN_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()) else "token"
-            return self._proxy_raildata_url(configured, auth_mode=mode, apikey_env="RAILDATA_NAPTAN_API_KEY")
+    def _parse_route(self):
+        self.route_url = urlsplit(self.path)
+        self.query = parse_qs(self.route_url.query or "")
+        self._static_response = False
 
-        if self.path.startswith("/raildata/nptg"):
-            configured = os.environ.get("RAILDATA_NPTG_URL", "").strip()
-            if not configured:
-                self._send_json(
-                    {
-                        "error": "RAILDATA_NPTG_URL not set",
-                        "hint": "Paste NPTG endpoint URL from Rail Data My Feeds.",
-                    },
-                    status=400,
-                )
-                return
-            mode = "apikey" if (os.environ.get("RAILDATA_NPTG_API_KEY", "").strip() or os.environ.get("RAILDATA_NAPTAN_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()) else "token"
-            apikey_env = "RAILDATA_NPTG_API_KEY"
-            if not os.environ.get(apikey_env, "").strip() and os.environ.get("RAILDATA_NAPTAN_API_KEY", "").strip():
-                apikey_env = "RAILDATA_NAPTAN_API_KEY"
-            return self._proxy_raildata_url(configured, auth_mode=mode, apikey_env=apikey_env)
-
-        if self.path.startswith("/raildata/service-details"):
-            configured = os.environ.get("RAILDATA_SERVICE_DETAILS_URL", "").strip()
-            if not configured:
-                self._send_json(
-                    {
-                        "error": "RAILDATA_SERVICE_DETAILS_URL not set",
-                        "hint": "Paste Service Details endpoint URL from Rail Data My Feeds.",
-                    },
-                    status=400,
-                )
-                return
-            parsed = urlsplit(self.path)
-            params = parse_qs(parsed.query or "")
-            rendered, missing = self._render_url_template(
-                configured,
-                {"serviceid": (params.get("serviceid") or [""])[0]},
-            )
-            if missing:
-                self._send_json({"error": "Missing required query parameter(s)", "missing": missing}, status=400)
-                return
-            mode = "apikey" if (os.environ.get("RAILDATA_SERVICE_DETAILS_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()) else "token"
-            return self._proxy_raildata_url(rendered, auth_mode=mode, apikey_env="RAILDATA_SERVICE_DETAILS_API_KEY")
+    def _dispatch(self, method: str) -> bool:
+        spec = _ROUTE_TABLE.match(method, self.route_url.path)
+        if spec is None:
+            return False
+        spec.func(self)
+        return True
 
-        if self.path.startswith("/raildata/live-board"):
-            configured = os.environ.get("RAILDATA_LIVE_BOARD_URL", "").strip()
-            if not configured:
-                self._send_json(
-                    {
-                        "error": "RAILDATA_LIVE_BOARD_URL not set",
-                        "hint": "Paste Live Arrival and Departure Boards endpoint URL from Rail Data My Feeds.",
-                    },
-                    status=400,
-                )
-                return
-            parsed = urlsplit(self.path)
-            params = parse_qs(parsed.query or "")
-            rendered, missing = self._render_url_template(
-                configured,
-                {"crs": (params.get("crs") or [""])[0]},
-            )
-            if missing:
-                self._send_json({"error": "Missing required query parameter(s)", "missing": missing}, status=400)
-                return
-            mode = "apikey" if (os.environ.get("RAILDATA_LIVE_BOARD_API_KEY", "").strip() or os.environ.get("RAILDATA_API_KEY", "").strip()) else "token"
-            return self._proxy_raildata_url(rendered, auth_mode=mode, apikey_env="RAILDATA_LIVE_BOARD_API_KEY")
-
-        if self.path.startswith("/raildata/proxy"):
-            parsed = urlsplit(self.path)
-            params = parse_qs(parsed.query or "")
-            url = ((params.get("url") or [""])[0]).strip()
-            auth_mode = ((params.get("auth") or ["token"])[0]).strip().lower()
-            if not url:
-                self._send_json({"error": "url query parameter required"}, status=400)
-                return
-            if auth_mode not in {"token", "basic", "apikey", "none"}:
-                self._send_json({"error": "auth must be token|basic|apikey|none"}, status=400)
-                return
-            return self._proxy_raildata_url(url, auth_mode=auth_mode if auth_mode != "none" else "")
-
-        if self.path.startswith("/nre/departures") or self.path.startswith("/nre/arrivals"):
-            parsed = urlsplit(self.path)
-            params = parse_qs(parsed.query or "")
-            crs = ((params.get("crs") or [""])[0]).strip().upper()
-            rows = ((params.get("rows") or ["10"])[0]).strip()
-            if not crs or len(crs) != 3:
-                self._send_json({"error": "crs query parameter required (3-letter station code)"}, status=400)
-                return
-            method = "GetDepartureBoard" if self.path.startswith("/nre/departures") else "GetArrivalBoard"
-            body = f"<ldb:numRows>{rows or '10'}</ldb:numRows><ldb:crs>{crs}</ldb:crs>"
-            root, err = self._call_ldbws(method, body)
-            if err:
-                board_type = "departures" if method == "GetDepartureBoard" else "arrivals"
-                fallback_board, fb_err = self._fetch_raildata_board_fallback(crs, board_type)
-                if fallback_board:
-                    self._send_json({"ok": True, "type": board_type, "provider": "raildata", "board": fallback_board})
-                    return
-                self._send_json({"error": err.get("error", "NRE failed"), "detail": err.get("detail", ""), "fallback": fb_err or {}}, status=502)
-                return
-            board = self._parse_station_board(root)
-            self._send_json({"ok": True, "type": "departures" if method == "GetDepartureBoard" else "arrivals", "board": board})
+    def do_GET(self):
+        self._parse_route()
+        if self._dispatch("GET"):
             return
+        if self._serve_static_asset():
+            return
+        return super().do_GET()
 
-        if self.path.startswith("/nre/stations"):
-            parsed = urlsplit(self.path)
-            params = parse_qs(parsed.query or "")
-            q = ((params.get("q") or [""])[0]).strip().lower()
-            crs = ((params.get("crs") or [""])[0]).strip().upper()
-            limit_s = ((params.get("limit") or ["20"])[0]).strip()
-            try:
-                limit = max(1, min(5000, int(limit_s)))
-            except Exception:
-                limit = 20
-            try:
-                items = self._load_station_catalog()
-            except Exception as e:
-                self._send_json({"ok": False, "error": "station catalog unavailable", "detail": str(e), "stations": []}, status=502)
-                return
+    def do_HEAD(self):
+        self._parse_route()
+        if self._serve_static_asset(head_only=True):
+            return
+        return super().do_HEAD()
 
-            if crs and len(crs) == 3:
-                base = None
-                for st in items:
-                    if st["crs"] == crs:
-                        base = st
-                        break
-                if not base:
-                    self._send_json({"ok": True, "base": None, "stations": []})
-                    return
-                try:
-                    lat1 = float(base.get("lat"))
-                    lon1 = float(base.get("lon"))
-                except Exception:
-                    self._send_json({"ok": True, "base": base, "stations": []})
-                    return
-                nearby = []
-                for st in items:
-                    if st["crs"] == crs:
-                        continue
-                    try:
-                        lat2 = float(st.get("lat"))
-                        lon2 = float(st.get("lon"))
-                    except Exception:
-                        continue
-                    d = self._haversine_km(lat1, lon1, lat2, lon2)
-                    if d <= 45:
-                        nearby.append((d, st))
-                nearby.sort(key=lambda x: x[0])
-                out = []
-                for d, st in nearby[:limit]:
-                    cp = dict(st)
-                    cp["distanceKm"] = round(d, 2)
-                    out.append(cp)
-                self._send_json({"ok": True, "base": base, "stations": out})
-                return
+    def do_POST(self):
+        self._parse_route()
+        if self._dispatch("POST"):
+            return
+        self._send_json({"error": "Not found"}, status=404)
 
-            if not q:
-                top = items[:limit]
-                self._send_json({"ok": True, "stations": top})
-                return
 
-            q_upper = q.upper()
-            scored = []
-            for st in items:
-                name_l = st["name"].lower()
-                crs = st["crs"]
-                score = 0
-                if crs == q_upper:
-                    score += 200
-                elif crs.startswith(q_upper):
-                    score += 120
-                if name_l.startswith(q):
-                    score += 80
-                if q in name_l:
-                    score += 40
-                if score > 0:
-                    scored.append((score, st))
-
-            scored.sort(key=lambda pair: (-pair[0], pair[1]["name"]))
-            out = [s for _, s in scored[:limit]]
-            self._send_json({"ok": True, "stations": out})
-            return
-
-        if self.path.startswith("/nre/service"):
-            parsed = urlsplit(self.path)
-            params = parse_qs(parsed.query or "")
-            service_id = ((params.get("service_id") or [""])[0]).strip()
-            if not service_id:
-                self._send_json({"error": "service_id query parameter required"}, status=400)
-                return
-            body = f"<ldb:serviceID>{service_id}</ldb:serviceID>"
-            root, err = self._call_ldbws("GetServiceDetails", body)
-            if err:
-                fallback_service, fb_err = self._fetch_raildata_service_details_fallback(service_id)
-                if fallback_service:
-                    self._send_json({"ok": True, "provider": "raildata", "service": fallback_service})
-                    return
-                self._send_json({"error": err.get("error", "NRE failed"), "detail": err.get("detail", ""), "fallback": fb_err or {}}, status=502)
-                return
-            self._send_json({"ok": True, "service": self._parse_service_details(root)})
-            return
+ROUTES = (
+    RouteSpec("GET", "/__control_room_health", "_get_health", "Server health with cache, pool and engine stats"),
+    RouteSpec("GET", "/ch/", "_get_companies_house", f"-> {CH_API_BASE}"),
+    RouteSpec("GET", "/tfl/", "_get_tfl", f"-> {TFL_API_BASE}"),
+    RouteSpec("GET", "/postcodes/", "_get_postcodes", f"-> {POSTCODES_API_BASE}"),
+    RouteSpec("GET", "/webtris/", "_get_webtris", f"-> {WEBTRIS_API_BASE}"),
+    RouteSpec("GET", "/dvla/health", "_get_dvla_health", "DVLA VES configuration check"),
+    RouteSpec("GET", "/osplaces/postcode", "_get_osplaces_postcode", f"?postcode=... -> {OS_PLACES_API_BASE}/postcode"),
+    RouteSpec("GET", "/osplaces/find", "_get_osplaces_find", f"?query=... -> {OS_PLACES_API_BASE}/find"),
+    RouteSpec("GET", "/streetview/static", "_get_streetview_static", "?location=lat,lng&size=... -> https://maps.googleapis.com/maps/api/streetview"),
+    RouteSpec("GET", "/nre/health", "_get_nre_health", "Darwin / RailData board configuration check"),
+    RouteSpec("GET", "/nre/departures", "_get_nre_board", f"?crs=KGX&rows=10 -> {NRE_LDBWS_URL}"),
+    RouteSpec("GET", "/nre/arrivals", "_get_nre_board", f"?crs=KGX&rows=10 -> {NRE_LDBWS_URL}"),
+    RouteSpec("GET", "/nre/stations", "_get_nre_stations", f"?q=king&limit=20 | ?crs=KGX&radius_km=45 | ?lat=..&lon=.. -> {UK_RAIL_STATIONS_URL}"),
+    RouteSpec("GET", "/nre/service", "_get_nre_service", f"?service_id=... -> {NRE_LDBWS_URL}"),
+    RouteSpec("GET", "/raildata/health", "_get_raildata_health", "RailData configuration check"),
+    RouteSpec("GET", "/raildata/feeds/available", "_get_raildata_feeds_available", f"-> {RAILDATA_API_BASE}/api/feeds/available"),
+    RouteSpec("GET", "/raildata/feeds", "_get_raildata_feeds", f"-> {RAILDATA_API_BASE}/api/feeds"),
+    RouteSpec("GET", "/raildata/user", "_get_raildata_user", f"-> {RAILDATA_API_BASE}/api/user"),
+    RouteSpec("GET", "/raildata/kb/", "_get_raildata_kb", f"<feed> -> {RAILDATA_API_BASE}/api/staticfeeds/* (X-Auth-Token)"),
+    RouteSpec("GET", "/raildata/disruptions", "_get_raildata_disruptions", "-> RAILDATA_DISRUPTIONS_URL or KB incidents"),
+    RouteSpec("GET", "/raildata/performance/reference", "_get_raildata_performance_reference", "-> RAILDATA_NWR_PERFORMANCE_REFERENCE_URL"),
+    RouteSpec("GET", "/raildata/performance", "_get_raildata_performance", "?stanoxGroup=... -> RAILDATA_NWR_PERFORMANCE_URL"),
+    RouteSpec("GET", "/raildata/reference", "_get_raildata_reference", "?currentVersion=... -> RAILDATA_REFERENCE_DATA_URL"),
+    RouteSpec("GET", "/raildata/naptan", "_get_raildata_naptan", "-> RAILDATA_NAPTAN_URL"),
+    RouteSpec("GET", "/raildata/nptg", "_get_raildata_nptg", "-> RAILDATA_NPTG_URL"),
+    RouteSpec("GET", "/raildata/service-details", "_get_raildata_service_details", "?serviceid=... -> RAILDATA_SERVICE_DETAILS_URL"),
+    RouteSpec("GET", "/raildata/live-board", "_get_raildata_live_board", "?crs=... -> RAILDATA_LIVE_BOARD_URL"),
+    RouteSpec("GET", "/raildata/proxy", "_get_raildata_proxy", "?url=<full-feed-url>&auth=token|apikey|basic"),
+    RouteSpec("GET", "/geo/search", "_get_geo_search", f"?q=... -> {NOMINATIM_BASE}"),
+    RouteSpec("GET", "/crime/query", "_get_crime_query", "?bbox=w,s,e,n&from=YYYY-MM&to=YYYY-MM&force=..&type=..&limit=.. -> indexed crime grid"),
+    RouteSpec("GET", "/crime/meta", "_get_crime_meta", "months, forces and types in the indexed crime grid"),
+    RouteSpec("GET", "/tiles/", "_get_tile", "{layer}/{z}/{x}/{y}.mvt vector tiles of " + ", ".join(TILE_LAYERS)),
+    RouteSpec("GET", "/local/company/", "_get_local_company", "{number} -> offline company index"),
+    RouteSpec("GET", "/local/companies", "_get_local_companies", "?numbers=a,b,... -> offline company index"),
+    RouteSpec("POST", "/local/companies", "_post_local_companies", '{"numbers": [...]} -> offline company index'),
+    RouteSpec("GET", "/local/search", "_get_local_search", "?q=acme&kind=company|person&limit=20&page=1 -> offline name index"),
+    RouteSpec("GET", "/local/psc/graph", "_get_local_psc_graph", "?company=..|name=..&depth=3&fanout=50&max_nodes=500 -> offline PSC graph"),
+    RouteSpec("GET", "/local/postcode/", "_get_local_postcode", "{postcode} -> offline ONSPD table"),
+    RouteSpec("POST", "/local/postcodes", "_post_local_postcodes", '{"postcodes": [...]} -> offline ONSPD table'),
+    RouteSpec("GET", "/local/postcodes/nearest", "_get_local_postcodes_nearest", "?lat=..&lon=..&limit=1&radius_m=.. -> offline ONSPD table"),
+    RouteSpec("GET", "/local/reverse", "_get_local_reverse", "?lat=..&lon=.. -> nearest ONSPD postcode and police force area"),
+    RouteSpec("GET", "/stream", "_get_stream", "?topics=flights,tube,departures:KGX -> Server-Sent Events from shared pollers"),
+    RouteSpec("GET", "/api/flightradar/flights", "_get_flightradar_flights", f"?n=..&s=..&w=..&e=..&since=<cursor> -> shared poller / {FR24_FEED_URL}"),
+    RouteSpec("GET", "/api/flights/history", "_get_flight_history", "?bbox=w,s,e,n&from=..&to=.. -> recorded flight tracks"),
+    RouteSpec("GET", "/api/flightradar/flight", "_get_flightradar_flight", f"?id=... -> {FR24_CLICKHANDLER_URL}<id>"),
+    RouteSpec("GET", "/flight/schedule", "_get_flight_schedule", f"?callsign=BAW130&icao24=... -> {AVIATIONSTACK_BASE}/flights"),
+    RouteSpec("POST", "/dvla/vehicle", "_post_dvla_vehicle", f"-> {DVLA_VES_API_BASE}/vehicle-enquiry/v1/vehicles"),
+)
+
+_ROUTE_TABLE = RouteTable(Handler, ROUTES)
+
+
+class _LoopWriter(io.RawIOBase):
+    """wfile for handlers running on worker threads; writes are applied on the event loop with backpressure."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, writer: asyncio.StreamWriter):
+        super().__init__()
+        self._loop = loop
+        self._writer = writer
+
+    def writable(self) -> bool:
+        return True
 
-        if self.path.startswith("/geo/search"):
-            parsed = urlsplit(self.path)
-            params = parse_qs(parsed.query or "")
-            q = ((params.get("q") or [""])[0]).strip()
-            limit = ((params.get("limit") or ["1"])[0]).strip()
-            if not q:
-                self._send_json({"error": "q query parameter required"}, status=400)
-                return
-            upstream = f"{NOMINATIM_BASE}?q={quote_plus(q)}&format=jsonv2&limit={quote_plus(limit)}"
-            self._proxy_get(
-                upstream,
-                headers={
-                    "Accept": "application/json",
-                    "User-Agent": "ControlRoom/1.0 (+https://localhost)",
-                },
-            )
-            return
+    def write(self, data) -> int:
+        payload = bytes(data)
+        if payload:
+            asyncio.run_coroutine_threadsafe(self._write(payload), self._loop).result()
+        return len(payload)
 
-        if self.path.startswith("/api/flightradar/flights"):
-            parsed = urlsplit(self.path)
-            params = parse_qs(parsed.query or "")
+    async def _write(self, payload: bytes):
+        self._writer.write(payload)
+        await self._writer.drain()
 
-            uk_only_raw = ((params.get("ukOnly") or ["0"])[0]).strip().lower()
-            uk_only = uk_only_raw in {"1", "true", "yes", "on"}
 
-            def as_float(value, fallback):
-                try:
-                    return float(str(value).strip())
-                except Exception:
-                    return fallback
+class _BridgedHandler(Handler):
+    """Runs one already-buffered request through Handler without owning a socket."""
 
-            n = as_float((params.get("n") or [None])[0], FR24_DEFAULT_BOUNDS[0])
-            s = as_float((params.get("s") or [None])[0], FR24_DEFAULT_BOUNDS[1])
-            w = as_float((params.get("w") or [None])[0], FR24_DEFAULT_BOUNDS[2])
-            e = as_float((params.get("e") or [None])[0], FR24_DEFAULT_BOUNDS[3])
+    def __init__(self, raw_request: bytes, client_address, wfile: _LoopWriter, server):
+        self._raw_request = raw_request
+        self._bridge_wfile = wfile
+        super().__init__(None, client_address, server)
 
-            n = max(-90.0, min(90.0, n))
-            s = max(-90.0, min(90.0, s))
-            w = max(-180.0, min(180.0, w))
-            e = max(-180.0, min(180.0, e))
+    def setup(self):
+        self.connection = None
+        self.rfile = io.BytesIO(self._raw_request)
+        self.wfile = self._bridge_wfile
 
-            data = self._fr24_fetch_feed((n, s, w, e))
-            if not data:
-                self._send_json({"ok": False, "error": "FlightRadar24 fetch failed"}, status=502)
-                return
+    def handle(self):
+        self.close_connection = True
+        self.handle_one_request()
 
-            flights = self._fr24_extract_flights(data)
-            if uk_only:
-                def in_uk_airspace(f):
-                    try:
-                        lat = float(f.get("lat"))
-                        lon = float(f.get("lon"))
-                    except Exception:
-                        return False
-                    return (
-                        UK_AIRSPACE_BOUNDS["south"] <= lat <= UK_AIRSPACE_BOUNDS["north"]
-                        and UK_AIRSPACE_BOUNDS["west"] <= lon <= UK_AIRSPACE_BOUNDS["east"]
-                    )
-                flights = [
-                    f for f in flights
-                    if in_uk_airspace(f)
-                    or (
-                        (not isinstance(f.get("lat"), (int, float)) or not isinstance(f.get("lon"), (int, float)))
-                        and (
-                            str(f.get("origin") or "").strip().upper() in UK_AIRPORT_IATA
-                            or str(f.get("destination") or "").strip().upper() in UK_AIRPORT_IATA
-                        )
-                    )
-                ]
+    def finish(self):
+        pass
 
-            self._send_json(
-                {
-                    "ok": True,
-                    "bounds": {"n": n, "s": s, "w": w, "e": e},
-                    "ukOnly": uk_only,
-                    "count": len(flights),
-                    "flights": flights,
-                    "generatedAt": time.time(),
-                }
-            )
-            return
 
-        if self.path.startswith("/api/flightradar/flight"):
-            parsed = urlsplit(self.path)
-            params = parse_qs(parsed.query or "")
-            fid = str((params.get("id") or [""])[0] or "").strip()
-            if not fid:
-                self._send_json({"ok": False, "error": "Missing id"}, status=400)
-                return
-            include_trail = str((params.get("trail") or ["1"])[0]).strip().lower() not in {"0", "false", "no", "off"}
-            details = self._fr24_fetch_details(fid)
-            if not details:
-                self._send_json({"ok": False, "error": "FlightRadar24 details fetch failed"}, status=502)
-                return
+class AsyncioHTTPServer:
+    """Event-loop front end: connections, keep-alive and request parsing live on one loop, while
+    Handler routes run on a fixed worker pool so a burst of slow upstreams queues instead of
+    spawning a thread per connection."""
 
-            out = {
-                "identification": details.get("identification") or {},
-                "status": details.get("status") or {},
-                "aircraft": details.get("aircraft") or {},
-                "airline": details.get("airline") or {},
-                "airport": details.get("airport") or {},
-                "time": details.get("time") or {},
-                "trail": [],
-            }
-            if include_trail:
-                trail = details.get("trail")
-                if isinstance(trail, list):
-                    out["trail"] = trail[-600:]
-            self._send_json({"ok": True, "id": fid, "details": out, "generatedAt": time.time()})
-            return
-
-        if self.path.startswith("/flight/schedule"):
-            parsed = urlsplit(self.path)
-            params = parse_qs(parsed.query or "")
-            callsign = ((params.get("callsign") or [""])[0]).strip().upper()
-            icao24 = ((params.get("icao24") or [""])[0]).strip().lower()
-            key = os.environ.get("AVIATIONSTACK_API_KEY", "").strip()
-            if not key:
-                self._send_json(
-                    {
-                        "ok": False,
-                        "reason": "AVIATIONSTACK_API_KEY env var not set",
-                        "flight": None,
-                    },
-                    status=200,
-                )
-                return
-            if not callsign and not icao24:
-                self._send_json({"ok": False, "reason": "callsign or icao24 required", "flight": None}, status=400)
-                return
+    max_header_bytes = 64 * 1024
+    max_body_bytes = 16 * 1024 * 1024
+    keepalive_timeout_s = 30.0
 
-            upstream_params = {"access_key": key, "limit": "12"}
-            if callsign:
-                upstream_params["flight_iata"] = callsign
-            upstream_url = f"{AVIATIONSTACK_BASE}/flights?{urlencode(upstream_params)}"
-            req = urllib.request.Request(upstream_url)
-            req.add_header("Accept", "application/json")
-            req.add_header("User-Agent", "ControlRoom/1.0 (+https://localhost)")
-            try:
-                with urllib.request.urlopen(req, timeout=25) as resp:
-                    body = json.loads(resp.read().decode("utf-8", errors="replace"))
-            except urllib.error.HTTPError as e:
-                detail = ""
-                try:
-                    detail = e.read().decode("utf-8", errors="replace")[:500]
-                except Exception:
-                    detail = str(e)
-                self._send_json({"ok": False, "reason": f"aviationstack HTTP {e.code}", "detail": detail}, status=502)
-                return
-            except Exception as e:
-                self._send_json({"ok": False, "reason": "aviationstack request failed", "detail": str(e)}, status=502)
-                return
+    def __init__(self, server_address: Tuple[str, int], handler_class, workers: int = DEFAULT_WORKERS, backlog_per_worker: int = 4):
+        self.server_address = server_address
+        self.RequestHandlerClass = handler_class
+        self.workers = max(1, int(workers))
+        self.max_pending = self.workers * max(1, int(backlog_per_worker))
+        self._socket = socket.create_server(server_address, reuse_port=False, backlog=128)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cr-worker")
+        self._pending = 0
+        self.rejected = 0
 
-            items = body.get("data") if isinstance(body, dict) else []
-            if not isinstance(items, list):
-                items = []
-
-            def score(item):
-                val = 0
-                cs = str(item.get("flight", {}).get("iata", "")).upper()
-                if callsign and cs == callsign:
-                    val += 50
-                if item.get("live"):
-                    val += 20
-                if item.get("flight_status"):
-                    val += 10
-                return val
-
-            items.sort(key=score, reverse=True)
-            top = items[0] if items else None
-            if not top:
-                self._send_json({"ok": True, "reason": "no schedule match", "flight": None}, status=200)
-                return
+    def serve_forever(self):
+        asyncio.run(self._serve())
 
-            dep = top.get("departure") or {}
-            arr = top.get("arrival") or {}
-            flight_obj = top.get("flight") or {}
-            airline = top.get("airline") or {}
-            out = {
-                "ok": True,
-                "flight": {
-                    "flight_code": flight_obj.get("iata") or flight_obj.get("icao") or callsign,
-                    "status": top.get("flight_status") or "unknown",
-                    "airline": airline.get("name") or "",
-                    "departure": {
-                        "airport": dep.get("airport") or dep.get("iata") or dep.get("icao"),
-                        "scheduled": dep.get("scheduled"),
-                        "estimated": dep.get("estimated"),
-                        "actual": dep.get("actual"),
-                        "delay": dep.get("delay"),
-                    },
-                    "arrival": {
-                        "airport": arr.get("airport") or arr.get("iata") or arr.get("icao"),
-                        "scheduled": arr.get("scheduled"),
-                        "estimated": arr.get("estimated"),
-                        "actual": arr.get("actual"),
-                        "delay": arr.get("delay"),
-                    },
-                },
-            }
-            self._send_json(out, status=200)
-            return
+    def server_close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._socket.close()
 
-        return super().do_GET()
+    def stats(self) -> dict:
+        return {"name": "asyncio", "workers": self.workers, "pending": self._pending, "maxPending": self.max_pending, "rejected": self.rejected}
 
-    def do_POST(self):
-        if self.path.startswith("/dvla/vehicle"):
-            api_key = os.environ.get("DVLA_API_KEY", "").strip()
-            if not api_key:
-                self._send_json({"error": "DVLA_API_KEY env var not set"}, status=500)
-                return
-            length = 0
-            try:
-                length = int(self.headers.get("Content-Length", "0"))
-            except Exception:
-                length = 0
-            raw = self.rfile.read(length) if length > 0 else b"{}"
-            try:
-                body = json.loads(raw.decode("utf-8", errors="replace"))
-            except Exception:
-                self._send_json({"error": "Invalid JSON body"}, status=400)
-                return
-            registration = str(body.get("registrationNumber") or "").upper().replace(" ", "").strip()
-            if not registration:
-                self._send_json({"error": "registrationNumber is required"}, status=400)
-                return
+    async def _serve(self):
+        server = await asyncio.start_server(self._handle_connection, sock=self._socket, limit=self.max_header_bytes)
+        async with server:
+            await server.serve_forever()
 
-            upstream_url = f"{DVLA_VES_API_BASE}/vehicle-enquiry/v1/vehicles"
-            payload = json.dumps({"registrationNumber": registration}).encode("utf-8")
-            req = urllib.request.Request(upstream_url, data=payload, method="POST")
-            req.add_header("Accept", "application/json")
-            req.add_header("Content-Type", "application/json")
-            req.add_header("x-api-key", api_key)
-            req.add_header("User-Agent", "ControlRoom/1.0 (+https://localhost)")
-            try:
-                with urllib.request.urlopen(req, timeout=25) as resp:
-                    body = resp.read()
-                    self.send_response(resp.status)
-                    self.send_header("Content-Type", resp.headers.get("Content-Type", "application/json"))
-                    self.send_header("Access-Control-Allow-Origin", "*")
-                    self.end_headers()
-                    self.wfile.write(body)
-                    return
-            except urllib.error.HTTPError as e:
-                err_body = e.read() if hasattr(e, "read") else b"{}"
-                self._send_json_error(e.code, err_body)
-                return
-            except Exception as e:
-                self._send_json({"error": "DVLA upstream failed", "detail": str(e)}, status=502)
-                return
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        peer = writer.get_extra_info("peername") or ("", 0)
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=self.keepalive_timeout_s)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+                    break
+                length, chunked, expects_continue = self._scan_head(head)
+                if chunked:
+                    # Only Content-Length framing is read here; a chunked body left on the socket would be parsed as
+                    # the next keep-alive request.
+                    await self._write_simple(writer, 411, "Length Required", close=True)
+                    break
+                if length > self.max_body_bytes:
+                    await self._write_simple(writer, 413, "Payload Too Large", close=True)
+                    break
+                if expects_continue:
+                    writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+                body = await reader.readexactly(length) if length else b""
+                if self._pending >= self.max_pending:
+                    self.rejected += 1
+                    await self._write_simple(writer, 503, "Server Busy", retry_after=2)
+                    continue
+                self._pending += 1
+                try:
+                    close = await loop.run_in_executor(
+                        self._executor, self._run_handler, head + body, peer, _LoopWriter(loop, writer)
+                    )
+                finally:
+                    self._pending -= 1
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _run_handler(self, raw_request: bytes, peer, wfile: _LoopWriter) -> bool:
+        try:
+            handler = _BridgedHandler(raw_request, peer, wfile, self)
+            return bool(handler.close_connection)
+        except Exception:
+            return True
 
-        self._send_json({"error": "Not found"}, status=404)
+    @staticmethod
+    def _scan_head(head: bytes) -> Tuple[int, bool, bool]:
+        length = 0
+        chunked = False
+        expects_continue = False
+        for line in head.split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            name = name.strip().lower()
+            if name == b"content-length":
+                try:
+                    length = max(0, int(value.strip()))
+                except ValueError:
+                    length = 0
+            elif name == b"transfer-encoding" and value.strip().lower() != b"identity":
+                chunked = True
+            elif name == b"expect" and value.strip().lower() == b"100-continue":
+                expects_continue = True
+        return length, chunked, expects_continue
+
+    @staticmethod
+    async def _write_simple(writer: asyncio.StreamWriter, status: int, reason: str, retry_after: int = 0, close: bool = False):
+        body = json.dumps({"error": reason}).encode("utf-8")
+        head = f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+        if retry_after:
+            head += f"Retry-After: {retry_after}\r\n"
+        if close:
+            head += "Connection: close\r\n"
+        writer.write(head.encode("ascii") + b"\r\n" + body)
+        await writer.drain()
 
 
 def main(argv: Optional[list] = None):
+    global _flight_tracks
     load_env_file()
     config = parse_server_config(argv)
 
@@ -1612,34 +6695,68 @@ def main(argv: Optional[list] = None):
         print(f"!! Static root {config.root} does not exist", file=sys.stderr)
         sys.exit(2)
 
+    _response_cache.configure(config.cache_mb * 1024 * 1024)
+    _upstream_pool.configure(config.pool_size, config.pool_idle_s, config.pool_max_lifetime_s, config.upstream_concurrency)
+    _static_cache.configure(config.static_cache_mb * 1024 * 1024)
+    if config.build_indexes:
+        for name in config.build_indexes:
+            started = time.time()
+            count = LOCAL_INDEX_BUILDERS[name](config.root, config.index_dir)
+            print(f"Built {name} index: {count} entries in {time.time() - started:.1f}s -> {config.index_dir}")
+        return
+    if config.precompress == "only":
+        written = precompress_static_assets(config.root)
+        print(f"Precompression complete: {written} variant(s) written")
+        return
+    if config.precompress == "background" and config.warm == "off":
+        threading.Thread(target=precompress_static_assets, args=(config.root,), daemon=True, name="cr-precompress").start()
     Handler.protocol_version = "HTTP/1.1"
-    server = ThreadingHTTPServer((config.host, config.port), Handler)
+    Handler.tile_cache_dir = config.tile_cache
+    Handler.index_dir = config.index_dir
+    station_file = config.index_dir / STATION_CATALOG_FILE
+    stored = read_station_catalog_file(station_file)
+    if stored is not None:
+        _station_catalog_cache["meta"] = stored[1]
+        _station_catalog_cache["catalog"] = StationCatalog(stored[0])
+    station_refresher = STATION_REFRESH_S > 0
+    if station_refresher:
+        threading.Thread(target=station_catalog_refresher, args=(station_file, STATION_REFRESH_S), daemon=True, name="cr-stations").start()
+    if config.flight_history is not None and _flight_poller.enabled:
+        _flight_tracks = FlightTrackStore(config.flight_history)
+        _flight_tracks.attach(_flight_poller)
+    _warmup_state["mode"] = config.warm
+    if config.warm == "block":
+        run_warmup(config)
+    elif config.warm == "background":
+        _warmup_state["ready"] = False
+        threading.Thread(target=run_warmup, args=(config,), daemon=True, name="cr-warmup").start()
+    if config.engine == "asyncio":
+        server = AsyncioHTTPServer((config.host, config.port), Handler, workers=config.workers)
+        # Each open stream holds a pool worker, so leave at least half the pool for ordinary requests.
+        _stream_hub.max_clients = min(STREAM_MAX_CLIENTS, max(1, config.workers // 2))
+        if config.workers < 2:
+            print("!! --workers 1: an open /stream client occupies the only route worker; use --workers 2 or more", file=sys.stderr)
+    else:
+        server = ThreadingHTTPServer((config.host, config.port), Handler)
     print(f"\n{'=' * 72}")
     print("Control Room Server Running")
     print(f"{'=' * 72}")
     print(f"Host:   http://{config.host}:{config.port}")
     print(f"Root:   {config.root}")
-    print(f"Proxy:  /ch/* -> {CH_API_BASE}")
-    print(f"Proxy:  /tfl/* -> {TFL_API_BASE}")
-    print(f"Proxy:  /postcodes/* -> {POSTCODES_API_BASE}")
-    print(f"Proxy:  /webtris/* -> {WEBTRIS_API_BASE}")
-    print(f"Proxy:  /api/flightradar/flights?n=..&s=..&w=..&e=.. -> {FR24_FEED_URL}")
-    print(f"Proxy:  /api/flightradar/flight?id=... -> {FR24_CLICKHANDLER_URL}<id>")
-    print(f"Proxy:  /osplaces/postcode?postcode=... -> {OS_PLACES_API_BASE}/postcode")
-    print(f"Proxy:  /osplaces/find?query=... -> {OS_PLACES_API_BASE}/find")
-    print("Proxy:  /streetview/static?location=lat,lng&size=... -> https://maps.googleapis.com/maps/api/streetview")
-    print(f"Proxy:  /nre/departures|arrivals?crs=KGX&rows=10 -> {NRE_LDBWS_URL}")
-    print(f"Proxy:  /nre/service?service_id=... -> {NRE_LDBWS_URL}")
-    print(f"Proxy:  /nre/stations?q=king&limit=20 -> {UK_RAIL_STATIONS_URL}")
-    print(f"Proxy:  /geo/search?q=... -> {NOMINATIM_BASE}")
-    print(f"Proxy:  /flight/schedule?callsign=BAW130&icao24=... -> {AVIATIONSTACK_BASE}/flights")
-    print(f"Proxy:  /dvla/vehicle [POST] -> {DVLA_VES_API_BASE}/vehicle-enquiry/v1/vehicles")
-    print(f"Proxy:  /raildata/feeds -> {RAILDATA_API_BASE}/api/feeds")
-    print(f"Proxy:  /raildata/kb/<feed> -> {RAILDATA_API_BASE}/api/staticfeeds/* (X-Auth-Token)")
-    print("Proxy:  /raildata/disruptions | /raildata/performance?stanoxGroup=... | /raildata/reference?currentVersion=...")
-    print("Proxy:  /raildata/service-details?serviceid=... | /raildata/live-board?crs=...")
-    print("Proxy:  /raildata/naptan | /raildata/nptg")
-    print("Proxy:  /raildata/proxy?url=<full-feed-url>&auth=token|apikey|basic")
+    print(f"Cache:  {config.cache_mb} MB upstream response cache" if config.cache_mb else "Cache:  disabled")
+    print(f"Pool:   {config.pool_size} keep-alive connections/host, idle {config.pool_idle_s:g}s, lifetime {config.pool_max_lifetime_s:g}s")
+    print(f"Tiles:  {config.tile_cache or 'not cached on disk'}")
+    print(f"Tracks: {config.flight_history if _flight_tracks else 'not recorded (--flight-history)'}")
+    if stored:
+        print(f"Rail:   {len(stored[0])} stations from {station_file}")
+    elif station_refresher:
+        print("Rail:   station catalog not cached yet; fetching in background")
+    else:
+        print("Rail:   station catalog not cached yet; fetched on first request (CR_STATION_REFRESH_S=0)")
+    print(f"Engine: {config.engine}" + (f" ({config.workers} workers, {config.upstream_concurrency or 'unbounded'} in-flight/upstream)" if config.engine == "asyncio" else ""))
+    print(f"Routes: {len(ROUTES)} registered")
+    for spec in ROUTES:
+        print(f"  {spec.method:<5}{spec.display:<34} {spec.summary}")
     print(f"{'=' * 72}\n")
     try:
         server.serve_forever()